@@ -11,12 +11,15 @@ from pyc2e.interfaces import (
     DEFAULT_INTERFACE_TYPE,
     SUPPORTED,
     WIN32,
+    AsyncUnixInterface,
     UnixInterface,
 )
 if WIN32 in SUPPORTED:
     from pyc2e.interfaces import Win32Interface
 
 from pyc2e.interfaces.response import Response
+from pyc2e.fan_out import EngineResult, FanOutExecutor, fan_out
+from pyc2e.interfaces.unix import DEFAULT_PORT, LOCALHOST
 
 
 def execute_caos(
@@ -68,11 +71,74 @@ def add_script(
         return response
 
 
+async def execute_caos_async(
+    query_body: str,
+    host: str = LOCALHOST,
+    port: int = DEFAULT_PORT,
+    timeout: int = 100
+) -> Response:
+    """
+    Coroutine version of execute_caos for socket-based engines.
+
+    :param query_body: The CAOS to execute.
+    :param host: The host the engine is running on.
+    :param port: The port the engine is listening on.
+    :param timeout: How many ms to wait for the engine's response
+    :return:
+    """
+    interface = AsyncUnixInterface(
+        port=port,
+        host=host,
+        wait_timeout_ms=timeout
+    )
+    return await interface.execute_caos(query_body)
+
+
+async def add_script_async(
+    script: str,
+    family: int,
+    genus: int,
+    species: int,
+    script_number: int,
+    host: str = LOCALHOST,
+    port: int = DEFAULT_PORT,
+    timeout: int = 100
+) -> Response:
+    """
+    Coroutine for adding a script to a socket-based engine's scriptorium.
+
+    The script must be the bare body rather than one headed by scrp.
+
+    :param script: The body of the script to add to the scriptorium.
+    :param family: family classifier
+    :param genus: genus classifier
+    :param species: species classifier
+    :param script_number: script identifier
+    :param host: The host the engine is running on.
+    :param port: The port the engine is listening on.
+    :param timeout: How many ms to wait for the engine's response
+    :return:
+    """
+    interface = AsyncUnixInterface(
+        port=port,
+        host=host,
+        wait_timeout_ms=timeout
+    )
+    return await interface.add_script(
+        script, family, genus, species, script_number)
+
+
 __all__ = [
     "DEFAULT_INTERFACE_TYPE",
+    "EngineResult",
+    "FanOutExecutor",
     "add_script",
+    "add_script_async",
     "execute_caos",
+    "execute_caos_async",
+    "fan_out",
     "SUPPORTED",
+    "AsyncUnixInterface",
     "UnixInterface",
     "Win32Interface",
 ]
@@ -1,7 +1,27 @@
 import argparse
+import os
+import sys
 
-import pyc2e
+from pyc2e.bench import run_benchmark
 from pyc2e.common import SCRIPT_START_STRING_REGEX
+from pyc2e.fan_out import interface_for_target
+from pyc2e.inject import (
+    DEFAULT_BATCH_BYTES,
+    find_cos_files,
+    inject_cos,
+    inject_files
+)
+from pyc2e.interfaces.unix import DEFAULT_PORT
+from pyc2e.load import (
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_SLO_MS,
+    MODE_ASYNC,
+    MODE_SYNC,
+    QueryMix,
+    run_load
+)
+from pyc2e.metrics import MetricsRegistry
+from pyc2e.recording import read_records, replay
 
 root_parser = argparse.ArgumentParser(prog="pyc2e")
 subparsers = root_parser.add_subparsers(title="commands", dest="command")
@@ -19,32 +39,505 @@ inject_parser.add_argument(
 injection_source_group = inject_parser.add_mutually_exclusive_group()
 injection_source_group.add_argument(
     "--file",
-    type=argparse.FileType('r', encoding='UTF-8'), default='-'
+    action="append", dest="files", default=[], metavar="FILE",
+    help="A .cos file to inject. May be repeated."
 )
 injection_source_group.add_argument(
     '--caos',
     type=str,
 )
+inject_parser.add_argument(
+    "--dir",
+    action="append", dest="directories", default=[], metavar="DIR",
+    help="Inject every .cos file under this directory. May be repeated."
+)
+inject_parser.add_argument(
+    "--jobs", type=int, default=None,
+    help="How many processes to parse files with"
+)
+inject_parser.add_argument(
+    "--batch-bytes", type=int, default=DEFAULT_BATCH_BYTES,
+    help="Roughly how many bytes of scripts to send per request"
+)
+inject_target_group = inject_parser.add_mutually_exclusive_group()
+inject_target_group.add_argument(
+    "--host", type=str,
+    help="Inject into a socket engine on this host"
+)
+inject_target_group.add_argument(
+    "--game-name", type=str, default="Docking Station",
+    help="Inject into a local engine by name"
+)
+inject_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+inject_parser.add_argument(
+    "--timeout", type=int, default=100,
+    help="How many ms to wait for each response"
+)
+
+bench_parser = subparsers.add_parser(
+    "bench", prog="bench",
+    help="Measure round trip latency and throughput against an engine"
+)
+bench_parser.add_argument(
+    "--caos", action="append", dest="queries", metavar="CAOS",
+    help="A query to send. Repeat to cycle through several."
+)
+bench_parser.add_argument(
+    "--file", type=argparse.FileType('r', encoding='UTF-8'),
+    help="Read a single query from a file"
+)
+bench_target_group = bench_parser.add_mutually_exclusive_group()
+bench_target_group.add_argument(
+    "--host", type=str,
+    help="Benchmark a socket engine on this host"
+)
+bench_target_group.add_argument(
+    "--game-name", type=str, default="Docking Station",
+    help="Benchmark a local engine by name"
+)
+bench_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+bench_parser.add_argument(
+    "--fake", action="store_true",
+    help="Start an in-process fake engine and benchmark that"
+)
+bench_parser.add_argument(
+    "--fake-shared-memory", action="store_true",
+    help="Benchmark Win32Interface against an in-process emulated engine."
+         " Uses anonymous memory on Linux"
+)
+bench_parser.add_argument(
+    "-n", "--requests", type=int, default=None,
+    help="Stop after this many requests"
+)
+bench_parser.add_argument(
+    "-t", "--duration", type=float, default=None,
+    help="Stop after this many seconds"
+)
+bench_parser.add_argument("-c", "--concurrency", type=int, default=1)
+bench_parser.add_argument(
+    "--timeout", type=int, default=100,
+    help="How many ms to wait for each response"
+)
+bench_parser.add_argument(
+    "--format", choices=("table", "json"), default="table"
+)
+
+stats_parser = subparsers.add_parser(
+    "stats", prog="stats",
+    help="Send queries and dump request metrics"
+)
+stats_parser.add_argument(
+    "--caos", action="append", dest="queries", metavar="CAOS",
+    help="A query to send, labeled by its text. May be repeated."
+)
+stats_target_group = stats_parser.add_mutually_exclusive_group()
+stats_target_group.add_argument(
+    "--host", type=str,
+    help="Query a socket engine on this host"
+)
+stats_target_group.add_argument(
+    "--game-name", type=str, default="Docking Station",
+    help="Query a local engine by name"
+)
+stats_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+stats_parser.add_argument(
+    "--fake", action="store_true",
+    help="Start an in-process fake engine and query that"
+)
+stats_parser.add_argument(
+    "-n", "--requests", type=int, default=100,
+    help="How many times to send each query"
+)
+stats_parser.add_argument(
+    "--timeout", type=int, default=100,
+    help="How many ms to wait for each response"
+)
+stats_parser.add_argument(
+    "--format", choices=("json", "prometheus"), default="json"
+)
+stats_parser.add_argument(
+    "--record", type=str, metavar="LOG",
+    help="Also log the traffic for pyc2e replay"
+)
+
+replay_parser = subparsers.add_parser(
+    "replay", prog="replay",
+    help="Send the requests from a recorded log again"
+)
+replay_parser.add_argument(
+    "log", type=argparse.FileType('rb'),
+    help="A log written by start_recording or stats --record"
+)
+replay_speed_group = replay_parser.add_mutually_exclusive_group()
+replay_speed_group.add_argument(
+    "--speed", type=float, default=1.0,
+    help="How many times faster than recorded to send requests"
+)
+replay_speed_group.add_argument(
+    "--max-speed", action="store_true",
+    help="Send each request as soon as the last one is answered"
+)
+replay_target_group = replay_parser.add_mutually_exclusive_group()
+replay_target_group.add_argument(
+    "--host", type=str,
+    help="Replay against a socket engine on this host"
+)
+replay_target_group.add_argument(
+    "--game-name", type=str, default="Docking Station",
+    help="Replay against a local engine by name"
+)
+replay_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+replay_parser.add_argument(
+    "--fake", action="store_true",
+    help="Replay against an in-process fake socket engine"
+)
+replay_parser.add_argument(
+    "--fake-shared-memory", action="store_true",
+    help="Replay against an in-process emulated shared memory engine"
+)
+replay_parser.add_argument(
+    "--timeout", type=int, default=100,
+    help="How many ms to wait for each response"
+)
+replay_parser.add_argument(
+    "--format", choices=("table", "json"), default="table"
+)
+
+load_parser = subparsers.add_parser(
+    "load", prog="load",
+    help="Send queries at fixed rates and find where engines saturate"
+)
+load_parser.add_argument(
+    "--caos", action="append", dest="queries", default=[], metavar="CAOS",
+    help="A query to send, with weight 1. May be repeated."
+)
+load_parser.add_argument(
+    "--mix", action="append", nargs=2, default=[],
+    metavar=("WEIGHT", "CAOS"),
+    help="A query to send in proportion to its weight. May be repeated."
+)
+load_rate_group = load_parser.add_mutually_exclusive_group()
+load_rate_group.add_argument(
+    "--rate", type=float, nargs="+", default=[10.0],
+    help="Requests per second for each step"
+)
+load_rate_group.add_argument(
+    "--ramp", type=float, nargs=3, metavar=("START", "STOP", "STEP"),
+    help="Step the rate from START to STOP requests per second"
+)
+load_parser.add_argument(
+    "-t", "--step-duration", type=float, default=5.0,
+    help="How many seconds to send at each rate"
+)
+load_target_group = load_parser.add_mutually_exclusive_group()
+load_target_group.add_argument(
+    "--target", action="append", dest="targets", default=[],
+    metavar="HOST:PORT",
+    help="A socket engine to send to. May be repeated."
+)
+load_target_group.add_argument(
+    "--game-name", type=str, default="Docking Station",
+    help="Send to a local engine by name"
+)
+load_target_group.add_argument(
+    "--fake", type=int, default=0, metavar="N",
+    help="Start N in-process fake engines and send to those"
+)
+load_parser.add_argument(
+    "--fake-latency-ms", type=float, default=0.0,
+    help="How long the fake engines wait before answering"
+)
+load_parser.add_argument(
+    "--async", action="store_const", dest="mode",
+    const=MODE_ASYNC, default=MODE_SYNC,
+    help="Send from an event loop with AsyncUnixInterface"
+)
+load_parser.add_argument(
+    "--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+    help="The most requests to have outstanding at once"
+)
+load_parser.add_argument(
+    "--slo-ms", type=float, default=DEFAULT_SLO_MS,
+    help="Steps with a higher p99 latency count as saturated"
+)
+load_parser.add_argument(
+    "--stop-when-saturated", action="store_true",
+    help="Skip the rest of the ramp after the first saturated step"
+)
+load_parser.add_argument(
+    "--timeout", type=int, default=100,
+    help="How many ms to wait for each response"
+)
+load_parser.add_argument(
+    "--format", choices=("table", "json"), default="table"
+)
 
 
 def inject_from(
     args
 ) -> None:
     """
-    Inject CAOS from a stream or string source.
+    Inject CAOS from a stream, string, or .cos file source.
+
+    Files and directories are parsed and injected script by script,
+    ending with a summary. Other sources are run as a single request,
+    unless they're too big for the interface, in which case they're
+    split and summarized the same way.
 
     """
+    if args.caos is not None and args.directories:
+        inject_parser.error("argument --dir: not allowed with argument --caos")
 
-    data = args.caos or args.file.read()
-    response = None
-    if SCRIPT_START_STRING_REGEX.match(data):
-        response = pyc2e.execute_caos(data)
-    else:
-        response = pyc2e.execute_caos(data)
+    target = (args.host, args.port) if args.host else args.game_name
+    interface = interface_for_target(target, args.timeout)
+
+    if args.files or args.directories:
+        paths = find_cos_files(args.files, args.directories)
+        summary = inject_files(
+            interface,
+            paths,
+            max_batch_bytes=args.batch_bytes,
+            jobs=args.jobs
+        )
+        print(summary)
+        return
+
+    data = args.caos or sys.stdin.read()
+    limit = interface.max_request_size
+    if limit is not None and \
+            len(interface.execute_prefix) + len(data.encode("cp1252")) > limit:
+        print(inject_cos(interface, data, max_batch_bytes=args.batch_bytes))
+        return
+
+    response = interface.execute_caos(data)
+    if not SCRIPT_START_STRING_REGEX.match(data):
         print(response.text)
 
 
+def bench_from(
+    args
+) -> None:
+    """
+    Run a closed-loop benchmark and print the report.
+
+    """
+    queries = list(args.queries or [])
+    if args.file:
+        queries.append(args.file.read())
+    if not queries:
+        queries.append('outs "pyc2e"')
+
+    requests = args.requests
+    if requests is None and args.duration is None:
+        requests = 1000
+
+    fake_engine = None
+    interface_factory = None
+    target = None
+    if args.fake_shared_memory:
+        from pyc2e.interfaces.win32.emulated import EmulatedBackend
+        from pyc2e.testing import FakeSharedMemoryEngine
+        backend = EmulatedBackend(anonymous=hasattr(os, "memfd_create"))
+        fake_engine = FakeSharedMemoryEngine(backend=backend).start()
+
+        def interface_factory():
+            return fake_engine.interface(
+                wait_timeout_ms=args.timeout,
+                persistent=True,
+                # Zero-copy interfaces hold the engine between requests,
+                # which would leave all but one worker waiting
+                zero_copy=args.concurrency == 1
+            )
+    elif args.fake:
+        from pyc2e.testing import FakeEngineServer
+        fake_engine = FakeEngineServer().start()
+        target = fake_engine.address
+    elif args.host:
+        target = (args.host, args.port)
+    else:
+        target = args.game_name
+
+    try:
+        report = run_benchmark(
+            target,
+            queries,
+            requests=requests,
+            duration=args.duration,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            interface_factory=interface_factory
+        )
+    finally:
+        if fake_engine is not None:
+            fake_engine.stop()
+
+    if args.format == "json":
+        print(report.to_json())
+    else:
+        print(report.to_table())
+
+
+def stats_from(
+    args
+) -> None:
+    """
+    Send each query a number of times and print the collected metrics.
+
+    Failed requests are counted rather than stopping the run.
+
+    """
+    queries = list(args.queries or []) or ['outs "pyc2e"']
+
+    fake_engine = None
+    if args.fake:
+        from pyc2e.testing import FakeEngineServer
+        fake_engine = FakeEngineServer().start()
+        target = fake_engine.address
+    elif args.host:
+        target = (args.host, args.port)
+    else:
+        target = args.game_name
+
+    metrics = MetricsRegistry()
+    interface = None
+    try:
+        interface = interface_for_target(target, args.timeout)
+        metrics.attach(interface)
+        if args.record:
+            interface.start_recording(args.record)
+        for _ in range(args.requests):
+            for query in queries:
+                with metrics.label(query):
+                    try:
+                        interface.execute_caos(query)
+                    except Exception:
+                        pass
+    finally:
+        if args.record and interface is not None:
+            interface.stop_recording()
+        if fake_engine is not None:
+            fake_engine.stop()
+
+    if args.format == "prometheus":
+        print(metrics.to_prometheus(), end="")
+    else:
+        print(metrics.to_json())
+
+
+def replay_from(
+    args
+) -> None:
+    """
+    Replay a recorded log and print how it compares to the recording.
+
+    """
+    fake_engine = None
+    if args.fake_shared_memory:
+        from pyc2e.testing import FakeSharedMemoryEngine
+        fake_engine = FakeSharedMemoryEngine().start()
+        interface = fake_engine.interface(
+            wait_timeout_ms=args.timeout, persistent=True)
+    elif args.fake:
+        from pyc2e.testing import FakeEngineServer
+        fake_engine = FakeEngineServer().start()
+        interface = interface_for_target(fake_engine.address, args.timeout)
+    elif args.host:
+        interface = interface_for_target(
+            (args.host, args.port), args.timeout)
+    else:
+        interface = interface_for_target(args.game_name, args.timeout)
+
+    try:
+        report = replay(
+            read_records(args.log),
+            interface,
+            speed=None if args.max_speed else args.speed
+        )
+    finally:
+        args.log.close()
+        if interface.connected:
+            interface.disconnect()
+        if fake_engine is not None:
+            fake_engine.stop()
+
+    if args.format == "json":
+        print(report.to_json())
+    else:
+        print(report.to_table())
+
+
+def load_from(
+    args
+) -> None:
+    """
+    Run an open-loop load test and print the report.
+
+    """
+    weighted = [(float(weight), caos) for weight, caos in args.mix]
+    weighted.extend((1.0, caos) for caos in args.queries)
+    if not weighted:
+        weighted.append((1.0, 'outs "pyc2e"'))
+    mix = QueryMix(weighted)
+
+    if args.ramp:
+        start, stop, step = args.ramp
+        if step <= 0:
+            raise SystemExit("--ramp STEP must be positive")
+        count = int(round((stop - start) / step)) + 1
+        rates = [start + i * step for i in range(count)]
+    else:
+        rates = args.rate
+
+    fake_engines = []
+    if args.fake:
+        from pyc2e.testing import FakeEngineServer
+        for _ in range(args.fake):
+            fake_engines.append(FakeEngineServer(
+                latency_ms=args.fake_latency_ms).start())
+        targets = [engine.address for engine in fake_engines]
+    elif args.targets:
+        targets = []
+        for target in args.targets:
+            host, _, port = target.rpartition(":")
+            targets.append((host or "127.0.0.1", int(port)))
+    else:
+        targets = [args.game_name]
+
+    try:
+        report = run_load(
+            targets,
+            mix,
+            rates,
+            args.step_duration,
+            mode=args.mode,
+            max_in_flight=args.max_in_flight,
+            timeout=args.timeout,
+            slo_ms=args.slo_ms,
+            stop_when_saturated=args.stop_when_saturated
+        )
+    finally:
+        for engine in fake_engines:
+            engine.stop()
+
+    if args.format == "json":
+        print(report.to_json())
+    else:
+        print(report.to_table())
+
+
 def main() -> None:
     args = root_parser.parse_args()
-    if args.command == "inject":
+    if args.command in ("inject", "inj"):
         inject_from(args)
+    elif args.command == "bench":
+        bench_from(args)
+    elif args.command == "stats":
+        stats_from(args)
+    elif args.command == "replay":
+        replay_from(args)
+    elif args.command == "load":
+        load_from(args)
+
+
+if __name__ == "__main__":
+    main()
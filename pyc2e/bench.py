@@ -0,0 +1,209 @@
+"""
+Closed-loop benchmarking of engine round trips.
+
+A fixed number of workers each send a request, wait for the answer, and
+send the next one until the request count or time limit runs out.
+"""
+import json
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from pyc2e.fan_out import EngineTarget, interface_for_target
+from pyc2e.interfaces.interface import (
+    C2eCaosInterface,
+    StrOrByteString,
+    coerce_to_bytearray
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted sequence.
+
+    :param sorted_values: values in ascending order.
+    :param percent: a percentage from 0 to 100.
+    :return: the value at that rank, or 0.0 for an empty sequence.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(len(sorted_values) * percent / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class BenchmarkReport:
+    """
+    Totals and latency samples gathered during a benchmark run.
+
+    Latencies are stored in seconds and reported in milliseconds.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.elapsed = 0.0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + sum(self.errors.values())
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> Dict[str, object]:
+        """
+        Build a JSON-friendly summary of the run.
+
+        :return:
+        """
+        ordered = sorted(self.latencies)
+        latency_ms = {
+            f"p{p}": percentile(ordered, p) * 1000 for p in PERCENTILES
+        }
+        latency_ms["max"] = ordered[-1] * 1000 if ordered else 0.0
+        latency_ms["mean"] = \
+            sum(ordered) / len(ordered) * 1000 if ordered else 0.0
+
+        return {
+            "requests": self.requests,
+            "succeeded": len(self.latencies),
+            "errors": sum(self.errors.values()),
+            "errors_by_type": dict(self.errors),
+            "concurrency": self.concurrency,
+            "elapsed_s": self.elapsed,
+            "requests_per_second": self.requests_per_second,
+            "latency_ms": latency_ms,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), indent=2)
+
+    def to_table(self) -> str:
+        summary = self.summary()
+        rows = [
+            ("requests", summary["requests"]),
+            ("errors", summary["errors"]),
+            ("concurrency", summary["concurrency"]),
+            ("elapsed (s)", "%.3f" % summary["elapsed_s"]),
+            ("requests/s", "%.1f" % summary["requests_per_second"]),
+        ]
+        rows.extend(
+            (f"latency {name} (ms)", "%.3f" % value)
+            for name, value in summary["latency_ms"].items()
+        )
+        rows.append(("bytes in", summary["bytes_in"]))
+        rows.append(("bytes out", summary["bytes_out"]))
+        rows.extend(
+            (f"  {name}", count)
+            for name, count in summary["errors_by_type"].items()
+        )
+
+        width = max(len(name) for name, _ in rows)
+        return "\n".join(f"{name:<{width}}  {value}" for name, value in rows)
+
+
+def run_benchmark(
+        target: EngineTarget,
+        queries: Sequence[StrOrByteString],
+        requests: Optional[int] = None,
+        duration: Optional[float] = None,
+        concurrency: int = 1,
+        timeout: int = 100,
+        interface_factory: Optional[Callable[[], C2eCaosInterface]] = None
+) -> BenchmarkReport:
+    """
+    Send queries at an engine from several workers and time each one.
+
+    Queries are sent round-robin. The run stops once the request count
+    or the duration in seconds is reached, whichever comes first. At
+    least one of them must be given.
+
+    Each worker creates one interface and sends all of its requests
+    through it.
+
+    :param target: a game name or a (host, port) pair. Ignored if
+        interface_factory is given.
+    :param queries: the CAOS workload to cycle through.
+    :param requests: how many requests to send in total.
+    :param duration: how many seconds to keep sending for.
+    :param concurrency: how many requests to keep in flight.
+    :param timeout: How many ms to wait for each engine response
+    :param interface_factory: creates each worker's interface, for
+        interfaces interface_for_target can't build.
+    :return: a report of everything that happened.
+    """
+    if requests is None and duration is None:
+        raise ValueError("Either requests or duration must be given")
+    if not queries:
+        raise ValueError("At least one query is required")
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    encoded = [bytes(coerce_to_bytearray(q)) for q in queries]
+    report = BenchmarkReport(concurrency)
+    lock = threading.Lock()
+    issued = 0
+
+    start = time.perf_counter()
+    deadline = None if duration is None else start + duration
+
+    def claim() -> Optional[int]:
+        nonlocal issued
+        with lock:
+            if requests is not None and issued >= requests:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            issued += 1
+            return issued - 1
+
+    def worker() -> None:
+        if interface_factory is not None:
+            interface = interface_factory()
+        else:
+            interface = interface_for_target(target, timeout)
+
+        try:
+            while True:
+                number = claim()
+                if number is None:
+                    return
+                query = encoded[number % len(encoded)]
+                sent = time.perf_counter()
+                try:
+                    response = interface.execute_caos(query)
+                    received = len(response.view)
+                except Exception as e:
+                    with lock:
+                        name = type(e).__name__
+                        report.errors[name] = report.errors.get(name, 0) + 1
+                    continue
+                latency = time.perf_counter() - sent
+                with lock:
+                    report.latencies.append(latency)
+                    report.bytes_out += len(query)
+                    report.bytes_in += received
+        finally:
+            if interface.connected:
+                interface.disconnect()
+
+    workers = [
+        threading.Thread(target=worker, name=f"bench-{i}", daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    report.elapsed = time.perf_counter() - start
+    return report
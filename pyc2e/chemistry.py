@@ -0,0 +1,327 @@
+"""
+Sampling every creature's chemistry in one request per tick.
+
+A ChemistrySampler sends a single enum query which prints all 256
+chemical levels of every creature, then stores each creature's levels
+in a preallocated ring buffer. Memory depends only on the history
+length and the number of creatures alive, so a sampler can run for as
+long as a breeding experiment does::
+
+    sampler = ChemistrySampler(interface, history=600)
+    sampler.run(rate_hz=10, duration=60)
+    glycogen = sampler.creatures[unid].series(GLYCOGEN)
+
+Levels can be averaged over several ticks before they're stored, and an
+export hook sees every stored sample, for writing them somewhere more
+permanent.
+"""
+import threading
+import time
+from array import array
+from operator import add
+from typing import (
+    TYPE_CHECKING,
+    ByteString,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple
+)
+
+from pyc2e.common import QueryError
+
+if TYPE_CHECKING:
+    from pyc2e.interfaces.interface import C2eCaosInterface
+
+CHEMICAL_COUNT = 256
+CREATURE_FAMILY = 4
+# Each creature's output is its UNID followed by its chemical levels
+ROW_WIDTH = CHEMICAL_COUNT + 1
+
+# Called with a sample's timestamp and each creature's levels
+ExportHook = Callable[[float, Dict[int, memoryview]], None]
+
+
+def build_chemistry_query(family: int = CREATURE_FAMILY) -> bytes:
+    """
+    Build the query printing every creature's UNID and chemical levels.
+
+    A reps loop keeps the query short instead of spelling out 256 chem
+    calls.
+
+    :param family: the family creatures belong to.
+    :return: cp1252 CAOS.
+    """
+    return (
+        f'enum {family} 0 0 outv unid outs " " setv va00 0'
+        f' reps {CHEMICAL_COUNT} outv chem va00 outs " " addv va00 1 repe'
+        f' next'
+    ).encode("cp1252")
+
+
+def parse_chemistry(data: ByteString) -> Tuple[List[int], array]:
+    """
+    Parse the output of a query from build_chemistry_query.
+
+    :param data: the response data, or a view of it.
+    :return: the UNIDs, and every creature's levels one after another
+        in the same order, CHEMICAL_COUNT each.
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    values = data.split()
+    if len(values) % ROW_WIDTH:
+        raise QueryError(
+            f"Expected {ROW_WIDTH} values per creature, but got"
+            f" {len(values)} values: {data[:200]!r}"
+        )
+
+    try:
+        unids = list(map(int, values[::ROW_WIDTH]))
+        del values[::ROW_WIDTH]
+        levels = array("f", map(float, values))
+    except ValueError as e:
+        raise QueryError(f"Couldn't parse chemistry output: {e}") from e
+    return unids, levels
+
+
+class ChemistryHistory:
+    """
+    The most recent chemistry samples of one creature.
+
+    Samples are kept in one preallocated array('f'), overwriting the
+    oldest once it's full.
+
+    :param length: how many samples to keep.
+    """
+
+    def __init__(self, length: int):
+        if length < 1:
+            raise ValueError("length must be at least 1")
+        self.length = length
+        self.levels = array("f", bytes(4 * CHEMICAL_COUNT * length))
+        self.times = array("d", bytes(8 * length))
+        # How many samples were ever appended
+        self.count = 0
+        self._view = memoryview(self.levels)
+
+    def __len__(self) -> int:
+        return min(self.count, self.length)
+
+    def append(self, timestamp: float, levels) -> None:
+        """
+        Store a sample, replacing the oldest if the history is full.
+
+        :param timestamp: when the sample was taken.
+        :param levels: CHEMICAL_COUNT floats, as an array('f') or a
+            view of one.
+        """
+        slot = self.count % self.length
+        start = slot * CHEMICAL_COUNT
+        self._view[start:start + CHEMICAL_COUNT] = levels
+        self.times[slot] = timestamp
+        self.count += 1
+
+    def _in_order(self, values: array, stride: int, offset: int) -> array:
+        """
+        Pick every stride-th value starting at offset, oldest first.
+        """
+        used = len(self)
+        if self.count <= self.length:
+            return values[offset:used * stride:stride]
+        split = (self.count % self.length) * stride
+        return values[split + offset::stride] + values[offset:split:stride]
+
+    def latest(self) -> Optional[array]:
+        """
+        The most recent sample.
+
+        :return: a copy of its levels, or None if there are none yet.
+        """
+        if not self.count:
+            return None
+        start = ((self.count - 1) % self.length) * CHEMICAL_COUNT
+        return self.levels[start:start + CHEMICAL_COUNT]
+
+    def series(self, chemical: int) -> array:
+        """
+        One chemical's level in every kept sample, oldest first.
+
+        :param chemical: the chemical number, from 0 to 255.
+        :return:
+        """
+        if not 0 <= chemical < CHEMICAL_COUNT:
+            raise ValueError(
+                f"chemical must be from 0 to {CHEMICAL_COUNT - 1}")
+        return self._in_order(self.levels, CHEMICAL_COUNT, chemical)
+
+    def timestamps(self) -> array:
+        """When each kept sample was taken, oldest first."""
+        return self._in_order(self.times, 1, 0)
+
+
+class ChemistrySampler:
+    """
+    Keeps recent chemistry for every creature, one request per tick.
+
+    Creatures which are missing from a sample, because they died or
+    left the world, are dropped along with their history. Use the
+    export hook to keep anything past the history length.
+
+    :param interface: the interface to query through.
+    :param history: how many stored samples to keep per creature.
+    :param downsample: how many ticks to average into each stored
+        sample. 1 stores every tick.
+    :param export: called with the timestamp and each creature's levels
+        as float32 memoryviews whenever samples are stored. It runs on
+        the sampling thread.
+    :param family: the family creatures belong to.
+    :param clock: returns the current time in seconds.
+    """
+
+    def __init__(
+            self,
+            interface: "C2eCaosInterface",
+            history: int = 600,
+            downsample: int = 1,
+            export: Optional[ExportHook] = None,
+            family: int = CREATURE_FAMILY,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        if history < 1:
+            raise ValueError("history must be at least 1")
+        if downsample < 1:
+            raise ValueError("downsample must be at least 1")
+
+        self.interface = interface
+        self.history = history
+        self.downsample = downsample
+        self.export = export
+        self.query = build_chemistry_query(family)
+        self.creatures: Dict[int, ChemistryHistory] = {}
+        self.ticks = 0
+        # Ticks run() skipped because a sample took too long
+        self.missed_ticks = 0
+
+        self._clock = clock
+        # Running sums and tick counts for the current downsampling window
+        self._sums: Dict[int, array] = {}
+        self._counts: Dict[int, int] = {}
+
+    def sample(self) -> Dict[int, memoryview]:
+        """
+        Take one sample of every creature's chemistry.
+
+        :return: each creature's levels as a float32 memoryview, before
+            any downsampling.
+        """
+        timestamp = self._clock()
+        response = self.interface.execute_caos(self.query)
+        if response.error:
+            raise QueryError(f"Chemistry query failed: {response.text}")
+        unids, levels = parse_chemistry(response.view)
+
+        view = memoryview(levels)
+        sample = {
+            unid: view[index * CHEMICAL_COUNT:(index + 1) * CHEMICAL_COUNT]
+            for index, unid in enumerate(unids)
+        }
+        for unid in self.creatures.keys() - sample.keys():
+            del self.creatures[unid]
+            self._sums.pop(unid, None)
+            self._counts.pop(unid, None)
+
+        self.ticks += 1
+        if self.downsample == 1:
+            self._store(timestamp, sample)
+        else:
+            self._accumulate(sample)
+            if self.ticks % self.downsample == 0:
+                self._store(timestamp, self._averages())
+        return sample
+
+    def _accumulate(self, sample: Dict[int, memoryview]) -> None:
+        sums = self._sums
+        counts = self._counts
+        for unid, levels in sample.items():
+            total = sums.get(unid)
+            if total is None:
+                sums[unid] = array("d", levels)
+                counts[unid] = 1
+            else:
+                sums[unid] = array("d", map(add, total, levels))
+                counts[unid] += 1
+
+    def _averages(self) -> Dict[int, memoryview]:
+        averages = {}
+        for unid, total in self._sums.items():
+            count = self._counts[unid]
+            averages[unid] = memoryview(
+                array("f", (level / count for level in total)))
+        self._sums = {}
+        self._counts = {}
+        return averages
+
+    def _store(self, timestamp: float, sample: Dict[int, memoryview]) -> None:
+        creatures = self.creatures
+        for unid, levels in sample.items():
+            history = creatures.get(unid)
+            if history is None:
+                history = creatures[unid] = ChemistryHistory(self.history)
+            history.append(timestamp, levels)
+        if self.export is not None:
+            self.export(timestamp, sample)
+
+    def run(
+            self,
+            rate_hz: float,
+            duration: Optional[float] = None,
+            stop: Optional[threading.Event] = None
+    ) -> int:
+        """
+        Sample at a fixed rate until the duration passes or stop is set.
+
+        Ticks are scheduled from the start time, so slow samples don't
+        make the rate drift. Ticks which are already over by the time
+        the previous sample finishes are skipped and counted in
+        missed_ticks.
+
+        :param rate_hz: samples per second.
+        :param duration: how many seconds to sample for, or None to run
+            until stop is set.
+        :param stop: set it from another thread to stop sampling.
+        :return: how many samples were taken.
+        """
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be positive")
+        if duration is None and stop is None:
+            raise ValueError("Either duration or stop must be given")
+
+        interval = 1 / rate_hz
+        start = time.perf_counter()
+        deadline = None if duration is None else start + duration
+        tick = 0
+        taken = 0
+        while stop is None or not stop.is_set():
+            due = start + tick * interval
+            if deadline is not None and due >= deadline:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                if stop is not None:
+                    if stop.wait(delay):
+                        break
+                else:
+                    time.sleep(delay)
+
+            self.sample()
+            taken += 1
+
+            behind = int((time.perf_counter() - start) / interval)
+            if behind > tick + 1:
+                self.missed_ticks += behind - tick - 1
+                tick = behind
+            else:
+                tick += 1
+        return taken
@@ -58,3 +58,17 @@ class QueryError(InterfaceException):
     with running the query.
     """
     pass
+
+
+class RequestTimeout(InterfaceException):
+    """
+    The engine didn't finish answering before the request's deadline.
+    """
+    pass
+
+
+class StreamConsumed(InterfaceException):
+    """
+    A streaming response's body was already read through an iterator.
+    """
+    pass
@@ -0,0 +1,208 @@
+"""
+Split .cos files into their install, scrp, and rscr sections.
+
+A .cos file holds three kinds of CAOS:
+
+* install code, which is anything outside of the other two kinds
+* event scripts, each headed by ``scrp f g s e`` and ended by ``endm``
+* a remove script, which is everything after a bare ``rscr``
+
+The parser makes a single pass over the file with one compiled regex.
+It only stops on the three keywords and on the things which can hide
+them, which are comments, string literals, and byte strings.
+"""
+import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+INSTALL = "install"
+SCRIPT = "scrp"
+REMOVE = "rscr"
+
+Classifier = Tuple[int, int, int, int]
+
+_TOKEN_REGEX = re.compile(
+    r'(?P<comment>(?<!\S)\*[^\n]*)'
+    r'|(?P<string>"(?:[^"\\\n]|\\.)*")'
+    r'|(?P<unterminated>"[^\n]*)'
+    r'|(?P<bytestring>\[[^\]]*\])'
+    r'|(?<!\S)(?P<keyword>scrp|endm|rscr)(?!\S)',
+    re.IGNORECASE
+)
+_CLASSIFIER_REGEX = re.compile(r'\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)(?!\S)')
+_CODE_LINE_REGEX = re.compile(r'^[ \t\r]*[^\s*]', re.MULTILINE)
+
+
+class CosParseError(ValueError):
+    """
+    The file isn't structured the way a .cos file should be.
+    """
+
+    def __init__(self, message: str, line: int):
+        super().__init__(f"line {line}: {message}")
+        self.message = message
+        self.line = line
+
+
+class CosSection(NamedTuple):
+    """
+    One section of a .cos file.
+
+    Lines are 1-based and inclusive. Offsets index into the parsed text,
+    with end being exclusive.
+
+    For scripts, body excludes the scrp header and the endm, which is
+    what add_script expects. For the remove script, it excludes the rscr
+    keyword. For install code, it is the same as text.
+    """
+    kind: str
+    text: str
+    body: str
+    start: int
+    end: int
+    start_line: int
+    end_line: int
+    classifier: Optional[Classifier] = None
+
+
+def _has_code(text: str) -> bool:
+    """Whether there's anything besides whitespace and comments."""
+    return _CODE_LINE_REGEX.search(text) is not None
+
+
+def parse_cos(text: str) -> Iterator[CosSection]:
+    """
+    Yield the sections of a .cos file in the order they appear.
+
+    Install code between scripts is yielded as separate sections, and
+    sections holding only whitespace or comments are skipped.
+
+    :param text: the contents of a .cos file.
+    :return: an iterator of CosSection objects.
+    """
+    line = 1
+    line_position = 0
+
+    def line_at(position: int) -> int:
+        # positions only ever increase, so counting is a single pass
+        nonlocal line, line_position
+        line += text.count("\n", line_position, position)
+        line_position = position
+        return line
+
+    install_start = 0
+    script_start: Optional[int] = None
+    script_line = 0
+    body_start = 0
+    classifier: Optional[Classifier] = None
+
+    def install_section(end: int) -> Optional[CosSection]:
+        chunk = text[install_start:end]
+        if not _has_code(chunk):
+            return None
+        stripped = chunk.strip()
+        start = install_start + chunk.index(stripped[0])
+        start_line = line_at(start)
+        return CosSection(
+            INSTALL, stripped, stripped,
+            start, start + len(stripped),
+            start_line, start_line + stripped.count("\n")
+        )
+
+    position = 0
+    while True:
+        match = _TOKEN_REGEX.search(text, position)
+        if match is None:
+            break
+        position = match.end()
+        kind = match.lastgroup
+
+        if kind == "unterminated":
+            raise CosParseError(
+                "unterminated string literal", line_at(match.start()))
+        if kind != "keyword":
+            continue
+
+        keyword = match.group("keyword").lower()
+        start = match.start()
+
+        if keyword == "scrp":
+            if script_start is not None:
+                raise CosParseError(
+                    "scrp inside another script", line_at(start))
+            header = _CLASSIFIER_REGEX.match(text, position)
+            if header is None:
+                raise CosParseError(
+                    "scrp must be followed by four numbers", line_at(start))
+
+            section = install_section(start)
+            if section is not None:
+                yield section
+
+            classifier = tuple(int(n) for n in header.groups())
+            script_start = start
+            script_line = line_at(start)
+            body_start = position = header.end()
+
+        elif keyword == "endm":
+            if script_start is None:
+                raise CosParseError("endm outside of a script", line_at(start))
+
+            yield CosSection(
+                SCRIPT,
+                text[script_start:position],
+                text[body_start:start].strip(),
+                script_start, position,
+                script_line, line_at(start),
+                classifier
+            )
+            script_start = None
+            install_start = position
+
+        else:  # rscr
+            if script_start is not None:
+                raise CosParseError(
+                    "rscr inside a script", line_at(start))
+
+            section = install_section(start)
+            if section is not None:
+                yield section
+
+            remove_text = text[start:].rstrip()
+            start_line = line_at(start)
+            yield CosSection(
+                REMOVE,
+                remove_text,
+                text[position:].strip(),
+                start, start + len(remove_text),
+                start_line, start_line + remove_text.count("\n")
+            )
+            return
+
+    if script_start is not None:
+        raise CosParseError("scrp without a matching endm", script_line)
+
+    section = install_section(len(text))
+    if section is not None:
+        yield section
+
+
+def split_cos(
+        text: str
+) -> Tuple[List[CosSection], List[CosSection], Optional[CosSection]]:
+    """
+    Group the sections of a .cos file by kind.
+
+    :param text: the contents of a .cos file.
+    :return: install sections, scripts, and the remove script if any.
+    """
+    install: List[CosSection] = []
+    scripts: List[CosSection] = []
+    remove: Optional[CosSection] = None
+    for section in parse_cos(text):
+        if section.kind == SCRIPT:
+            scripts.append(section)
+        elif section.kind == INSTALL:
+            install.append(section)
+        else:
+            remove = section
+    return install, scripts, remove
@@ -0,0 +1,195 @@
+"""
+Run CAOS against many engines at once from a bounded thread pool.
+
+Targets may be (host, port) pairs, which are reached through
+UnixInterface, or game names, which use the platform's default
+interface type like pyc2e.execute_caos does.
+"""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
+
+from pyc2e.interfaces import (
+    DEFAULT_INTERFACE_TYPE,
+    SUPPORTED,
+    UnixInterface
+)
+from pyc2e.interfaces.interface import C2eCaosInterface, StrOrByteString
+from pyc2e.interfaces.response import Response
+
+EngineTarget = Union[str, Tuple[str, int]]
+
+
+class EngineResult(NamedTuple):
+    """
+    The outcome of running one query against one target.
+
+    Exactly one of response and error will be set.
+    """
+    target: EngineTarget
+    index: int
+    query: StrOrByteString
+    response: Optional[Response]
+    error: Optional[BaseException]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def interface_for_target(
+        target: EngineTarget,
+        timeout: int = 100
+) -> C2eCaosInterface:
+    """
+    Build an unconnected interface for the given target.
+
+    :param target: a game name or a (host, port) pair.
+    :param timeout: How many ms to wait for the engine's response
+    :return:
+    """
+    if isinstance(target, str):
+        interface_class = SUPPORTED[DEFAULT_INTERFACE_TYPE]
+        return interface_class(game_name=target, wait_timeout_ms=timeout)
+
+    host, port = target
+    return UnixInterface(port=port, host=host, wait_timeout_ms=timeout)
+
+
+class FanOutExecutor:
+    """
+    Send queries to a list of engines with a bounded in-flight window.
+
+    Each target runs its queries one at a time and in order, so a
+    script bundle still installs in sequence on every engine. Different
+    targets run in parallel, with at most max_in_flight requests
+    outstanding across all of them.
+
+    :param targets: game names or (host, port) pairs to send queries to.
+    :param max_in_flight: the most requests allowed to run at once.
+    :param timeout: How many ms to wait for each engine's response
+    """
+
+    def __init__(
+            self,
+            targets: Sequence[EngineTarget],
+            max_in_flight: int = 8,
+            timeout: int = 100
+    ):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.targets: List[EngineTarget] = list(targets)
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+    def _run_one(self, target: EngineTarget, query: StrOrByteString) -> Response:
+        with interface_for_target(target, self.timeout) as interface:
+            return interface.execute_caos(query)
+
+    def execute_caos(
+            self,
+            queries: Union[StrOrByteString, Iterable[StrOrByteString]]
+    ) -> Iterator[EngineResult]:
+        """
+        Run one query or a stream of queries against every target.
+
+        Results are yielded as they complete rather than in submission
+        order. The query stream is consumed lazily, so it may be a
+        generator of unbounded length.
+
+        :param queries: a single query or an iterable of them.
+        :return: an iterator of EngineResult objects.
+        """
+        if isinstance(queries, (str, bytes, bytearray)):
+            queries = (queries,)
+
+        query_iter = iter(queries)
+        # Queries are kept only until every target has run them
+        pulled: Dict[int, StrOrByteString] = {}
+        runs_left: Dict[int, int] = {}
+        num_pulled = 0
+        exhausted = False
+
+        def query_at(index: int) -> Optional[StrOrByteString]:
+            nonlocal exhausted, num_pulled
+            while num_pulled <= index and not exhausted:
+                try:
+                    pulled[num_pulled] = next(query_iter)
+                    runs_left[num_pulled] = len(self.targets)
+                    num_pulled += 1
+                except StopIteration:
+                    exhausted = True
+            return pulled.get(index)
+
+        next_index = [0] * len(self.targets)
+        idle = list(range(len(self.targets)))
+        in_flight: Dict[Future, Tuple[int, int]] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            while True:
+                still_idle = []
+                for target_index in idle:
+                    if len(in_flight) >= self.max_in_flight:
+                        still_idle.append(target_index)
+                        continue
+                    query_index = next_index[target_index]
+                    query = query_at(query_index)
+                    if query is None:
+                        continue  # this target has run every query
+                    future = pool.submit(
+                        self._run_one, self.targets[target_index], query)
+                    in_flight[future] = (target_index, query_index)
+                idle = still_idle
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    target_index, query_index = in_flight.pop(future)
+                    query = pulled[query_index]
+                    runs_left[query_index] -= 1
+                    if not runs_left[query_index]:
+                        del runs_left[query_index]
+                        del pulled[query_index]
+
+                    next_index[target_index] = query_index + 1
+                    idle.append(target_index)
+
+                    error = future.exception()
+                    yield EngineResult(
+                        self.targets[target_index],
+                        query_index,
+                        query,
+                        None if error else future.result(),
+                        error
+                    )
+
+
+def fan_out(
+        queries: Union[StrOrByteString, Iterable[StrOrByteString]],
+        targets: Sequence[EngineTarget],
+        max_in_flight: int = 8,
+        timeout: int = 100
+) -> Iterator[EngineResult]:
+    """
+    Easy mode for running queries against several engines at once.
+
+    :param queries: a single query or an iterable of them.
+    :param targets: game names or (host, port) pairs to send queries to.
+    :param max_in_flight: the most requests allowed to run at once.
+    :param timeout: How many ms to wait for each engine's response
+    :return: an iterator of EngineResult objects in completion order.
+    """
+    executor = FanOutExecutor(targets, max_in_flight, timeout)
+    return executor.execute_caos(queries)
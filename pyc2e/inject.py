@@ -0,0 +1,360 @@
+"""
+Bulk injection of .cos files.
+
+Files are read and parsed in parallel worker processes, then their
+scripts are sent to the engine in size-limited batches. Install code
+runs after all scripts have been added, as it does when the engine
+loads a .cos file, with each file's install code joined into one
+request. Remove scripts are skipped.
+
+inject_cos does the same for COS text which is too big to send as one
+request, splitting it on scrp boundaries.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import (
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
+
+from pyc2e.common import InputTooLong
+from pyc2e.cos import INSTALL, REMOVE, SCRIPT, CosSection, parse_cos
+from pyc2e.interfaces.interface import C2eCaosInterface
+
+DEFAULT_BATCH_BYTES = 64 * 1024
+COS_FILE_ENCODING = "cp1252"
+
+PathLike = Union[str, Path]
+
+
+class ParsedFile(NamedTuple):
+    """
+    A .cos file and its sections, or the reason it couldn't be parsed.
+    """
+    path: str
+    sections: List[CosSection]
+    error: Optional[str] = None
+
+
+class InjectionSummary:
+    """
+    Counts of what happened during a bulk injection.
+
+    Remove scripts are counted as skipped. Files which couldn't be read
+    or parsed are listed in failed_files.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.failed_files: List[Tuple[str, str]] = []
+        self.injected = 0
+        self.failed: List[Tuple[str, str]] = []
+        self.skipped = 0
+        self.install_blocks = 0
+        self.elapsed = 0.0
+
+    def __str__(self) -> str:
+        lines = [
+            f"files:     {self.files} ({len(self.failed_files)} unreadable)",
+            f"injected:  {self.injected}",
+            f"failed:    {len(self.failed)}",
+            f"skipped:   {self.skipped}",
+            f"install:   {self.install_blocks} blocks",
+            f"time:      {self.elapsed:.3f}s",
+        ]
+        lines.extend(
+            f"  unreadable {path}: {error}"
+            for path, error in self.failed_files
+        )
+        lines.extend(
+            f"  failed {where}: {message}"
+            for where, message in self.failed
+        )
+        return "\n".join(lines)
+
+
+def find_cos_files(
+        files: Iterable[PathLike] = (),
+        directories: Iterable[PathLike] = ()
+) -> List[str]:
+    """
+    Collect file paths, expanding directories to the .cos files in them.
+
+    Directories are searched recursively, and their files are sorted so
+    injection order is predictable.
+
+    :param files: paths to individual files.
+    :param directories: directories to search for .cos files.
+    :return:
+    """
+    paths = [str(path) for path in files]
+    for directory in directories:
+        paths.extend(
+            str(path) for path in sorted(Path(directory).rglob("*"))
+            if path.suffix.lower() == ".cos" and path.is_file()
+        )
+    return paths
+
+
+def parse_file(path: PathLike) -> ParsedFile:
+    """
+    Read and parse a single .cos file, capturing any error.
+
+    :param path: the file to parse.
+    :return:
+    """
+    try:
+        with open(path, "r", encoding=COS_FILE_ENCODING) as file:
+            return ParsedFile(str(path), list(parse_cos(file.read())))
+    except (OSError, ValueError) as e:
+        return ParsedFile(str(path), [], str(e))
+
+
+def parse_files(
+        paths: Sequence[PathLike],
+        jobs: Optional[int] = None
+) -> List[ParsedFile]:
+    """
+    Parse files in parallel worker processes, keeping their order.
+
+    :param paths: the files to parse.
+    :param jobs: how many processes to use. Defaults to the CPU count.
+        With one job or one file, everything runs in this process.
+    :return:
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) < 2:
+        return [parse_file(path) for path in paths]
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        return list(pool.map(parse_file, paths, chunksize=4))
+
+
+def plan_batches(
+        scripts: Sequence[Tuple[str, CosSection]],
+        max_batch_bytes: int = DEFAULT_BATCH_BYTES
+) -> List[List[Tuple[str, CosSection]]]:
+    """
+    Group scripts into batches no bigger than max_batch_bytes.
+
+    A script bigger than the limit gets a batch of its own.
+
+    :param scripts: (path, section) pairs in injection order.
+    :param max_batch_bytes: roughly how many bytes of CAOS per request.
+    :return:
+    """
+    batches: List[List[Tuple[str, CosSection]]] = []
+    current: List[Tuple[str, CosSection]] = []
+    current_size = 0
+    for item in scripts:
+        size = len(item[1].text)
+        if current and current_size + size > max_batch_bytes:
+            batches.append(current)
+            current, current_size = [], 0
+        current.append(item)
+        current_size += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def inject_files(
+        interface: C2eCaosInterface,
+        paths: Sequence[PathLike],
+        max_batch_bytes: int = DEFAULT_BATCH_BYTES,
+        jobs: Optional[int] = None
+) -> InjectionSummary:
+    """
+    Parse .cos files and inject their scripts and install code.
+
+    The interface doesn't need to be connected beforehand.
+
+    :param interface: the engine to inject into.
+    :param paths: .cos files, in the order they should be injected.
+    :param max_batch_bytes: roughly how many bytes of scripts to send
+        per request on interfaces which support batching.
+    :param jobs: how many processes to parse with.
+    :return: a summary of what was injected.
+    """
+    start = time.perf_counter()
+    summary = inject_parsed(
+        interface, parse_files(paths, jobs), max_batch_bytes)
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def inject_cos(
+        interface: C2eCaosInterface,
+        text: str,
+        name: str = "<caos>",
+        max_batch_bytes: int = DEFAULT_BATCH_BYTES
+) -> InjectionSummary:
+    """
+    Inject COS text as several requests, split on scrp boundaries.
+
+    Use this for COS which is too big for the interface to take in one
+    request, such as a large agent's install script. Results are
+    reported per section in the summary, as they are for files.
+
+    :param interface: the engine to inject into.
+    :param text: the contents of a .cos file.
+    :param name: what to call the text in the summary.
+    :param max_batch_bytes: roughly how many bytes of scripts to send
+        per request on interfaces which support batching.
+    :return: a summary of what was injected.
+    """
+    start = time.perf_counter()
+    try:
+        parsed = ParsedFile(name, list(parse_cos(text)))
+    except ValueError as e:
+        parsed = ParsedFile(name, [], str(e))
+    summary = inject_parsed(interface, [parsed], max_batch_bytes)
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def _add_batch(
+        interface: C2eCaosInterface,
+        batch: Sequence[Tuple[str, CosSection]],
+        summary: InjectionSummary
+) -> None:
+    """
+    Add a batch of scripts, recording each one's outcome.
+
+    If the batch as a whole raises, such as with InputTooLong for a
+    script too big for the transport, its scripts are retried one at a
+    time so only the script at fault is reported as failed.
+    """
+    try:
+        responses = interface.add_scripts(
+            [(section.body, *section.classifier) for _, section in batch])
+    except Exception as e:
+        if len(batch) > 1 and isinstance(e, InputTooLong):
+            for item in batch:
+                _add_batch(interface, [item], summary)
+            return
+        for path, section in batch:
+            summary.failed.append((f"{path}:{section.start_line}", str(e)))
+        return
+
+    for (path, section), response in zip(batch, responses):
+        if response.error or (response.error is None and response.text):
+            summary.failed.append(
+                (f"{path}:{section.start_line}", response.text.strip()))
+        else:
+            summary.injected += 1
+
+
+def plan_install_requests(
+        sections: Sequence[CosSection],
+        max_request_size: Optional[int] = None,
+        prefix_size: int = 0
+) -> List[List[CosSection]]:
+    """
+    Group one file's install sections into as few requests as fit.
+
+    Install code split by scrp blocks belongs together, since later
+    parts often rely on targ or variables set by earlier ones. Sections
+    are only split across requests when joining them would go over the
+    size limit, and a section too big for any request gets one of its
+    own.
+
+    :param sections: install sections in file order.
+    :param max_request_size: the interface's request size limit, if any.
+    :param prefix_size: how many bytes the interface adds to each query.
+    :return: the sections to join into each request, in order.
+    """
+    groups: List[List[CosSection]] = []
+    current: List[CosSection] = []
+    current_size = prefix_size
+    for section in sections:
+        size = len(section.text.encode(COS_FILE_ENCODING)) + 1
+        if current and max_request_size is not None \
+                and current_size + size > max_request_size:
+            groups.append(current)
+            current, current_size = [], prefix_size
+        current.append(section)
+        current_size += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _run_install(
+        interface: C2eCaosInterface,
+        path: str,
+        sections: Sequence[CosSection],
+        summary: InjectionSummary
+) -> None:
+    """
+    Run install sections joined into one request, recording the outcome.
+
+    As with scripts, any output on a transport without an error flag is
+    taken to be an error message.
+    """
+    where = f"{path}:{sections[0].start_line}"
+    try:
+        response = interface.execute_caos(
+            "\n".join(section.text for section in sections))
+    except Exception as e:
+        summary.failed.append((where, str(e)))
+        return
+    summary.install_blocks += len(sections)
+    if response.error or (response.error is None and response.text):
+        summary.failed.append((where, response.text.strip()))
+
+
+def inject_parsed(
+        interface: C2eCaosInterface,
+        parsed_files: Iterable[ParsedFile],
+        max_batch_bytes: int = DEFAULT_BATCH_BYTES
+) -> InjectionSummary:
+    """
+    Inject the scripts and install code of already parsed files.
+
+    Each file's install code is run as one request, unless it's too big
+    for the interface, in which case it's split between sections.
+
+    :param interface: the engine to inject into.
+    :param parsed_files: files in the order they should be injected.
+    :param max_batch_bytes: roughly how many bytes of scripts to send
+        per request on interfaces which support batching.
+    :return: a summary of what was injected, without elapsed set.
+    """
+    summary = InjectionSummary()
+
+    scripts: List[Tuple[str, CosSection]] = []
+    install: List[Tuple[str, List[CosSection]]] = []
+    for parsed in parsed_files:
+        summary.files += 1
+        if parsed.error is not None:
+            summary.failed_files.append((parsed.path, parsed.error))
+            continue
+        file_install: List[CosSection] = []
+        for section in parsed.sections:
+            if section.kind == SCRIPT:
+                scripts.append((parsed.path, section))
+            elif section.kind == INSTALL:
+                file_install.append(section)
+            elif section.kind == REMOVE:
+                summary.skipped += 1
+        if file_install:
+            install.append((parsed.path, file_install))
+
+    for batch in plan_batches(scripts, max_batch_bytes):
+        _add_batch(interface, batch, summary)
+
+    prefix_size = len(interface.execute_prefix)
+    for path, sections in install:
+        for group in plan_install_requests(
+                sections, interface.max_request_size, prefix_size):
+            _run_install(interface, path, group, summary)
+
+    return summary
@@ -7,6 +7,8 @@ isn't in the dict, it isn't believed to be supported on the current platform.
 import platform
 from pyc2e.interfaces.interface import coerce_to_bytearray
 from pyc2e.interfaces.unix import UnixInterface
+from pyc2e.interfaces.unix.async_interface import AsyncUnixInterface
+from pyc2e.interfaces.unix.pool import ConnectionPool
 
 WIN32 = 'win32'
 UNIX = 'unix'
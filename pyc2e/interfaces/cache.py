@@ -0,0 +1,282 @@
+"""
+Opt-in caching of read-only query responses.
+
+Only queries explicitly marked as cacheable are cached. Every other
+request sent through the same CachingInterface is assumed to change
+engine state, so it clears the cache before it runs.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pyc2e.interfaces.interface import (
+    C2eCaosInterface,
+    StrOrByteString,
+    coerce_to_bytearray
+)
+from pyc2e.interfaces.prepared import PreparedCaos
+from pyc2e.interfaces.response import Response
+
+
+class ResponseCache:
+    """
+    A size-bounded LRU mapping of query bytes to unexpired responses.
+
+    Safe to share between threads.
+
+    :param max_entries: how many responses to keep before evicting the
+        least recently used one.
+    :param clock: returns the current time in seconds.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 256,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, Tuple[float, Response]]" = \
+            OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Bumped by every invalidation, so responses to requests which
+        # were in flight at the time aren't stored afterwards
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[Response]:
+        """
+        Look up an unexpired response, counting a hit or a miss.
+
+        :param key: the query bytes.
+        :return: the cached response, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if self._clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(
+            self,
+            key: bytes,
+            response: Response,
+            ttl: float,
+            generation: Optional[int] = None
+    ) -> bool:
+        """
+        Store a response for ttl seconds, evicting the oldest if full.
+
+        :param key: the query bytes.
+        :param response: the response to store.
+        :param ttl: how many seconds the response stays valid.
+        :param generation: the generation from before the request was
+            sent. If the cache was invalidated since, nothing is stored.
+        :return: whether the response was stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._entries[key] = (self._clock() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            if self._entries:
+                self._entries.clear()
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the counters as a dict.
+
+        :return:
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# Methods of wrapped interfaces which can't change engine state, so
+# CachingInterface forwards them without clearing the cache
+PASSTHROUGH_METHODS = frozenset({
+    "add_observer",
+    "remove_observer",
+    "start_recording",
+    "stop_recording",
+    "check_request_size",
+})
+
+
+class CachingInterface:
+    """
+    Wraps an interface to cache responses to read-only queries.
+
+    A query is cacheable if it was registered with mark_cacheable or if
+    execute_caos is given a ttl for it. Any other request, including
+    add_script and raw_request, clears the cache first, since it may
+    change what the cached queries would return. Other attributes are
+    forwarded to the wrapped interface. Its methods clear the cache
+    too, since connect or test_connection may reach a restarted engine,
+    unless they're listed in PASSTHROUGH_METHODS.
+
+    A response is only cached if nothing cleared the cache while its
+    request was in flight, so a write made meanwhile can't leave a
+    stale response behind.
+
+    Responses with error set are never cached. Socket interfaces can't
+    tell errors apart from output, so their responses always have error
+    set to None, and engine error text is cached like any other output
+    unless cacheable_response rejects it.
+
+    :param interface: the interface to send requests through.
+    :param max_entries: how many responses to keep at most.
+    :param default_ttl: how many seconds a response stays valid when a
+        query is marked cacheable without its own ttl.
+    :param clock: returns the current time in seconds.
+    :param cacheable_response: if given, only responses it returns True
+        for are cached, such as ones whose text doesn't look like an
+        engine error.
+    """
+
+    def __init__(
+            self,
+            interface: C2eCaosInterface,
+            max_entries: int = 256,
+            default_ttl: float = 1.0,
+            clock: Callable[[], float] = time.monotonic,
+            cacheable_response: Optional[Callable[[Response], bool]] = None
+    ):
+        self.interface = interface
+        self.default_ttl = default_ttl
+        self.cacheable_response = cacheable_response
+        self.cache = ResponseCache(max_entries, clock)
+        self._cacheable: Dict[bytes, float] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self.interface, name)
+        if not callable(value) or name in PASSTHROUGH_METHODS:
+            return value
+
+        @wraps(value)
+        def invalidating(*args, **kwargs):
+            self.cache.invalidate()
+            return value(*args, **kwargs)
+        return invalidating
+
+    def __enter__(self):
+        self.interface.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.interface.__exit__(exc_type, exc_val, exc_tb)
+
+    def mark_cacheable(
+            self,
+            query: StrOrByteString,
+            ttl: Optional[float] = None
+    ) -> None:
+        """
+        Register a query as read-only so its responses can be cached.
+
+        :param query: the exact CAOS of the query.
+        :param ttl: how many seconds responses stay valid. Defaults to
+            default_ttl.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        self._cacheable[bytes(coerce_to_bytearray(query))] = ttl
+
+    def execute_caos(
+            self,
+            caos_to_execute: StrOrByteString,
+            ttl: Optional[float] = None,
+            **kwargs
+    ) -> Response:
+        """
+        Run CAOS, answering from the cache if it's cacheable and fresh.
+
+        Streamed responses are never cached or answered from the cache.
+
+        :param caos_to_execute: valid CAOS to attempt running.
+        :param ttl: if given, cache this query's response for this many
+            seconds, even if it wasn't marked cacheable.
+        :param kwargs: passed on to the wrapped interface, such as
+            stream for UnixInterface.
+        :return:
+        """
+        key = bytes(coerce_to_bytearray(caos_to_execute))
+        if ttl is None:
+            ttl = self._cacheable.get(key)
+
+        if ttl is None:
+            self.cache.invalidate()
+            return self.interface.execute_caos(key, **kwargs)
+        if kwargs.get("stream"):
+            return self.interface.execute_caos(key, **kwargs)
+
+        response = self.cache.get(key)
+        if response is None:
+            generation = self.cache.generation
+            response = self.interface.execute_caos(key, **kwargs)
+            if not response.error and (
+                    self.cacheable_response is None
+                    or self.cacheable_response(response)):
+                self.cache.put(key, response, ttl, generation)
+        return response
+
+    def raw_request(self, query, *args, **kwargs):
+        self.cache.invalidate()
+        return self.interface.raw_request(query, *args, **kwargs)
+
+    def add_script(self, *args, **kwargs) -> Response:
+        self.cache.invalidate()
+        return self.interface.add_script(*args, **kwargs)
+
+    def add_scripts(self, *args, **kwargs):
+        self.cache.invalidate()
+        return self.interface.add_scripts(*args, **kwargs)
+
+    def prepare(self, template: str) -> PreparedCaos:
+        """
+        Prepare a statement which clears the cache whenever it runs.
+
+        :param template: CAOS with str.format style placeholders.
+        :return:
+        """
+        return PreparedCaos(self, template)
+
+    def execute_batch(self, *args, **kwargs):
+        self.cache.invalidate()
+        return self.interface.execute_batch(*args, **kwargs)
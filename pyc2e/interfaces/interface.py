@@ -3,18 +3,42 @@ Baseclass and common functionality for c2e interfaces.
 """
 from random import choice
 from string import ascii_letters
+from time import perf_counter
 from abc import ABC, abstractmethod
-from typing import Union, ByteString
+from typing import (
+    TYPE_CHECKING,
+    ByteString,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
 
+from pyc2e.interfaces.prepared import PreparedCaos
 from pyc2e.interfaces.response import Response
+from pyc2e.interfaces.tracing import (
+    CONNECT_END,
+    CONNECT_START,
+    DISCONNECT,
+    Observer,
+    TraceEvent
+)
 
 from pyc2e.common import (
+    InputTooLong,
     NotConnected,
     AlreadyConnected
 )
 
+if TYPE_CHECKING:
+    from pyc2e.recording import SessionRecorder
+
 
 StrOrByteString = Union[str, ByteString]
+# body, family, genus, species, script number
+ScriptSpec = Tuple[StrOrByteString, int, int, int, int]
 
 
 def random_string(length: int = 5) -> str:
@@ -44,6 +68,21 @@ def coerce_to_bytearray(source: StrOrByteString):
     return bytearray(source.encode("cp1252"))
 
 
+def check_request_size(query: ByteString, limit: Optional[int]) -> None:
+    """
+    Raise InputTooLong if a query won't fit in one request.
+
+    :param query: the raw query about to be sent.
+    :param limit: the most bytes a request may hold, or None for no
+        limit.
+    """
+    if limit is not None and len(query) > limit:
+        raise InputTooLong(
+            f"Request of {len(query)} bytes is over the {limit} byte"
+            f" limit of this interface"
+        )
+
+
 def generate_scrp_header(
         family: int,
         genus: int,
@@ -75,6 +114,103 @@ def generate_scrp_header(
     )
 
 
+BATCH_MARKER_TEMPLATE = b"<pyc2e %s %i>"
+
+
+def build_batch(
+        queries: Iterable[StrOrByteString],
+        token: bytes
+) -> Tuple[bytearray, int]:
+    """
+    Join CAOS snippets into one request with output markers between them.
+
+    Each snippet is followed by an outs of a marker holding the token
+    and the snippet's index. Once the engine answers, split_batch can
+    use the markers to tell which output belongs to which snippet.
+
+    :param queries: the CAOS snippets to join.
+    :param token: a random token the output is unlikely to contain.
+    :return: the joined request and how many snippets it holds.
+    """
+    data = bytearray()
+    count = 0
+    for count, query in enumerate(queries, start=1):
+        data.extend(coerce_to_bytearray(query))
+        data.extend(b'\nouts "')
+        data.extend(BATCH_MARKER_TEMPLATE % (token, count - 1))
+        data.extend(b'"\n')
+    return data, count
+
+
+def split_batch(
+        response: Response,
+        count: int,
+        token: bytes
+) -> List[Optional[Response]]:
+    """
+    Split the response to a request made by build_batch per snippet.
+
+    Engines stop at the first error, so the first snippet without a
+    marker after it is the one that failed. It gets everything after
+    the previous marker with error set to True. Snippets after it never
+    ran and are represented by None.
+
+    :param response: the engine's response to the joined request.
+    :param count: how many snippets the batch held.
+    :param token: the token passed to build_batch.
+    :return: a Response or None for each snippet, in order.
+    """
+    data = response.data
+    if response.declared_length is not None:
+        data = data[:response.declared_length]
+    if data.endswith(b"\0"):
+        data = data[:-1]
+
+    results: List[Optional[Response]] = []
+    position = 0
+    for index in range(count):
+        marker = BATCH_MARKER_TEMPLATE % (token, index)
+        found = data.find(marker, position)
+        if found == -1:
+            results.append(Response(data[position:], error=True))
+            results.extend([None] * (count - index - 1))
+            break
+        results.append(Response(data[position:found], error=False))
+        position = found + len(marker)
+
+    return results
+
+
+def group_by_size(
+        sizes: Sequence[int],
+        limit: Optional[int]
+) -> List[range]:
+    """
+    Split consecutive items into runs whose sizes add up to at most limit.
+
+    An item bigger than the limit gets a run of its own, so the caller
+    can decide what to do with it.
+
+    :param sizes: the size of each item, in order.
+    :param limit: the most each run may hold, or None for no limit.
+    :return: a range of item indices for each run.
+    """
+    if limit is None:
+        return [range(len(sizes))] if sizes else []
+
+    runs: List[range] = []
+    start = 0
+    total = 0
+    for index, size in enumerate(sizes):
+        if index > start and total + size > limit:
+            runs.append(range(start, index))
+            start, total = index, 0
+        total += size
+    if start < len(sizes):
+        runs.append(range(start, len(sizes)))
+    return runs
+
+
 class C2eCaosInterface(ABC):
     """
     Baseclass for engine CAOS interfaces.
@@ -88,6 +224,19 @@ class C2eCaosInterface(ABC):
 
     """
 
+    # Prepended to CAOS by execute_caos before passing it to raw_request
+    execute_prefix: bytes = b""
+
+    # The most bytes raw_request accepts in one query, or None if the
+    # transport has no limit
+    max_request_size: Optional[int] = None
+
+    # Replaced rather than mutated, so emitting never needs a lock
+    _observers: Tuple[Observer, ...] = ()
+    # Set by start_recording
+    _recorder: Optional["SessionRecorder"] = None
+    _owns_recorder = False
+
     def __init__(self, wait_timeout_ms: int, game_name: str):
         self._connected: bool = False
         self._wait_timeout_ms: int = wait_timeout_ms
@@ -111,6 +260,74 @@ class C2eCaosInterface(ABC):
         """
         pass
 
+    def add_observer(self, observer: Observer) -> None:
+        """
+        Call observer with each TraceEvent this interface emits.
+
+        See pyc2e.interfaces.tracing for the events and their order.
+        Observers run on the thread making the request, so they should
+        be quick.
+
+        :param observer: a callable taking the interface and an event.
+        """
+        self._observers = self._observers + (observer,)
+
+    def remove_observer(self, observer: Observer) -> None:
+        """
+        Stop calling an observer added with add_observer.
+
+        :param observer: the observer to remove.
+        """
+        self._observers = tuple(o for o in self._observers if o != observer)
+
+    def start_recording(self, target) -> "SessionRecorder":
+        """
+        Log every request from now on for replaying later.
+
+        See pyc2e.recording for the log format and the replayer.
+
+        :param target: a path to write the log to, a binary stream, or
+            a SessionRecorder to share with other interfaces.
+        :return: the recorder.
+        """
+        from pyc2e.recording import SessionRecorder
+
+        self.stop_recording()
+        self._owns_recorder = not isinstance(target, SessionRecorder)
+        if self._owns_recorder:
+            target = SessionRecorder(target)
+        self._recorder = target
+        self.add_observer(target)
+        return target
+
+    def stop_recording(self) -> None:
+        """
+        Stop a recording started with start_recording.
+
+        The log is closed unless the recorder was passed in, in which
+        case it's only flushed.
+        """
+        recorder = self._recorder
+        if recorder is None:
+            return
+        self._recorder = None
+        self.remove_observer(recorder)
+        if self._owns_recorder:
+            recorder.close()
+        else:
+            recorder.flush()
+
+    def _emit(self, name: str, nbytes: int = 0, detail=None) -> None:
+        """
+        Send an event to every observer.
+
+        Callers check self._observers first, so nothing is built when
+        tracing is off.
+        """
+        event = TraceEvent(name, perf_counter(), nbytes, detail)
+        for observer in self._observers:
+            observer(self, event)
+
     def connect(self):
         """
         Connects to the game engine,
@@ -119,8 +336,12 @@ class C2eCaosInterface(ABC):
         if self._connected:
             raise AlreadyConnected("Already connected to the engine")
 
+        if self._observers:
+            self._emit(CONNECT_START)
         self._connect_body()
         self._connected = True
+        if self._observers:
+            self._emit(CONNECT_END)
 
     def __enter__(self):
         self.connect()
@@ -144,6 +365,8 @@ class C2eCaosInterface(ABC):
         self._disconnect_body()
 
         self._connected = False
+        if self._observers:
+            self._emit(DISCONNECT)
 
     def _idempotent_cleanup(self) -> None:
         if self.connected:
@@ -155,6 +378,14 @@ class C2eCaosInterface(ABC):
     def __del__(self):
         self._idempotent_cleanup()
 
+    def check_request_size(self, query: ByteString) -> None:
+        """
+        Raise InputTooLong if a query won't fit in one request.
+
+        :param query: the raw query about to be sent.
+        """
+        check_request_size(query, self.max_request_size)
+
     @abstractmethod
     def raw_request(self, query: ByteString) -> Response:
         """
@@ -215,6 +446,60 @@ class C2eCaosInterface(ABC):
         """
         pass
 
+    def execute_batch(
+        self,
+        queries: Iterable[StrOrByteString]
+    ) -> List[Optional[Response]]:
+        """
+        Run several pieces of CAOS in a single request.
+
+        The snippets run in order in one injection, which saves a round
+        trip per snippet. Each one gets its own Response holding only
+        its output. If a snippet fails, its Response has error set to
+        True, and every snippet after it is None since it never ran.
+
+        Snippets shouldn't use stop, since it ends the whole batch.
+
+        :param queries: the CAOS snippets to run.
+        :return: a Response or None per snippet, in order.
+        """
+        token = random_string(10).encode("ascii")
+        request, count = build_batch(queries, token)
+        if not count:
+            return []
+
+        return split_batch(self.execute_caos(request), count, token)
+
+    def add_scripts(self, scripts: Sequence[ScriptSpec]) -> List[Response]:
+        """
+        Attempt to add several scripts to the scriptorium.
+
+        Each script is a tuple of the arguments add_script takes. By
+        default, this sends one request per script. Interfaces which can
+        add several scripts in one request override it.
+
+        :param scripts: (body, family, genus, species, number) tuples.
+        :return: a Response for each script, in order.
+        """
+        return [self.add_script(*script) for script in scripts]
+
+    def prepare(self, template: str) -> PreparedCaos:
+        """
+        Pre-encode a CAOS template for repeated execution.
+
+        The template uses str.format style placeholders. Its static
+        parts are encoded once, and parameters are escaped and spliced
+        in each time the returned statement is executed::
+
+            chem = interface.prepare("targ agnt {} outv chem {}")
+            response = chem.execute(unid, 4)
+
+        :param template: CAOS with placeholders for int, float, or
+            str parameters.
+        :return: a statement bound to this interface.
+        """
+        return PreparedCaos(self, template)
+
     def test_connection(self) -> bool:
         """
         Tests connection to engine.
@@ -0,0 +1,155 @@
+"""
+Prepared CAOS statements with pre-encoded templates.
+
+Templates use str.format style placeholders, such as::
+
+    targ agnt {} outv chem {chemical}
+
+The static parts are encoded to cp1252 once, when the statement is
+prepared. Executing it only encodes the parameters and joins the parts,
+skipping the str.format and coerce_to_bytearray steps.
+"""
+import math
+from string import Formatter
+from typing import TYPE_CHECKING, Any, List, Tuple, Union
+
+from pyc2e.interfaces.response import Response
+
+if TYPE_CHECKING:
+    from pyc2e.interfaces.interface import C2eCaosInterface
+
+FieldKey = Union[int, str]
+
+_STRING_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    '"': '\\"',
+    "\n": "\\n",
+})
+
+
+def encode_parameter(value: Any) -> bytes:
+    """
+    Encode a value as a CAOS literal.
+
+    Integers become decimal literals and floats always get a decimal
+    point. Strings are quoted with quotes, backslashes, and newlines
+    escaped so they can't end the literal early.
+
+    :param value: an int, float, or str.
+    :return: the literal as cp1252 bytes.
+    """
+    if isinstance(value, int):
+        return b"%d" % value
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"CAOS has no literal for {value}")
+        text = ("%.10f" % value).rstrip("0")
+        return (text + "0" if text.endswith(".") else text).encode("ascii")
+    if isinstance(value, str):
+        escaped = value.translate(_STRING_ESCAPES)
+        return b'"' + escaped.encode("cp1252") + b'"'
+
+    raise TypeError(
+        f"Can't bind {type(value).__name__} as a CAOS parameter;"
+        f" expected int, float, or str"
+    )
+
+
+def compile_template(template: str) -> Tuple[List[bytes], List[FieldKey]]:
+    """
+    Split a template into encoded static parts and placeholder keys.
+
+    There is always one more static part than there are keys, so the
+    request is parts[0] + value[0] + parts[1] + ... + parts[-1].
+
+    :param template: a CAOS template with str.format style placeholders.
+    :return: the static parts and the key for each placeholder.
+    """
+    parts: List[bytes] = []
+    keys: List[FieldKey] = []
+    pending = ""
+    auto_index = 0
+    explicit_index = False
+
+    for literal, field_name, format_spec, conversion in \
+            Formatter().parse(template):
+        pending += literal
+        if field_name is None:
+            continue
+        if format_spec or conversion:
+            raise ValueError(
+                "Format specs and conversions aren't supported in"
+                " prepared statements"
+            )
+
+        if field_name == "":
+            if explicit_index:
+                raise ValueError(
+                    "Can't mix automatic and numbered placeholders")
+            key: FieldKey = auto_index
+            auto_index += 1
+        elif field_name.isdigit():
+            if auto_index:
+                raise ValueError(
+                    "Can't mix automatic and numbered placeholders")
+            explicit_index = True
+            key = int(field_name)
+        elif field_name.isidentifier():
+            key = field_name
+        else:
+            raise ValueError(f"Unsupported placeholder {{{field_name}}}")
+
+        parts.append(pending.encode("cp1252"))
+        keys.append(key)
+        pending = ""
+
+    parts.append(pending.encode("cp1252"))
+    return parts, keys
+
+
+class PreparedCaos:
+    """
+    A CAOS template bound to an interface, ready to run with parameters.
+
+    Create these with C2eCaosInterface.prepare rather than directly.
+
+    :param interface: the interface to run the statement on.
+    :param template: CAOS with str.format style placeholders.
+    """
+
+    __slots__ = ("interface", "template", "_parts", "_keys")
+
+    def __init__(self, interface: "C2eCaosInterface", template: str):
+        self.interface = interface
+        self.template = template
+        parts, self._keys = compile_template(template)
+        parts[0] = bytes(interface.execute_prefix) + parts[0]
+        self._parts = parts
+
+    def render(self, *args: Any, **kwargs: Any) -> bytes:
+        """
+        Build the raw request for the given parameters.
+
+        :return: the bytes raw_request will be given.
+        """
+        parts = self._parts
+        keys = self._keys
+        pieces = [parts[0]]
+        for index, key in enumerate(keys):
+            value = kwargs[key] if isinstance(key, str) else args[key]
+            pieces.append(encode_parameter(value))
+            pieces.append(parts[index + 1])
+        return b"".join(pieces)
+
+    def execute(self, *args: Any, **kwargs: Any) -> Response:
+        """
+        Run the statement with the given parameters bound.
+
+        :return: the engine's response.
+        """
+        return self.interface.raw_request(self.render(*args, **kwargs))
+
+    __call__ = execute
+
+    def __repr__(self) -> str:
+        return f"<PreparedCaos {self.template!r}>"
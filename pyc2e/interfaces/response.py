@@ -1,8 +1,12 @@
 """
-Holds a Response class, somewhat inspired by the requests library.
+Holds Response classes, somewhat inspired by the requests library.
 """
 
-from typing import ByteString, Optional
+from typing import ByteString, Callable, Iterator, Optional
+
+from pyc2e.common import StreamConsumed
+
+DEFAULT_STREAM_CHUNK_SIZE = 1024
 
 
 class Response:
@@ -12,13 +16,16 @@ class Response:
     Not meant to be instantiated by users, only by interface classes.
     The class is also intended to be immutable.
 
-    Currently, it transparently returns the data object. In the future,
-    data may be presented as a stream and act more like the requests
-    library's response object.
+    It transparently returns the data object. See StreamingResponse for
+    a version which presents data as a stream, like the requests
+    library's response object does with stream=True.
 
     Optional arguments will be set to None on platforms with
     socket-based engine interfaces which do not support them.
 
+    Instances use __slots__ and decode their text at most once, since
+    pollers may keep very large numbers of them around.
+
     :param data: raw response data as provided by the engine.
     :param declared_length: (Windows only) How long the engine said the
         response is
@@ -27,17 +34,35 @@ class Response:
         parse the response body to check for errors.
     :param null_terminated: whether data has a null terminator. Socket
         interface engine versions seem to omit null terminators.
+    :param copy: whether to copy data. Interfaces pass False to hand
+        over a buffer they will never touch again, which avoids copying
+        large outputs. Only the view property is zero-copy, as the
+        first access to data still copies the whole buffer to bytes.
     """
 
+    __slots__ = (
+        "_data",
+        "_declared_length",
+        "_error",
+        "_null_terminated",
+        "_text",
+    )
+
     def __init__(
             self,
             data: Optional[ByteString] = None,
             declared_length: Optional[int] = None,
             error: Optional[bool] = None,
             null_terminated: bool = False,
+            copy: bool = True,
     ):
 
-        self._data: bytes = b"" if data is None else bytes(data)
+        if data is None:
+            self._data: ByteString = b""
+        elif copy:
+            self._data = bytes(data)
+        else:
+            self._data = data
 
         if null_terminated and self._data and self._data[-1] != 0:
             raise ValueError(
@@ -47,6 +72,7 @@ class Response:
         self._declared_length = declared_length
         self._error = error
         self._null_terminated = null_terminated
+        self._text: Optional[str] = None
 
     @property
     def data(self) -> bytes:
@@ -55,12 +81,43 @@ class Response:
 
         :return:
         """
+        if not isinstance(self._data, bytes):
+            self._data = bytes(self._data)
         return self._data
 
     @property
     def declared_length(self) -> Optional[int]:
         return self._declared_length
 
+    def _payload_length(self) -> int:
+        """
+        How many bytes of data are meaningful output.
+
+        :return: the declared length if any, minus any null terminator.
+        """
+        if self._declared_length is not None:
+            cutoff_length = self._declared_length
+
+        else:
+            cutoff_length = len(self._data)
+
+        if self._null_terminated:
+            cutoff_length -= 1
+
+        return cutoff_length
+
+    @property
+    def view(self) -> memoryview:
+        """
+        Get a read-only memoryview of the payload without copying it.
+
+        The view is cut the same way as text is, so it excludes anything
+        past the declared length and the null terminator, if any.
+
+        :return:
+        """
+        return memoryview(self._data).toreadonly()[:self._payload_length()]
+
     @property
     def text(self) -> str:
         """
@@ -69,7 +126,7 @@ class Response:
         This does not detect whether the response should be interpreted as
         text. It's up to the user to know that!
 
-        The text is cut to a cutoff length. If the
+        The text is cut to the declared length if one was given.
 
         If the null terminator was specified, the last character will be
         omitted when decoding the bytes to their text representation.
@@ -77,21 +134,17 @@ class Response:
         It's possible that the result may include non-printable binary,
         in which case the result will be converted to \x00 format.
 
+        The decoded text is cached after the first access.
+
         :return:
         """
-        if self._declared_length is not None:
-            cutoff_length = self._declared_length
-
-        else:
-            cutoff_length = len(self._data)
-
-        if self._null_terminated:
-            cutoff_length -= 1
-
-        # under cpython slicing a bytes to its original length doesn't
-        # seem to create a copy of it (ids are ==, a is b, etc), so this
-        # should be efficient enough when we don't modify length.
-        return self._data[:cutoff_length].decode("cp1252")
+        if self._text is None:
+            # decoding a memoryview slice avoids copying the bytes first
+            self._text = str(
+                memoryview(self._data)[:self._payload_length()],
+                "cp1252"
+            )
+        return self._text
 
     @property
     def error(self) -> Optional[bool]:
@@ -110,3 +163,153 @@ class Response:
         :return: whether to expect null termination on strings
         """
         return self._null_terminated
+
+
+class StreamingResponse(Response):
+    """
+    A Response whose body is read from the engine as it arrives.
+
+    The body can be consumed once through iter_content or iter_lines,
+    which keeps memory bounded by the chunk size. Accessing data, text,
+    or view instead reads the rest of the body into memory first, after
+    which the iterators replay it from memory.
+
+    The underlying connection is closed once the body has been read or
+    close() is called, including when leaving a with block.
+
+    :param read_chunk: returns up to the given number of bytes, or an
+        empty bytes object once the engine has finished sending.
+    :param on_close: called once when the stream is closed.
+    """
+
+    __slots__ = ("_read_chunk", "_on_close", "_started", "_loaded")
+
+    def __init__(
+            self,
+            read_chunk: Callable[[int], bytes],
+            on_close: Optional[Callable[[], None]] = None
+    ):
+        super().__init__()
+        self._read_chunk = read_chunk
+        self._on_close = on_close
+        self._started = False
+        self._loaded = False
+
+    @property
+    def closed(self) -> bool:
+        """
+        Whether the underlying connection has been released.
+
+        :return:
+        """
+        return self._read_chunk is None
+
+    def close(self) -> None:
+        """
+        Idempotently release the underlying connection.
+
+        Any unread part of the body is discarded.
+        """
+        if self._read_chunk is None:
+            return
+        self._read_chunk = None
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def iter_content(
+            self,
+            chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Yield the body in chunks of at most chunk_size bytes.
+
+        Chunks are yielded as soon as they arrive, so they may be
+        shorter than chunk_size.
+
+        :param chunk_size: the most bytes to read at once.
+        :return:
+        """
+        if self._loaded:
+            data = self._data
+            for start in range(0, len(data), chunk_size):
+                yield bytes(data[start:start + chunk_size])
+            return
+
+        if self._started:
+            raise StreamConsumed("The response body was already read")
+        self._started = True
+
+        try:
+            while self._read_chunk is not None:
+                chunk = self._read_chunk(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def iter_lines(
+            self,
+            chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+            delimiter: bytes = b"\n"
+    ) -> Iterator[bytes]:
+        """
+        Yield the body one line at a time, without the delimiter.
+
+        Only the current partial line is held in memory between chunks.
+
+        :param chunk_size: the most bytes to read at once.
+        :param delimiter: what separates lines.
+        :return:
+        """
+        pending = bytearray()
+        for chunk in self.iter_content(chunk_size):
+            pending.extend(chunk)
+            start = 0
+            while True:
+                end = pending.find(delimiter, start)
+                if end == -1:
+                    break
+                yield bytes(pending[start:end])
+                start = end + len(delimiter)
+            del pending[:start]
+
+        if pending:
+            yield bytes(pending)
+
+    def _load(self) -> None:
+        """
+        Read any remaining body into memory for the non-streaming API.
+        """
+        if self._loaded:
+            return
+        if self._started:
+            raise StreamConsumed("The response body was already read")
+
+        buffer = bytearray()
+        for chunk in self.iter_content(DEFAULT_STREAM_CHUNK_SIZE * 16):
+            buffer.extend(chunk)
+        self._data = buffer
+        self._loaded = True
+
+    @property
+    def data(self) -> bytes:
+        self._load()
+        return Response.data.fget(self)
+
+    @property
+    def view(self) -> memoryview:
+        self._load()
+        return Response.view.fget(self)
+
+    @property
+    def text(self) -> str:
+        self._load()
+        return Response.text.fget(self)
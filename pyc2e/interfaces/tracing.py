@@ -0,0 +1,115 @@
+"""
+Timestamped events for each phase of a request.
+
+Observers registered with C2eCaosInterface.add_observer are called with
+the interface and a TraceEvent as a request moves through its phases.
+Interfaces only build events when at least one observer is registered,
+so tracing costs an attribute check per phase when it's unused.
+
+A request emits events in this order, skipping any which don't apply to
+the transport:
+
+* REQUEST_START, with the query size and the query itself as detail
+* CONNECT_START and CONNECT_END, when a connection is opened
+* MUTEX_ACQUIRED (shared memory only)
+* REQUEST_WRITTEN, with the bytes written
+* FIRST_BYTE and LAST_BYTE, with the bytes received so far
+* DECODE, once the Response has been built, with its size
+* DISCONNECT, when the connection is closed
+* REQUEST_END with the Response as detail, or REQUEST_FAILED with the
+  exception as detail. Streaming responses have no detail.
+
+On the socket interface, the gap between REQUEST_WRITTEN and FIRST_BYTE
+is mostly the engine waiting for its next tick, while the gap between
+FIRST_BYTE and LAST_BYTE is mostly transfer time.
+"""
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional
+)
+
+if TYPE_CHECKING:
+    from pyc2e.interfaces.interface import C2eCaosInterface
+
+REQUEST_START = "request_start"
+CONNECT_START = "connect_start"
+CONNECT_END = "connect_end"
+MUTEX_ACQUIRED = "mutex_acquired"
+REQUEST_WRITTEN = "request_written"
+FIRST_BYTE = "first_byte"
+LAST_BYTE = "last_byte"
+DECODE = "decode"
+DISCONNECT = "disconnect"
+RECONNECT = "reconnect"
+REQUEST_END = "request_end"
+REQUEST_FAILED = "request_failed"
+
+
+class TraceEvent(NamedTuple):
+    """
+    One phase of a request.
+
+    timestamp comes from time.perf_counter, so only differences between
+    events are meaningful.
+    """
+    name: str
+    timestamp: float
+    nbytes: int = 0
+    detail: Any = None
+
+
+Observer = Callable[["C2eCaosInterface", TraceEvent], None]
+
+
+class TraceRecorder:
+    """
+    An observer which keeps the events of the most recent requests.
+
+    Events are grouped per request, starting at each REQUEST_START. Use
+    one recorder per interface, since requests from several interfaces
+    would interleave.
+
+    :param max_requests: how many requests to keep.
+    """
+
+    def __init__(self, max_requests: int = 100):
+        self.requests: Deque[List[TraceEvent]] = deque(maxlen=max_requests)
+
+    def __call__(
+            self,
+            interface: "C2eCaosInterface",
+            event: TraceEvent
+    ) -> None:
+        if event.name == REQUEST_START or not self.requests:
+            self.requests.append([])
+        self.requests[-1].append(event)
+
+    @property
+    def last(self) -> Optional[List[TraceEvent]]:
+        """The events of the most recent request, if any."""
+        return self.requests[-1] if self.requests else None
+
+    def phases(
+            self,
+            events: Optional[List[TraceEvent]] = None
+    ) -> Dict[str, float]:
+        """
+        Time spent reaching each event from the one before it.
+
+        :param events: one request's events. Defaults to the last one.
+        :return: seconds keyed by the name of the event ending the phase.
+        """
+        events = self.last if events is None else events
+        if not events:
+            return {}
+        return {
+            current.name: current.timestamp - previous.timestamp
+            for previous, current in zip(events, events[1:])
+        }
@@ -8,21 +8,41 @@ server implementations that this can connect to.
 """
 
 import socket
-from typing import ByteString
+import time
+from typing import TYPE_CHECKING, ByteString, List, Optional, Sequence, Union
 
 from pyc2e.interfaces.interface import (
     C2eCaosInterface,
+    ScriptSpec,
     StrOrByteString,
     coerce_to_bytearray,
-    generate_scrp_header
+    generate_scrp_header,
+    group_by_size
+)
+from pyc2e.interfaces.response import Response, StreamingResponse
+from pyc2e.interfaces.tracing import (
+    DECODE,
+    FIRST_BYTE,
+    LAST_BYTE,
+    REQUEST_END,
+    REQUEST_FAILED,
+    REQUEST_START,
+    REQUEST_WRITTEN
+)
+from pyc2e.common import (
+    DisconnectFailure,
+    ConnectFailure,
+    QueryError,
+    RequestTimeout
 )
-from pyc2e.interfaces.response import Response
-from pyc2e.common import DisconnectFailure, ConnectFailure
 
-socket.setdefaulttimeout(0.200)
+if TYPE_CHECKING:
+    from pyc2e.interfaces.unix.pool import ConnectionPool
 
 SOCKET_CHUNK_SIZE = 1024
+MAX_RECEIVE_SIZE_HINT = 1 << 20
 LOCALHOST = "127.0.0.1"
+DEFAULT_PORT = 20001
 
 
 class UnixInterface(C2eCaosInterface):
@@ -34,20 +54,48 @@ class UnixInterface(C2eCaosInterface):
     I think this has to do with virtualbox port forwarding. maybe
     bridged mode setup is better in the long run for lc2e stuff?
     that or ssh if we're doing password stuff
+
+    wait_timeout_ms is a budget for each whole request, covering connect,
+    send, and every read. Once it's spent, the request is abandoned and
+    RequestTimeout is raised. None waits forever. The timeout is set on
+    this interface's own socket rather than process-wide.
+
+    If pool is given, requests take pre-connected sockets from it
+    instead of connecting themselves. The pool must be for the same host
+    and port.
+
+    The socket interface has no fixed request size limit. If
+    max_request_size is set, bigger queries raise InputTooLong before
+    anything is sent, and add_scripts splits its requests to fit.
     """
     def __init__(
             self,
-            port: int = 20001,
-            host: str = "127.0.0.1",
+            port: int = DEFAULT_PORT,
+            host: str = LOCALHOST,
             remote: bool = False,
             wait_timeout_ms: int = 100,
-            game_name: str = "Docking Station"):
+            game_name: str = "Docking Station",
+            receive_buffer_size: int = SOCKET_CHUNK_SIZE,
+            pool: Optional["ConnectionPool"] = None,
+            max_request_size: Optional[int] = None):
 
         super().__init__(
             wait_timeout_ms,
             game_name
         )
 
+        if receive_buffer_size < 1:
+            raise ValueError("receive_buffer_size must be at least 1")
+        self.receive_buffer_size = receive_buffer_size
+        # Grows to fit the last response, then decays by half each
+        # request, so repeated large outputs don't keep resizing.
+        self._receive_size_hint = receive_buffer_size
+        self._stream: Optional[StreamingResponse] = None
+        self._stream_received = 0
+        # Set once a stream has emitted REQUEST_FAILED
+        self._stream_failed = False
+        self._deadline: Optional[float] = None
+
         self.port = port
         self.host = host
         if self.host != LOCALHOST:
@@ -55,6 +103,8 @@ class UnixInterface(C2eCaosInterface):
         else:
             self.remote = remote
         self.socket = None
+        self.pool = pool
+        self.max_request_size = max_request_size
 
     def _connect_body(self) -> None:
         """
@@ -62,8 +112,22 @@ class UnixInterface(C2eCaosInterface):
         :return:
         """
 
+        if self._deadline is None and self._wait_timeout_ms is not None:
+            # connect() was called directly rather than by raw_request
+            timeout = self._wait_timeout_ms / 1000
+        else:
+            timeout = self._remaining_seconds()
+
         try:
-            self.socket = socket.create_connection((self.host, self.port))
+            if self.pool is not None:
+                self.socket = self.pool.acquire(timeout)
+            else:
+                self.socket = socket.create_connection(
+                    (self.host, self.port), timeout=timeout)
+        except socket.timeout as e:
+            raise RequestTimeout(
+                f"Timed out connecting to engine at {self.host}:{self.port}"
+            ) from e
         except Exception as e:
             raise ConnectFailure(
                 f"Failed to create socket connecting to engine"
@@ -84,7 +148,11 @@ class UnixInterface(C2eCaosInterface):
                 "Could not close socket when disconnecting from engine."
             ) from e
 
-    def raw_request(self, query: ByteString) -> Response:
+    def raw_request(
+            self,
+            query: ByteString,
+            stream: bool = False
+    ) -> Union[Response, StreamingResponse]:
         """
 
         Run a raw request against the c2e engine.
@@ -92,29 +160,195 @@ class UnixInterface(C2eCaosInterface):
         Most users will not need to use this as it injects raw bytes. They
         should use execute_caos or add_script instead.
 
+        If stream is True, a StreamingResponse is returned as soon as the
+        query is sent. It must be read to the end or closed before this
+        interface can send another request.
+
         :param query: the caos to run.
+        :param stream: whether to return before the response arrives.
         :return:
         """
-        if not self.connected:
-            self.connect()
+        if self._stream is not None:
+            raise QueryError(
+                "The previous streaming response must be read or closed"
+                " before sending another request"
+            )
+        self.check_request_size(query)
+
+        if self._observers:
+            self._emit(REQUEST_START, len(query), query)
+        self._start_deadline()
+        try:
+            if not self.connected:
+                self.connect()
+
+            self.socket.settimeout(self._remaining_seconds())
+            self.socket.sendall(query)
+            self.socket.sendall(b"\nrscr")
+            if self._observers:
+                self._emit(REQUEST_WRITTEN, len(query) + 5)
+
+            if stream:
+                self._stream_received = 0
+                self._stream_failed = False
+                self._stream = StreamingResponse(
+                    self._read_stream_chunk,
+                    on_close=self._end_stream
+                )
+                return self._stream
+
+            response_data = self._receive_all()
+
+        except socket.timeout as e:
+            self._idempotent_cleanup()
+            error = RequestTimeout(
+                f"Engine at {self.host}:{self.port} did not answer"
+                f" within {self._wait_timeout_ms}ms"
+            )
+            if self._observers:
+                self._emit(REQUEST_FAILED, detail=error)
+            raise error from e
+        except BaseException as e:
+            self._idempotent_cleanup()
+            if self._observers:
+                self._emit(REQUEST_FAILED, detail=e)
+            raise
+        finally:
+            self._deadline = None
+
+        response = Response(response_data, copy=False)
+        if self._observers:
+            self._emit(DECODE, len(response_data))
+        self.disconnect()
+        if self._observers:
+            self._emit(REQUEST_END, len(response_data), response)
+
+        return response
+
+    def _start_deadline(self) -> None:
+        """
+        Start the time budget for a request.
+        """
+        if self._wait_timeout_ms is None:
+            self._deadline = None
+        else:
+            self._deadline = time.monotonic() + self._wait_timeout_ms / 1000
+
+    def _remaining_seconds(self) -> Optional[float]:
+        """
+        How much of the current request's budget is left.
+
+        :return: seconds left, or None if there is no deadline.
+        """
+        if self._deadline is None:
+            return None
+
+        remaining = self._deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("request deadline passed")
+        return remaining
+
+    def _read_stream_chunk(self, max_size: int) -> bytes:
+        """
+        Read the next chunk of a streaming response.
 
-        self.socket.send(query)
-        self.socket.send(b"\nrscr")
-        response_data = bytearray()
+        Each chunk must arrive within wait_timeout_ms, since the reader
+        controls how long the stream as a whole stays open.
 
-        done = False
-        while not done:
-            temp_data = self.socket.recv(SOCKET_CHUNK_SIZE)
-            if len(temp_data):
-                response_data.extend(temp_data)
+        :param max_size: the most bytes to read.
+        :return: the chunk, or an empty bytes object at the end.
+        """
+        try:
+            if self._wait_timeout_ms is None:
+                self.socket.settimeout(None)
             else:
-                done = True
+                self.socket.settimeout(self._wait_timeout_ms / 1000)
+            chunk = self.socket.recv(max_size)
+        except socket.timeout as e:
+            error = RequestTimeout(
+                f"Engine at {self.host}:{self.port} stalled for more"
+                f" than {self._wait_timeout_ms}ms while streaming"
+            )
+            self._stream_failed = True
+            if self._observers:
+                self._emit(REQUEST_FAILED, detail=error)
+            raise error from e
+        except OSError as e:
+            self._stream_failed = True
+            if self._observers:
+                self._emit(REQUEST_FAILED, detail=e)
+            raise
+
+        if self._observers:
+            if not chunk:
+                self._emit(LAST_BYTE, self._stream_received)
+            elif not self._stream_received:
+                self._emit(FIRST_BYTE, len(chunk))
+        self._stream_received += len(chunk)
+        return chunk
+
+    def _end_stream(self) -> None:
+        """
+        Disconnect once a streaming response is finished with.
 
-        self.disconnect()
+        REQUEST_END is skipped if the stream already emitted
+        REQUEST_FAILED, so each request ends with one terminal event.
+        """
+        self._stream = None
+        self._idempotent_cleanup()
+        if self._observers and not self._stream_failed:
+            self._emit(REQUEST_END, self._stream_received)
+
+    def _receive_all(self) -> bytearray:
+        """
+        Read until the engine closes the connection.
 
-        return Response(response_data)
+        Reads straight into one preallocated buffer with recv_into,
+        doubling it whenever it fills up. The starting size adapts to
+        recent response sizes.
 
-    def execute_caos(self, caos_to_execute: StrOrByteString) -> Response:
+        :return: a bytearray trimmed to the received data.
+        """
+        buffer = bytearray(self._receive_size_hint)
+        view = memoryview(buffer)
+        received = 0
+
+        while True:
+            if received == len(buffer):
+                view.release()
+                buffer.extend(bytes(len(buffer)))
+                view = memoryview(buffer)
+
+            self.socket.settimeout(self._remaining_seconds())
+            with view[received:] as free_space:
+                num_read = self.socket.recv_into(free_space)
+            if not num_read:
+                break
+            if not received and self._observers:
+                self._emit(FIRST_BYTE, num_read)
+            received += num_read
+
+        if self._observers:
+            self._emit(LAST_BYTE, received)
+
+        view.release()
+        del buffer[received:]
+
+        self._receive_size_hint = min(
+            MAX_RECEIVE_SIZE_HINT,
+            max(
+                self.receive_buffer_size,
+                received + 1,
+                self._receive_size_hint // 2
+            )
+        )
+        return buffer
+
+    def execute_caos(
+            self,
+            caos_to_execute: StrOrByteString,
+            stream: bool = False
+    ) -> Union[Response, StreamingResponse]:
         """
         Run a piece of CAOS without storing it, returning the result.
 
@@ -127,10 +361,12 @@ class UnixInterface(C2eCaosInterface):
         add_script instead.
 
         :param caos_to_execute: valid CAOS to attempt running.
+        :param stream: whether to return a StreamingResponse which reads
+            output as the engine sends it.
         :return:
         """
         caos_bytearray = coerce_to_bytearray(caos_to_execute)
-        return self.raw_request(caos_bytearray)
+        return self.raw_request(caos_bytearray, stream=stream)
 
     def add_script(
             self,
@@ -166,3 +402,46 @@ class UnixInterface(C2eCaosInterface):
         data.extend(b"\nendm")  # lc2e requires endm on injected scripts
 
         return self.raw_request(data)
+
+    def add_scripts(self, scripts: Sequence[ScriptSpec]) -> List[Response]:
+        """
+        Attempt to add several scripts to the scriptorium in few requests.
+
+        The socket interface accepts many scrp blocks per request, so
+        scripts are sent together, split into as many requests as
+        max_request_size requires. If the engine reports a problem with
+        a combined request, its scripts are resent one at a time so the
+        error can be attributed to the script which caused it. Re-adding
+        a script replaces it, so the ones which worked are unaffected.
+
+        :param scripts: (body, family, genus, species, number) tuples.
+        :return: a Response for each script, in order.
+        """
+        if len(scripts) < 2:
+            return super().add_scripts(scripts)
+
+        blocks = []
+        for script_body, family, genus, species, script_number in scripts:
+            block = bytearray(
+                generate_scrp_header(family, genus, species, script_number)
+            )
+            block.extend(coerce_to_bytearray(script_body))
+            block.extend(b"\nendm\n")
+            blocks.append(block)
+
+        results: List[Response] = []
+        for run in group_by_size(
+                [len(block) for block in blocks], self.max_request_size):
+            run_scripts = scripts[run.start:run.stop]
+            if len(run) < 2:
+                results.extend(super().add_scripts(run_scripts))
+                continue
+
+            response = self.raw_request(
+                b"".join(blocks[run.start:run.stop]))
+            if not response.data:
+                results.extend([response] * len(run))
+            else:
+                results.extend(super().add_scripts(run_scripts))
+
+        return results
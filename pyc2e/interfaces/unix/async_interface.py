@@ -0,0 +1,199 @@
+"""
+An asyncio-native version of the socket CAOS interface.
+
+lc2e and openc2e close the connection after answering each rscr-terminated
+request, so every request opens its own stream. This means a single
+AsyncUnixInterface can have many requests in flight at once on one
+event loop rather than needing a thread per request.
+"""
+import asyncio
+from typing import ByteString, Iterable, List, Optional
+
+from pyc2e.common import ConnectFailure, RequestTimeout
+from pyc2e.interfaces.interface import (
+    StrOrByteString,
+    build_batch,
+    check_request_size,
+    coerce_to_bytearray,
+    generate_scrp_header,
+    random_string,
+    split_batch
+)
+from pyc2e.interfaces.response import Response
+from pyc2e.interfaces.unix import DEFAULT_PORT, LOCALHOST
+
+
+class AsyncUnixInterface:
+    """
+    Coroutine-based wrapper around the socket CAOS interface.
+
+    Unlike UnixInterface, there is no connected state to manage. Each
+    request opens, uses, and closes its own connection, so it is safe
+    to await many requests on the same instance concurrently.
+
+    :param port: the port the engine is listening on.
+    :param host: the host the engine is running on.
+    :param remote: whether the engine is on another machine. Always
+        True when host is not localhost.
+    :param wait_timeout_ms: the deadline for each request in ms,
+        covering connect, send, and the entire read. None disables it.
+    :param game_name: the engine's self-reported name.
+    :param max_request_size: if set, queries bigger than this many bytes
+        raise InputTooLong instead of being sent.
+    """
+
+    def __init__(
+            self,
+            port: int = DEFAULT_PORT,
+            host: str = LOCALHOST,
+            remote: bool = False,
+            wait_timeout_ms: Optional[int] = 100,
+            game_name: str = "Docking Station",
+            max_request_size: Optional[int] = None):
+
+        self.port = port
+        self.host = host
+        if self.host != LOCALHOST:
+            self.remote = True
+        else:
+            self.remote = remote
+        self._wait_timeout_ms = wait_timeout_ms
+        self._game_name = game_name
+        self.max_request_size = max_request_size
+
+    async def _round_trip(self, query: ByteString) -> bytes:
+        """
+        Open a stream, send the query, and read until the engine hangs up.
+
+        :param query: the raw bytes to send before the rscr terminator.
+        :return: everything the engine sent back.
+        """
+        try:
+            reader, writer = await asyncio.open_connection(
+                self.host, self.port)
+        except OSError as e:
+            raise ConnectFailure(
+                f"Failed to open stream connecting to engine"
+                f" at {self.host}:{self.port}"
+            ) from e
+
+        try:
+            writer.write(query)
+            writer.write(b"\nrscr")
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                # The engine may have reset the connection, which doesn't
+                # matter once everything has been read
+                pass
+
+    async def raw_request(self, query: ByteString) -> Response:
+        """
+        Run a raw request against the c2e engine.
+
+        Most users will not need to use this as it injects raw bytes. They
+        should use execute_caos or add_script instead.
+
+        :param query: the caos to run.
+        :return:
+        """
+        check_request_size(query, self.max_request_size)
+
+        if self._wait_timeout_ms is None:
+            return Response(await self._round_trip(query))
+
+        try:
+            data = await asyncio.wait_for(
+                self._round_trip(query),
+                self._wait_timeout_ms / 1000
+            )
+        except asyncio.TimeoutError as e:
+            raise RequestTimeout(
+                f"Engine at {self.host}:{self.port} did not answer"
+                f" within {self._wait_timeout_ms}ms"
+            ) from e
+
+        return Response(data)
+
+    async def execute_caos(self, caos_to_execute: StrOrByteString) -> Response:
+        """
+        Run a piece of CAOS without storing it, returning the result.
+
+        If it is a string, it will be converted to bytes before execution.
+
+        :param caos_to_execute: valid CAOS to attempt running.
+        :return:
+        """
+        return await self.raw_request(coerce_to_bytearray(caos_to_execute))
+
+    async def add_script(
+            self,
+            script_body: StrOrByteString,
+            family: int,
+            genus: int,
+            species: int,
+            script_number: int
+    ) -> Response:
+        """
+        Attempt to add a script to the scriptorium.
+
+        The script may be a bytestring or a str, but it must be the bare
+        body rather than a script headed by scrp or terminated by endm.
+
+        :param script_body: the body of the script
+        :param family: family classifier
+        :param genus: genus classifier
+        :param species: species classifier
+        :param script_number: script identifier
+        :return:
+        """
+        data = bytearray()
+
+        data.extend(
+            generate_scrp_header(family, genus, species, script_number)
+        )
+        data.extend(coerce_to_bytearray(script_body))
+        data.extend(b"\nendm")  # lc2e requires endm on injected scripts
+
+        return await self.raw_request(data)
+
+    async def execute_batch(
+        self,
+        queries: Iterable[StrOrByteString]
+    ) -> List[Optional[Response]]:
+        """
+        Run several pieces of CAOS in a single request.
+
+        See C2eCaosInterface.execute_batch for how output is split.
+
+        :param queries: the CAOS snippets to run.
+        :return: a Response or None per snippet, in order.
+        """
+        token = random_string(10).encode("ascii")
+        request, count = build_batch(queries, token)
+        if not count:
+            return []
+
+        response = await self.execute_caos(request)
+        return split_batch(response, count, token)
+
+    async def test_connection(self) -> bool:
+        """
+        Tests connection to engine the same way C2eCaosInterface does.
+
+        :return: True if we can talk to an engine, false otherwise.
+        """
+        expected_echo = random_string(10)
+
+        response = await self.execute_caos(
+            'sets va00 "{0}" sets va01 "{1}" adds va00 va01 outs va00'.format(
+                expected_echo[0:6],
+                expected_echo[6:]
+            )
+        )
+
+        return response.text == expected_echo
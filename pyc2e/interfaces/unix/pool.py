@@ -0,0 +1,229 @@
+"""
+A pool of pre-connected sockets for one socket engine.
+
+lc2e and openc2e close the connection after each request, so the TCP
+handshake is paid on every request. For remote engines that handshake
+can dominate the latency of small queries. A ConnectionPool opens
+connections ahead of time on a background thread, hands them out as
+requests need them, and replaces each one once it's been used.
+
+Idle connections sit in the engine's accept queue until they're used.
+Keep the pool small and max_idle short for engines which other clients
+talk to as well.
+"""
+import socket
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from pyc2e.interfaces.unix import DEFAULT_PORT, LOCALHOST
+
+# How long to wait before retrying after a background connect fails
+RETRY_DELAY = 0.5
+
+
+class PoolStats:
+    """
+    Counters for a ConnectionPool.
+
+    Hits are acquisitions answered with a ready connection. Misses had to
+    connect on the spot.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.connects = 0
+        self.connect_failures = 0
+        self.connect_time_total = 0.0
+        self.connect_time_max = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def connect_time_mean(self) -> float:
+        return self.connect_time_total / self.connects if self.connects else 0.0
+
+    def record_connect(self, elapsed: float) -> None:
+        """Count a successful connect. Must hold the pool's lock."""
+        self.connects += 1
+        self.connect_time_total += elapsed
+        self.connect_time_max = max(self.connect_time_max, elapsed)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "stale": self.stale,
+            "connects": self.connects,
+            "connect_failures": self.connect_failures,
+            "connect_time_mean": self.connect_time_mean,
+            "connect_time_max": self.connect_time_max,
+        }
+
+
+def _peer_closed(sock: socket.socket) -> bool:
+    """
+    Check without blocking whether the other end has hung up.
+
+    :param sock: a connected socket with nothing unread on it.
+    :return: True if the connection is closed or broken.
+    """
+    timeout = sock.gettimeout()
+    try:
+        sock.setblocking(False)
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
+    finally:
+        sock.settimeout(timeout)
+
+
+class ConnectionPool:
+    """
+    Keeps up to size fresh connections open to one engine.
+
+    Pass it to UnixInterface as pool to have requests use it. Pools are
+    safe to share between interfaces and threads.
+
+    :param host: the host the engine is running on.
+    :param port: the port the engine is listening on.
+    :param size: how many ready connections to keep open.
+    :param max_idle: how many seconds a connection may wait unused
+        before it is discarded as stale.
+    :param connect_timeout: how many seconds background connects wait.
+    :param clock: returns the current time in seconds.
+    """
+
+    def __init__(
+            self,
+            host: str = LOCALHOST,
+            port: int = DEFAULT_PORT,
+            size: int = 2,
+            max_idle: float = 5.0,
+            connect_timeout: float = 1.0,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+
+        self.host = host
+        self.port = port
+        self.size = size
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self.stats = PoolStats()
+
+        self._clock = clock
+        self._ready: Deque[Tuple[float, socket.socket]] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._refill_loop,
+            name=f"ConnectionPool:{host}:{port}",
+            daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def ready(self) -> int:
+        """How many connections are waiting to be used."""
+        return len(self._ready)
+
+    def _connect(self, timeout: Optional[float]) -> socket.socket:
+        start = self._clock()
+        sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        elapsed = self._clock() - start
+        with self._condition:
+            self.stats.record_connect(elapsed)
+        return sock
+
+    def _is_stale(self, created: float, sock: socket.socket) -> bool:
+        return self._clock() - created > self.max_idle or _peer_closed(sock)
+
+    def _prune_stale(self) -> None:
+        """Close stale connections. Must hold the condition's lock."""
+        fresh = deque()
+        for created, sock in self._ready:
+            if self._is_stale(created, sock):
+                sock.close()
+                self.stats.stale += 1
+            else:
+                fresh.append((created, sock))
+        self._ready = fresh
+
+    def _refill_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed and len(self._ready) >= self.size:
+                    self._condition.wait(timeout=self.max_idle / 2)
+                    self._prune_stale()
+                if self._closed:
+                    return
+
+            try:
+                sock = self._connect(self.connect_timeout)
+            except OSError:
+                with self._condition:
+                    self.stats.connect_failures += 1
+                    self._condition.wait(timeout=RETRY_DELAY)
+                continue
+
+            with self._condition:
+                if self._closed:
+                    sock.close()
+                    return
+                self._ready.append((self._clock(), sock))
+                self._condition.notify_all()
+
+    def acquire(self, timeout: Optional[float] = None) -> socket.socket:
+        """
+        Take a connection, opening one on the spot if none are ready.
+
+        The caller owns the returned socket and must close it.
+
+        :param timeout: how many seconds an on the spot connect may take.
+        :return: a connected socket.
+        """
+        with self._condition:
+            if self._closed:
+                raise ValueError("Can't acquire from a closed pool")
+            while self._ready:
+                created, sock = self._ready.popleft()
+                if self._is_stale(created, sock):
+                    sock.close()
+                    self.stats.stale += 1
+                    continue
+                self.stats.hits += 1
+                self._condition.notify_all()
+                return sock
+
+            self.stats.misses += 1
+            self._condition.notify_all()
+
+        return self._connect(timeout)
+
+    def close(self) -> None:
+        """Stop refilling and close every unused connection."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+        with self._condition:
+            while self._ready:
+                self._ready.popleft()[1].close()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
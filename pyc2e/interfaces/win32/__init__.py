@@ -10,16 +10,20 @@ to support opening existing handles rather than creating new ones.
 Creation may be explored in future revisions that allow imitation of the engine
 to better understand original CL tools.
 
+Opening and waiting on the engine's objects goes through a backend from
+pyc2e.interfaces.win32.backend, so the request logic here can also run
+against the emulated objects in pyc2e.interfaces.win32.emulated.
+
 
 """
 import struct
-import mmap
-from typing import ByteString
+from typing import ByteString, Optional
 
 from pyc2e.common import (
     InterfaceException,
     ConnectFailure,
-    DisconnectFailure
+    DisconnectFailure,
+    RequestTimeout
 )
 from pyc2e.interfaces.interface import (
     C2eCaosInterface,
@@ -29,12 +33,21 @@ from pyc2e.interfaces.interface import (
 )
 
 from pyc2e.interfaces.response import Response
-from pyc2e.interfaces.win32.win32api.events import Event
-from pyc2e.interfaces.win32.win32api.mutex import Mutex
-from pyc2e.interfaces.win32.win32api.process import ProcessHandle
-from pyc2e.interfaces.win32.win32api.wait import (
-    wait_for_multiple_objects,
-    INFINITE_WAIT
+from pyc2e.interfaces.tracing import (
+    DECODE,
+    FIRST_BYTE,
+    LAST_BYTE,
+    MUTEX_ACQUIRED,
+    RECONNECT,
+    REQUEST_END,
+    REQUEST_FAILED,
+    REQUEST_START,
+    REQUEST_WRITTEN
+)
+from pyc2e.interfaces.win32.backend import (
+    INFINITE_WAIT,
+    SharedMemoryBackend,
+    Win32Backend
 )
 
 DEFAULT_SHARED_MEMORY_SIZE = 1048576
@@ -46,6 +59,11 @@ OFFSET_DATA_SIZE_START = 12
 OFFSET_RESULT_LEN = 16
 OFFSET_DATA_START = 24
 
+# The buffer's signature and the engine's PID, read before each request
+HEADER_LAYOUT = struct.Struct("<4sI")
+# The result status and the length of the result data
+RESULT_LAYOUT = struct.Struct("<II")
+
 
 class BadBufferError(InterfaceException):
     """ For when the interface was acquired but it has bad memory contents"""
@@ -63,22 +81,47 @@ class ServerPIDNotFound(InterfaceException):
     pass
 
 
+class _StaleSession(Exception):
+    """The objects a persistent session holds belong to an old engine."""
+    pass
+
+
 class Win32Interface(C2eCaosInterface):
     """
     Windows shared memory interface for pyc2e engine
 
-    Currently throws away and re-acquires handles for underlying events and
-    other objects. It may be possible to cache some of these rather than
-    refreshing them each request. It should be investigated.
-
+    By default, handles for the shared memory, mutex, events and process
+    are opened for each request and thrown away afterwards.
+
+    With persistent=True, they are kept open between requests until
+    disconnect() is called. If the engine restarts, which shows up as
+    its process exiting, a different PID in the buffer, or a bad c2e@
+    header, the handles are reopened and the request is tried once more.
+    reconnects counts how often that has happened.
+
+    With zero_copy=True as well, responses wrap a memoryview of the
+    shared memory rather than a copy of the result. To keep that view
+    valid, the engine mutex stays held after each request, until the
+    next request on this interface overwrites the buffer, or until
+    release_buffer() or disconnect() is called. Meanwhile, other
+    clients of the engine wait for the mutex, so release the buffer
+    promptly when they need a turn. The mutex belongs to the thread
+    that acquired it, so use a zero-copy interface from one thread. A
+    mapping with responses still referring to it is only unmapped once
+    they're all gone.
     """
 
+    execute_prefix = b"execute\n"
+
     def __init__(
             self,
             game_name: str = "Docking Station",
             memory_size: int = DEFAULT_SHARED_MEMORY_SIZE,
             wait_timeout_ms: int = INFINITE_WAIT,
-            require_process_access: bool = True
+            require_process_access: bool = True,
+            backend: Optional[SharedMemoryBackend] = None,
+            persistent: bool = False,
+            zero_copy: bool = False
     ):
         """
 
@@ -86,43 +129,60 @@ class Win32Interface(C2eCaosInterface):
         :param memory_size: how big the shared memory buffer should be
         :param wait_timeout_ms: how many milliseconds to wait for the interface
         :param require_process_access: whether we need the process
+        :param backend: opens the engine's objects. Defaults to a
+            Win32Backend, which only works on Windows.
+        :param persistent: whether to keep handles open between requests.
+        :param zero_copy: whether responses should view the shared memory
+            instead of copying from it. Requires persistent. Each
+            response stays valid until the next request on this
+            interface, release_buffer() or disconnect().
         """
         super().__init__(
             wait_timeout_ms,
             game_name
         )
         self.require_process_access = require_process_access
+        self.backend = backend if backend is not None else Win32Backend()
+        if zero_copy and not persistent:
+            raise ValueError("zero_copy requires persistent=True")
+        self.persistent = persistent
+        self.zero_copy = zero_copy
+        self.reconnects = 0
 
         self._memory_size = memory_size
 
         self.shared_memory_name = f"{self._game_name}_mem"
         self.shared_memory = None
+        self._memory_view: Optional[memoryview] = None
 
         self.mutex_name = f"{self._game_name}_mutex"
         self.mutex_object = None
 
         self._result_event_name = f"{self._game_name}_result"
-        self.result_event: Event = None
+        self.result_event = None
 
         self.process_id = None
         self.process_handle = None
 
         self._request_event_name = f"{self._game_name}_request"
-        self.request_event: Event = None
+        self.request_event = None
+
+    @property
+    def max_request_size(self) -> int:
+        """The largest query the buffer holds, leaving room for a null."""
+        return self._memory_size - OFFSET_DATA_START - 1
 
     def _connect_body(self) -> None:
         """Initiate a connection to the engine"""
 
+        backend = self.backend
         try:
-            self.shared_memory = mmap.mmap(
-                -1,
-                self._memory_size,
-                tagname=self.shared_memory_name,
-                access=mmap.ACCESS_WRITE
-            )
-            self.mutex_object = Mutex(self.mutex_name)
-            self.result_event = Event(self._result_event_name)
-            self.request_event = Event(self._request_event_name)
+            self.shared_memory = backend.open_memory(
+                self.shared_memory_name, self._memory_size)
+            self._memory_view = memoryview(self.shared_memory)
+            self.mutex_object = backend.open_mutex(self.mutex_name)
+            self.result_event = backend.open_event(self._result_event_name)
+            self.request_event = backend.open_event(self._request_event_name)
 
             self._connected = True
         except Exception as e:
@@ -132,11 +192,26 @@ class Win32Interface(C2eCaosInterface):
         """Clean up the connection to the engine"""
 
         try:
-            del self.request_event
-            del self.result_event
-            del self.mutex_object
-            self.shared_memory.close()
-            del self.shared_memory
+            self.request_event.close()
+            self.request_event = None
+            self.result_event.close()
+            self.result_event = None
+            self.mutex_object.release()
+            self.mutex_object.close()
+            self.mutex_object = None
+            self._memory_view.release()
+            self._memory_view = None
+            try:
+                self.shared_memory.close()
+            except BufferError:
+                # Zero-copy responses still view the mapping. It will be
+                # unmapped when the last of them is garbage collected.
+                pass
+            self.shared_memory = None
+            if self.process_handle:
+                self.process_handle.close()
+            self.process_handle = None
+            self.process_id = None
 
         except Exception as e:
             raise DisconnectFailure(
@@ -151,67 +226,180 @@ class Win32Interface(C2eCaosInterface):
         :return: a response object.
         """
 
-        if not self.connected:
-            self.connect()
+        self.check_request_size(query)
 
-        self.mutex_object.acquire(wait_in_ms=self._wait_timeout_ms)
+        if self._observers:
+            self._emit(REQUEST_START, len(query), query)
+        try:
+            if not self.connected:
+                self.connect()
+            elif self.persistent and self._engine_exited():
+                self._reconnect()
+
+            try:
+                response = self._request_once(
+                    query, self.persistent and self.process_id is not None)
+            except _StaleSession:
+                self._reconnect()
+                response = self._request_once(query, False)
+
+            if not self.persistent:
+                self.disconnect()
+
+        except BaseException as e:
+            if self._observers:
+                self._emit(REQUEST_FAILED, detail=e)
+            raise
+
+        if self._observers:
+            self._emit(REQUEST_END, response.declared_length, response)
+        return response
+
+    def _engine_exited(self) -> bool:
+        """
+        Check without waiting whether the session's engine has exited.
+
+        :return: True if the held process handle is signaled.
+        """
+        if not self.process_handle:
+            return False
+        return self.backend.wait_for_any([self.process_handle], 0) == 0
 
-        # todo: better handling of struct here
-        buffer_header = self.shared_memory.read(4)
+    def _reconnect(self) -> None:
+        """
+        Reopen every handle, for when the engine has restarted.
+        """
+        self.reconnects += 1
+        if self._observers:
+            self._emit(RECONNECT)
+        self.disconnect()
+        self.connect()
+
+    def _request_once(self, query: ByteString, check_session: bool) -> Response:
+        """
+        Run a request while holding the mutex.
+
+        :param query: the query to run.
+        :param check_session: whether to raise _StaleSession instead of
+            BadBufferError if the buffer looks like it's from another
+            engine instance.
+        :return: a response object.
+        """
+        try:
+            self.mutex_object.acquire(wait_in_ms=self._wait_timeout_ms)
+        except TimeoutError as e:
+            raise RequestTimeout(
+                f"{self._game_name}'s mutex wasn't free within"
+                f" {self._wait_timeout_ms}ms"
+            ) from e
+        held = False
+        try:
+            if self._observers:
+                self._emit(MUTEX_ACQUIRED)
+            response = self._locked_request(query, check_session)
+            # A zero-copy response views the buffer, so keep the mutex
+            # until the next request or release_buffer()
+            held = self.zero_copy
+            return response
+        finally:
+            if not held:
+                self.mutex_object.release()
+
+    def release_buffer(self) -> None:
+        """
+        Let other clients use the engine while staying connected.
+
+        Only zero-copy interfaces hold the engine mutex between requests.
+        Their responses' contents are undefined after this is called.
+        """
+        if self.mutex_object is not None:
+            self.mutex_object.release()
+
+    def _locked_request(
+            self,
+            query: ByteString,
+            check_session: bool = False
+    ) -> Response:
+        """
+        Write a request and read back the result. Needs the mutex held.
+
+        :param query: the query to run.
+        :param check_session: whether to raise _StaleSession when the
+            header is bad or the PID has changed.
+        :return: a response object.
+        """
+        memory = self._memory_view
+        buffer_header, process_id = HEADER_LAYOUT.unpack_from(memory, 0)
         if C2E_BUFFER_HEADER != buffer_header:
+            if check_session:
+                raise _StaleSession()
             raise BadBufferError(buffer_header)
 
-        self.process_id = struct.unpack("I", self.shared_memory.read(4))[0]
+        if check_session and process_id != self.process_id:
+            raise _StaleSession()
+        self.process_id = process_id
 
-        # write request to the buffer here!
-        self.shared_memory.seek(OFFSET_DATA_START)
-        self.shared_memory.write(query)
-        self.shared_memory.write(b'\x00')
+        query_end = OFFSET_DATA_START + len(query)
+        memory[OFFSET_DATA_START:query_end] = query
+        memory[query_end] = 0
 
         # reset events
         self.result_event.reset()
         self.request_event.pulse()
+        if self._observers:
+            self._emit(REQUEST_WRITTEN, len(query) + 1)
 
         try:
 
-            handles_to_wait_for = [
-                self.result_event.handle,
-                self.request_event.handle
+            objects_to_wait_for = [
+                self.result_event,
+                self.request_event
             ]
 
             if self.require_process_access:
-                self.process_handle = ProcessHandle(self.process_id)
-                handles_to_wait_for.append(self.process_handle.handle)
+                if not self.process_handle:
+                    self.process_handle = self.backend.open_process(
+                        self.process_id)
+                objects_to_wait_for.append(self.process_handle)
 
-            wait_for_multiple_objects(
-                handles_to_wait_for,
+            signaled = self.backend.wait_for_any(
+                objects_to_wait_for,
                 wait_in_ms=self._wait_timeout_ms
             )
 
         finally:
-            if self.process_handle:
+            if self.process_handle and not self.persistent:
                 # if it's None or Null, the c2e instance we asked for
                 # by name either isn't running or isn't running in the same
                 # space, for example if the game is in admin mode and the.
                 # client is run as a normal user.
                 self.process_handle.close()
+                self.process_handle = None
 
-        # copy data here
-        self.shared_memory.seek(OFFSET_RESULT_STATUS)
-
-        error, res_len, = struct.unpack("<II", self.shared_memory.read(8))
-
-        # extract data
-        self.shared_memory.seek(OFFSET_DATA_START)
-        data = self.shared_memory.read(res_len)
+        if signaled is None:
+            raise RequestTimeout(
+                f"{self._game_name} did not answer within"
+                f" {self._wait_timeout_ms}ms"
+            )
 
-        self.disconnect()
+        error, res_len = RESULT_LAYOUT.unpack_from(
+            memory, OFFSET_RESULT_STATUS)
+        res_len = min(res_len, self._memory_size - OFFSET_DATA_START)
+        if self._observers:
+            # The whole result lands at once when the event is signaled
+            self._emit(FIRST_BYTE, res_len)
+            self._emit(LAST_BYTE, res_len)
+        data = memory[OFFSET_DATA_START:OFFSET_DATA_START + res_len]
 
-        return Response(
+        response = Response(
             data,
             res_len,
-            bool(error)
+            bool(error),
+            copy=not self.zero_copy
         )
+        if self._observers:
+            self._emit(DECODE, res_len)
+        return response
 
     def execute_caos(self, request_body: StrOrByteString) -> Response:
         """
@@ -221,7 +409,7 @@ class Win32Interface(C2eCaosInterface):
         """
         request_body = coerce_to_bytearray(request_body)
 
-        return self.raw_request(b"execute\n" + request_body)
+        return self.raw_request(self.execute_prefix + request_body)
 
     def add_script(
         self,
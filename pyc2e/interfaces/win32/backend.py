@@ -0,0 +1,133 @@
+"""
+Pluggable synchronization backends for the shared memory interface.
+
+Win32Interface only deals with the c2e@ buffer layout. Opening the
+named memory, mutex and events, and waiting on them, is left to a
+backend. Win32Backend does this with the real win32 API, while
+EmulatedBackend in pyc2e.interfaces.win32.emulated works anywhere so
+the request path can be tested and profiled off Windows.
+
+The win32api bindings load ctypes.windll when imported, so they are
+only imported once a Win32Backend is created.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Optional, Sequence
+
+INFINITE_WAIT = -1
+
+
+class SharedMemoryBackend(ABC):
+    """
+    Opens the named objects an engine shares and waits on them.
+
+    Mutexes must provide acquire(wait_in_ms), release() and close(), with
+    acquire raising TimeoutError if the wait runs out.
+    Events must provide reset(), pulse() and close(). Process handles
+    must provide close(). Objects from one backend can't be passed to
+    another backend's wait_for_any.
+    """
+
+    @abstractmethod
+    def open_memory(self, name: str, size: int) -> Any:
+        """
+        Map an existing named shared memory region.
+
+        :param name: the name the engine gave the region.
+        :param size: how many bytes to map.
+        :return: an mmap-like object.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def open_mutex(self, name: str) -> Any:
+        """
+        Open an existing named mutex.
+
+        :param name: the name the engine gave the mutex.
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def open_event(self, name: str) -> Any:
+        """
+        Open an existing named event.
+
+        :param name: the name the engine gave the event.
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def open_process(self, process_id: int) -> Any:
+        """
+        Open a handle which is signaled when the process exits.
+
+        :param process_id: the id of the engine's process.
+        :return:
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def wait_for_any(
+            self,
+            objects: Sequence[Any],
+            wait_in_ms: int = INFINITE_WAIT
+    ) -> Optional[int]:
+        """
+        Wait until any of the objects is signaled.
+
+        :param objects: events or process handles from this backend.
+        :param wait_in_ms: how long to wait, or INFINITE_WAIT.
+        :return: the index of a signaled object, or None on timeout.
+        """
+        raise NotImplementedError()
+
+
+class Win32Backend(SharedMemoryBackend):
+    """
+    Opens the engine's objects through the win32 API. Windows only.
+    """
+
+    def __init__(self):
+        # Deferred so that merely importing this module works anywhere
+        from pyc2e.interfaces.win32.win32api.events import Event
+        from pyc2e.interfaces.win32.win32api.mutex import Mutex
+        from pyc2e.interfaces.win32.win32api.process import ProcessHandle
+        from pyc2e.interfaces.win32.win32api import wait
+
+        self._event_class = Event
+        self._mutex_class = Mutex
+        self._process_class = ProcessHandle
+        self._wait = wait
+
+    def open_memory(self, name: str, size: int) -> Any:
+        import mmap
+        return mmap.mmap(-1, size, tagname=name, access=mmap.ACCESS_WRITE)
+
+    def open_mutex(self, name: str) -> Any:
+        return self._mutex_class(name)
+
+    def open_event(self, name: str) -> Any:
+        return self._event_class(name)
+
+    def open_process(self, process_id: int) -> Any:
+        return self._process_class(process_id)
+
+    def wait_for_any(
+            self,
+            objects: Sequence[Any],
+            wait_in_ms: int = INFINITE_WAIT
+    ) -> Optional[int]:
+        import ctypes
+
+        wait = self._wait
+        result = wait.wait_for_multiple_objects(
+            [item.handle for item in objects],
+            wait_in_ms=wait_in_ms
+        )
+        if result == wait.WAIT_TIMEOUT:
+            return None
+        if result == wait.WAIT_FAILED:
+            raise ctypes.WinError()
+        return result - wait.WAIT_OBJECT_0
@@ -0,0 +1,269 @@
+"""
+A portable imitation of the win32 objects c2e shares with clients.
+
+Shared memory is a file-backed mmap, or anonymous memory on Linux, and
+the mutex, events and process handles are built on threading
+primitives. Everything lives in the namespace of one EmulatedBackend,
+the way named objects live in a Windows session, so an engine loop such
+as pyc2e.testing.FakeSharedMemoryEngine and any number of
+Win32Interface instances can share it.
+
+Events follow win32 auto-reset semantics closely enough for the c2e
+protocol: pulse() wakes whoever is waiting at that moment without
+leaving the event signaled, and set() stays signaled until reset().
+"""
+import itertools
+import mmap
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+from pyc2e.interfaces.win32.backend import INFINITE_WAIT, SharedMemoryBackend
+
+
+def _seconds(wait_in_ms: int) -> Optional[float]:
+    return None if wait_in_ms == INFINITE_WAIT else wait_in_ms / 1000
+
+
+class _Waitable:
+    """
+    Something wait_for_any can wait on.
+
+    generation counts pulses, so waiters can tell they were woken by one
+    even though the object isn't left signaled.
+    """
+
+    def __init__(self, name: str, condition: threading.Condition):
+        self.name = name
+        self.generation = 0
+        self._signaled = False
+        self._condition = condition
+
+    @property
+    def signaled(self) -> bool:
+        return self._signaled
+
+    def close(self) -> None:
+        pass
+
+
+class EmulatedEvent(_Waitable):
+    """A named event."""
+
+    def set(self) -> None:
+        """Signal the event until it is reset."""
+        with self._condition:
+            self._signaled = True
+            self._condition.notify_all()
+
+    def reset(self) -> None:
+        """Stop signaling the event."""
+        with self._condition:
+            self._signaled = False
+
+    def pulse(self) -> None:
+        """Wake current waiters without leaving the event signaled."""
+        with self._condition:
+            self._signaled = False
+            self.generation += 1
+            self._condition.notify_all()
+
+    def wait_for_pulse(
+            self,
+            seen: int,
+            wait_in_ms: int = INFINITE_WAIT
+    ) -> Optional[int]:
+        """
+        Wait for a pulse after the one numbered seen.
+
+        Unlike wait_for_any, pulses which arrive while the caller is busy
+        aren't missed, which lets an engine loop serve back to back
+        requests.
+
+        :param seen: the generation of the last pulse handled.
+        :param wait_in_ms: how long to wait, or INFINITE_WAIT.
+        :return: the new generation, or None on timeout.
+        """
+        with self._condition:
+            if self._condition.wait_for(
+                    lambda: self.generation != seen,
+                    timeout=_seconds(wait_in_ms)
+            ):
+                return self.generation
+            return None
+
+
+class EmulatedProcess(_Waitable):
+    """A process, signaled once it exits."""
+
+    def __init__(self, pid: int, condition: threading.Condition):
+        super().__init__(str(pid), condition)
+        self.pid = pid
+
+    def exit(self) -> None:
+        with self._condition:
+            self._signaled = True
+            self._condition.notify_all()
+
+
+class EmulatedMutex:
+    """
+    A client's handle on a named mutex.
+
+    Like the win32api Mutex wrapper, acquiring an already acquired
+    handle does nothing and releasing is idempotent.
+    """
+
+    def __init__(self, name: str, lock: threading.Lock):
+        self.name = name
+        self.acquired = False
+        self._lock = lock
+
+    def acquire(self, wait_in_ms: int = INFINITE_WAIT) -> None:
+        if self.acquired:
+            return
+        timeout = _seconds(wait_in_ms)
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f"Timed out waiting for mutex {self.name}")
+        self.acquired = True
+
+    def release(self) -> None:
+        if self.acquired:
+            self._lock.release()
+        self.acquired = False
+
+    def close(self) -> None:
+        self.release()
+
+
+class EmulatedBackend(SharedMemoryBackend):
+    """
+    A namespace of emulated named objects.
+
+    Engines create objects with the create_ methods. Clients open them
+    with the SharedMemoryBackend methods, which raise FileNotFoundError
+    or ProcessLookupError for names nobody has created.
+
+    :param directory: where to put the files backing shared memory.
+        Defaults to the system temporary directory.
+    :param anonymous: back shared memory with anonymous memory from
+        os.memfd_create instead of files, so no disk is involved. Only
+        available on Linux.
+    """
+
+    def __init__(
+            self,
+            directory: Optional[str] = None,
+            anonymous: bool = False
+    ):
+        if anonymous and not hasattr(os, "memfd_create"):
+            raise ValueError("Anonymous shared memory needs os.memfd_create")
+        self._directory = directory
+        self._anonymous = anonymous
+        self._condition = threading.Condition()
+        self._memory_paths: Dict[str, str] = {}
+        self._memory_fds: Dict[str, int] = {}
+        self._mutexes: Dict[str, threading.Lock] = {}
+        self._events: Dict[str, EmulatedEvent] = {}
+        self._processes: Dict[int, EmulatedProcess] = {}
+        self._pids = itertools.count(1000)
+
+    def create_memory(self, name: str, size: int) -> mmap.mmap:
+        """
+        Create a zero-filled named shared memory region.
+
+        :param name: the region's name.
+        :param size: its size in bytes.
+        :return: the creator's mapping of it.
+        """
+        self.remove_memory(name)
+        if self._anonymous:
+            fd = os.memfd_create(f"pyc2e-{name}")
+            os.ftruncate(fd, size)
+            self._memory_fds[name] = fd
+            return mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+
+        fd, path = tempfile.mkstemp(prefix="pyc2e-", dir=self._directory)
+        try:
+            os.ftruncate(fd, size)
+            memory = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+        finally:
+            os.close(fd)
+        self._memory_paths[name] = path
+        return memory
+
+    def remove_memory(self, name: str) -> None:
+        """
+        Delete a region's backing file. Existing mappings stay usable.
+
+        :param name: the region's name.
+        """
+        path = self._memory_paths.pop(name, None)
+        if path is not None:
+            os.remove(path)
+        fd = self._memory_fds.pop(name, None)
+        if fd is not None:
+            os.close(fd)
+
+    def create_mutex(self, name: str) -> EmulatedMutex:
+        self._mutexes[name] = threading.Lock()
+        return self.open_mutex(name)
+
+    def create_event(self, name: str) -> EmulatedEvent:
+        self._events[name] = EmulatedEvent(name, self._condition)
+        return self._events[name]
+
+    def create_process(self) -> EmulatedProcess:
+        """
+        Register a pretend process with a new process id.
+
+        :return:
+        """
+        process = EmulatedProcess(next(self._pids), self._condition)
+        self._processes[process.pid] = process
+        return process
+
+    def open_memory(self, name: str, size: int) -> mmap.mmap:
+        if name in self._memory_fds:
+            return mmap.mmap(
+                self._memory_fds[name], size, access=mmap.ACCESS_WRITE)
+        if name not in self._memory_paths:
+            raise FileNotFoundError(f"No shared memory named {name!r}")
+        with open(self._memory_paths[name], "r+b") as file:
+            return mmap.mmap(file.fileno(), size, access=mmap.ACCESS_WRITE)
+
+    def open_mutex(self, name: str) -> EmulatedMutex:
+        if name not in self._mutexes:
+            raise FileNotFoundError(f"No mutex named {name!r}")
+        return EmulatedMutex(name, self._mutexes[name])
+
+    def open_event(self, name: str) -> EmulatedEvent:
+        if name not in self._events:
+            raise FileNotFoundError(f"No event named {name!r}")
+        return self._events[name]
+
+    def open_process(self, process_id: int) -> EmulatedProcess:
+        if process_id not in self._processes:
+            raise ProcessLookupError(f"No process with id {process_id}")
+        return self._processes[process_id]
+
+    def wait_for_any(
+            self,
+            objects: Sequence[Any],
+            wait_in_ms: int = INFINITE_WAIT
+    ) -> Optional[int]:
+        with self._condition:
+            start = [item.generation for item in objects]
+            found: Optional[int] = None
+
+            def ready() -> bool:
+                nonlocal found
+                for index, item in enumerate(objects):
+                    if item.signaled or item.generation != start[index]:
+                        found = index
+                        return True
+                return False
+
+            self._condition.wait_for(ready, timeout=_seconds(wait_in_ms))
+            return found
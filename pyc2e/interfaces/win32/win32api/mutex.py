@@ -17,7 +17,8 @@ from pyc2e.interfaces.win32.win32api.common import (
 from pyc2e.interfaces.win32.win32api.wait import (
     INFINITE_WAIT,
     wait_for_single_object,
-    WAIT_OBJECT_0
+    WAIT_OBJECT_0,
+    WAIT_TIMEOUT
 )
 
 # TODO: do we need to have all_access, or does synchronize work fine?
@@ -74,6 +75,9 @@ class Mutex(ObjectWithHandle):
             wait_result = wait_for_single_object(self.handle, wait_in_ms)
             if wait_result is WAIT_OBJECT_0:
                 self.acquired = True
+            elif wait_result == WAIT_TIMEOUT:
+                self.acquired = False
+                raise TimeoutError(f"Timed out waiting for mutex {self.name}")
             else:
                 self.acquired = False
                 raise ctypes.WinError()
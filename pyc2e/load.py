@@ -0,0 +1,450 @@
+"""
+Open-loop load generation at a fixed request rate.
+
+Unlike pyc2e.bench, where each worker waits for an answer before sending
+again, requests here are scheduled at fixed intervals whether or not
+earlier ones have been answered. Latency is measured from when each
+request was meant to be sent, so time spent queued behind a slow engine
+counts against it instead of quietly lowering the send rate, which is
+known as correcting for coordinated omission.
+
+Each step of a ramp runs at a higher rate. A step is saturated when the
+engines can no longer keep up, which makes the last unsaturated rate the
+highest safe polling rate.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from bisect import bisect
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import accumulate
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from pyc2e.common import RequestTimeout
+from pyc2e.fan_out import EngineTarget, interface_for_target
+from pyc2e.interfaces.interface import (
+    C2eCaosInterface,
+    StrOrByteString,
+    coerce_to_bytearray
+)
+from pyc2e.interfaces.unix.async_interface import AsyncUnixInterface
+from pyc2e.metrics import LatencyHistogram
+
+MODE_SYNC = "sync"
+MODE_ASYNC = "async"
+MODES = (MODE_SYNC, MODE_ASYNC)
+
+DEFAULT_MAX_IN_FLIGHT = 64
+DEFAULT_SLO_MS = 100.0
+# Steps completing fewer than this share of their requests per second
+# count as saturated
+MIN_THROUGHPUT_RATIO = 0.9
+# Steps with more than this share of failed requests count as saturated
+MAX_ERROR_RATIO = 0.01
+
+
+class QueryMix:
+    """
+    Picks queries at random in proportion to their weights.
+
+    :param weighted_queries: (weight, CAOS) pairs.
+    :param seed: seeds the random choices, for repeatable runs.
+    """
+
+    def __init__(
+            self,
+            weighted_queries: Sequence[Tuple[float, StrOrByteString]],
+            seed: Optional[int] = None
+    ):
+        if not weighted_queries:
+            raise ValueError("At least one query is required")
+        if any(weight <= 0 for weight, _ in weighted_queries):
+            raise ValueError("Weights must be positive")
+
+        self.queries = [
+            bytes(coerce_to_bytearray(query)) for _, query in weighted_queries
+        ]
+        self._cumulative = list(
+            accumulate(weight for weight, _ in weighted_queries))
+        self._random = random.Random(seed)
+
+    def pick(self) -> bytes:
+        """
+        Choose the next query to send.
+
+        :return:
+        """
+        point = self._random.random() * self._cumulative[-1]
+        return self.queries[bisect(self._cumulative, point)]
+
+
+class LoadStep:
+    """
+    What happened while sending at one rate.
+
+    Each request's time is split into dispatch lag, the scheduler being
+    late to send it, queue wait, waiting for a free in-flight slot, and
+    service time, the round trip itself. latency covers all three.
+    Histograms are in seconds and reported in milliseconds.
+
+    :param rate: the requests per second aimed for.
+    :param duration: how many seconds requests were scheduled for.
+    """
+
+    def __init__(self, rate: float, duration: float):
+        self.rate = rate
+        self.duration = duration
+        self.scheduled = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.errors: Dict[str, int] = {}
+        self.elapsed = 0.0
+
+        self.latency = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+        self.dispatch_lag = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def record(
+            self,
+            intended: float,
+            dispatched: float,
+            started: float,
+            finished: float,
+            error: Optional[BaseException] = None
+    ) -> None:
+        """
+        Count one finished request.
+
+        :param intended: when the request was scheduled to be sent.
+        :param dispatched: when the scheduler handed it off.
+        :param started: when its round trip began.
+        :param finished: when its round trip ended.
+        :param error: what it raised, if anything.
+        """
+        with self._lock:
+            self.completed += 1
+            self.latency.record(finished - intended)
+            self.service.record(finished - started)
+            self.queue_wait.record(started - dispatched)
+            self.dispatch_lag.record(dispatched - intended)
+            if error is not None:
+                name = type(error).__name__
+                self.errors[name] = self.errors.get(name, 0) + 1
+                if isinstance(error, RequestTimeout):
+                    self.timeouts += 1
+
+    @property
+    def throughput(self) -> float:
+        """Requests answered per second, including late answers."""
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_count(self) -> int:
+        return sum(self.errors.values())
+
+    def saturated(self, slo_ms: Optional[float] = DEFAULT_SLO_MS) -> bool:
+        """
+        Whether this rate was more than the engines could keep up with.
+
+        :param slo_ms: the highest acceptable p99 latency, or None to
+            only judge by throughput and errors.
+        :return:
+        """
+        if self.throughput < self.rate * MIN_THROUGHPUT_RATIO:
+            return True
+        if self.completed and \
+                self.error_count / self.completed > MAX_ERROR_RATIO:
+            return True
+        return slo_ms is not None and \
+            self.latency.percentile(99) * 1000 > slo_ms
+
+    @property
+    def bottleneck(self) -> str:
+        """
+        Which part of the request's time grew the most.
+
+        "client" means the scheduler fell behind, "in_flight" means
+        requests waited for a free slot, so max_in_flight is too low to
+        load the engines further, and "engine" means round trips slowed.
+        """
+        parts = {
+            "client": self.dispatch_lag.percentile(99),
+            "in_flight": self.queue_wait.percentile(99),
+            "engine": self.service.percentile(99),
+        }
+        return max(parts, key=parts.get)
+
+    def summary(self, slo_ms: Optional[float] = DEFAULT_SLO_MS) -> Dict:
+        """
+        Build a JSON-friendly summary of the step.
+
+        :param slo_ms: passed to saturated.
+        :return:
+        """
+        return {
+            "rate": self.rate,
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "errors": self.error_count,
+            "errors_by_type": dict(self.errors),
+            "timeouts": self.timeouts,
+            "elapsed_s": self.elapsed,
+            "throughput": self.throughput,
+            "saturated": self.saturated(slo_ms),
+            "bottleneck": self.bottleneck,
+            "latency_ms": self.latency.summary(),
+            "service_ms": self.service.summary(),
+            "queue_wait_ms": self.queue_wait.summary(),
+            "dispatch_lag_ms": self.dispatch_lag.summary(),
+        }
+
+
+class LoadReport:
+    """
+    The steps of a load run, in the order they ran.
+
+    :param slo_ms: the highest acceptable p99 latency, or None.
+    """
+
+    def __init__(self, slo_ms: Optional[float] = DEFAULT_SLO_MS):
+        self.slo_ms = slo_ms
+        self.steps: List[LoadStep] = []
+
+    @property
+    def max_safe_rate(self) -> Optional[float]:
+        """The highest rate before the first saturated step, if any."""
+        safe = None
+        for step in self.steps:
+            if step.saturated(self.slo_ms):
+                break
+            safe = step.rate
+        return safe
+
+    def summary(self) -> Dict[str, object]:
+        """
+        Build a JSON-friendly summary of the run.
+
+        :return:
+        """
+        return {
+            "slo_ms": self.slo_ms,
+            "max_safe_rate": self.max_safe_rate,
+            "steps": [step.summary(self.slo_ms) for step in self.steps],
+        }
+
+    def to_json(self) -> str:
+        """Render summary() as indented JSON."""
+        return json.dumps(self.summary(), indent=2)
+
+    def to_table(self) -> str:
+        header = (
+            "rate", "req/s", "done", "errors", "p50 ms", "p99 ms",
+            "service p99", "lag p99", "saturated"
+        )
+        rows = [header]
+        for step in self.steps:
+            rows.append((
+                "%g" % step.rate,
+                "%.1f" % step.throughput,
+                str(step.completed),
+                str(step.error_count),
+                "%.3f" % (step.latency.percentile(50) * 1000),
+                "%.3f" % (step.latency.percentile(99) * 1000),
+                "%.3f" % (step.service.percentile(99) * 1000),
+                "%.3f" % (step.dispatch_lag.percentile(99) * 1000),
+                step.bottleneck if step.saturated(self.slo_ms) else "no",
+            ))
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        lines = [
+            "  ".join(cell.rjust(width) for cell, width in zip(row, widths))
+            for row in rows
+        ]
+        safe = self.max_safe_rate
+        lines.append(
+            "max safe rate: " + ("none" if safe is None else "%g/s" % safe))
+        return "\n".join(lines)
+
+
+def _sleep_until(moment: float) -> None:
+    delay = moment - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _run_step_sync(
+        step: LoadStep,
+        interfaces: Callable[[int], C2eCaosInterface],
+        target_count: int,
+        mix: QueryMix,
+        executor: ThreadPoolExecutor
+) -> None:
+
+    def send(intended: float, dispatched: float, target: int, query: bytes):
+        started = time.perf_counter()
+        error = None
+        try:
+            interfaces(target).execute_caos(query)
+        except Exception as e:
+            error = e
+        step.record(intended, dispatched, started, time.perf_counter(), error)
+
+    count = int(step.rate * step.duration)
+    futures = []
+    start = time.perf_counter()
+    for number in range(count):
+        intended = start + number / step.rate
+        _sleep_until(intended)
+        futures.append(executor.submit(
+            send,
+            intended,
+            time.perf_counter(),
+            number % target_count,
+            mix.pick()
+        ))
+        step.scheduled += 1
+    wait(futures)
+    step.elapsed = time.perf_counter() - start
+
+
+async def _run_step_async(
+        step: LoadStep,
+        interfaces: Sequence[AsyncUnixInterface],
+        mix: QueryMix,
+        max_in_flight: int
+) -> None:
+    slots = asyncio.Semaphore(max_in_flight)
+
+    async def send(intended: float, dispatched: float, target, query):
+        async with slots:
+            started = time.perf_counter()
+            error = None
+            try:
+                await target.execute_caos(query)
+            except Exception as e:
+                error = e
+            step.record(
+                intended, dispatched, started, time.perf_counter(), error)
+
+    count = int(step.rate * step.duration)
+    pending = set()
+    start = time.perf_counter()
+    for number in range(count):
+        intended = start + number / step.rate
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.ensure_future(send(
+            intended,
+            time.perf_counter(),
+            interfaces[number % len(interfaces)],
+            mix.pick()
+        ))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        step.scheduled += 1
+    if pending:
+        await asyncio.wait(pending)
+    step.elapsed = time.perf_counter() - start
+
+
+def run_load(
+        targets: Sequence[EngineTarget],
+        mix: QueryMix,
+        rates: Sequence[float],
+        step_duration: float,
+        mode: str = MODE_SYNC,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        timeout: int = 100,
+        slo_ms: Optional[float] = DEFAULT_SLO_MS,
+        stop_when_saturated: bool = False
+) -> LoadReport:
+    """
+    Send a query mix at each rate in turn and measure how it went.
+
+    Requests are spread round-robin over the targets. In sync mode, a
+    pool of max_in_flight threads sends them through UnixInterface, or
+    the platform's interface for game names. In async mode, they're
+    sent from one event loop through AsyncUnixInterface, which only
+    takes (host, port) targets. Either way, at most max_in_flight
+    requests are outstanding, and the rest wait for a slot.
+
+    :param targets: game names or (host, port) pairs.
+    :param mix: the queries to send.
+    :param rates: the requests per second for each step, usually rising.
+    :param step_duration: how many seconds to schedule requests for at
+        each rate.
+    :param mode: MODE_SYNC or MODE_ASYNC.
+    :param max_in_flight: the most requests outstanding at once.
+    :param timeout: How many ms to wait for each response
+    :param slo_ms: the highest acceptable p99 latency, used to decide
+        which steps are saturated. None only judges by throughput and
+        errors.
+    :param stop_when_saturated: whether to skip the rest of the ramp
+        after the first saturated step.
+    :return: a report with a step per rate run.
+    """
+    if not targets:
+        raise ValueError("At least one target is required")
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if any(rate <= 0 for rate in rates):
+        raise ValueError("Rates must be positive")
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+
+    report = LoadReport(slo_ms)
+
+    if mode == MODE_ASYNC:
+        if any(isinstance(target, str) for target in targets):
+            raise ValueError("Async mode needs (host, port) targets")
+        interfaces = [
+            AsyncUnixInterface(port=port, host=host, wait_timeout_ms=timeout)
+            for host, port in targets
+        ]
+
+        async def ramp() -> None:
+            for rate in rates:
+                step = LoadStep(rate, step_duration)
+                report.steps.append(step)
+                await _run_step_async(step, interfaces, mix, max_in_flight)
+                if stop_when_saturated and step.saturated(slo_ms):
+                    return
+
+        asyncio.run(ramp())
+        return report
+
+    # UnixInterface isn't thread-safe, so each thread gets its own
+    local = threading.local()
+
+    def interface_for(index: int) -> C2eCaosInterface:
+        per_thread = getattr(local, "interfaces", None)
+        if per_thread is None:
+            per_thread = local.interfaces = {}
+        interface = per_thread.get(index)
+        if interface is None:
+            interface = interface_for_target(targets[index], timeout)
+            per_thread[index] = interface
+        return interface
+
+    with ThreadPoolExecutor(
+            max_in_flight, thread_name_prefix="pyc2e-load") as executor:
+        for rate in rates:
+            step = LoadStep(rate, step_duration)
+            report.steps.append(step)
+            _run_step_sync(step, interface_for, len(targets), mix, executor)
+            if stop_when_saturated and step.saturated(slo_ms):
+                break
+
+    return report
@@ -0,0 +1,401 @@
+"""
+Continuous request metrics in fixed memory.
+
+A MetricsRegistry attaches to interfaces as a tracing observer and keeps
+counters and log-bucketed latency histograms for each of them, plus a
+histogram per query label. Nothing grows with the number of requests,
+so it can stay attached to a long-running poller::
+
+    metrics = MetricsRegistry()
+    metrics.attach(interface, name="ds")
+    with metrics.label("chem poll"):
+        interface.execute_caos(query)
+    print(metrics.to_prometheus())
+"""
+import json
+import math
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pyc2e.common import RequestTimeout
+from pyc2e.interfaces.interface import C2eCaosInterface
+from pyc2e.interfaces.tracing import (
+    LAST_BYTE,
+    RECONNECT,
+    REQUEST_END,
+    REQUEST_FAILED,
+    REQUEST_START,
+    REQUEST_WRITTEN,
+    TraceEvent
+)
+
+# Latencies at or under this many seconds share the first bucket
+HISTOGRAM_MIN_SECONDS = 1e-6
+HISTOGRAM_BUCKETS_PER_DOUBLING = 4
+# 2 ** 28 microseconds is about 4.5 minutes
+HISTOGRAM_DOUBLINGS = 28
+# Labels past this many per interface are counted under OTHER_LABEL
+DEFAULT_MAX_LABELS = 64
+OTHER_LABEL = "other"
+
+COUNTER_HELP = {
+    "requests": "Requests sent, including failed ones.",
+    "errors": "Requests which raised or got an error response.",
+    "timeouts": "Requests which timed out.",
+    "bytes_sent": "Bytes written to the engine.",
+    "bytes_received": "Bytes read from the engine.",
+    "reconnects": "Reconnects after the engine restarted.",
+}
+
+
+class LatencyHistogram:
+    """
+    Counts latencies in logarithmically sized buckets.
+
+    Each bucket's upper bound is HISTOGRAM_BUCKETS_PER_DOUBLING times
+    finer than a doubling, so percentiles are within about 19% of the
+    true value. Latencies past the last bound go in an overflow bucket.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = array(
+            "Q", bytes(8 * (bucket_count() + 1)))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """
+        Count one latency.
+
+        :param seconds: the latency to count.
+        """
+        if seconds <= HISTOGRAM_MIN_SECONDS:
+            index = 0
+        else:
+            index = min(
+                bucket_count(),
+                math.ceil(
+                    math.log2(seconds / HISTOGRAM_MIN_SECONDS)
+                    * HISTOGRAM_BUCKETS_PER_DOUBLING
+                )
+            )
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float:
+        """
+        Estimate a percentile as the upper bound of its bucket.
+
+        :param percent: a percentage from 0 to 100.
+        :return: seconds, or 0.0 if nothing has been recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= rank:
+                return min(bucket_bound(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Summarize the histogram in milliseconds.
+
+        :return:
+        """
+        mean = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "mean_ms": mean * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+    def cumulative(self) -> Iterator[Tuple[float, int]]:
+        """
+        Yield (upper bound, count at or under it) once per doubling.
+
+        Cumulative counts are exact at any bucket boundary, so skipping
+        the finer ones only loses resolution.
+
+        :return:
+        """
+        seen = 0
+        for index, bucket in enumerate(self.counts[:-1]):
+            seen += bucket
+            if index % HISTOGRAM_BUCKETS_PER_DOUBLING == 0:
+                yield bucket_bound(index), seen
+
+
+def bucket_count() -> int:
+    """How many bounded buckets a histogram has, not counting overflow."""
+    return HISTOGRAM_DOUBLINGS * HISTOGRAM_BUCKETS_PER_DOUBLING
+
+
+def bucket_bound(index: int) -> float:
+    """
+    The upper bound of a histogram bucket.
+
+    :param index: the bucket's index.
+    :return: seconds, or infinity for the overflow bucket.
+    """
+    if index >= bucket_count():
+        return math.inf
+    return HISTOGRAM_MIN_SECONDS * 2 ** (index / HISTOGRAM_BUCKETS_PER_DOUBLING)
+
+
+class InterfaceMetrics:
+    """
+    Counters and histograms for one interface.
+
+    Instances are tracing observers. They assume the interface sends one
+    request at a time, as interfaces do.
+
+    :param name: what to call the interface in exports.
+    :param registry: where to look up the current query label.
+    :param max_labels: how many distinct labels to keep histograms for.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            registry: "MetricsRegistry",
+            max_labels: int = DEFAULT_MAX_LABELS
+    ):
+        self.name = name
+        self.max_labels = max_labels
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTER_HELP, 0)
+        self.latency = LatencyHistogram()
+        self.labels: Dict[str, LatencyHistogram] = {}
+
+        self._registry = registry
+        self._started: Optional[float] = None
+        self._label: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _histogram_for(self, label: str) -> LatencyHistogram:
+        histogram = self.labels.get(label)
+        if histogram is None:
+            with self._lock:
+                if label not in self.labels and \
+                        len(self.labels) >= self.max_labels:
+                    label = OTHER_LABEL
+                histogram = self.labels.setdefault(label, LatencyHistogram())
+        return histogram
+
+    def __call__(
+            self,
+            interface: C2eCaosInterface,
+            event: TraceEvent
+    ) -> None:
+        name = event.name
+        counters = self.counters
+        if name == REQUEST_START:
+            self._started = event.timestamp
+            self._label = self._registry.current_label()
+        elif name == REQUEST_WRITTEN:
+            counters["bytes_sent"] += event.nbytes
+        elif name == LAST_BYTE:
+            counters["bytes_received"] += event.nbytes
+        elif name == RECONNECT:
+            counters["reconnects"] += 1
+        elif name in (REQUEST_END, REQUEST_FAILED):
+            counters["requests"] += 1
+            if name == REQUEST_FAILED:
+                counters["errors"] += 1
+                if isinstance(event.detail, RequestTimeout):
+                    counters["timeouts"] += 1
+            elif getattr(event.detail, "error", None):
+                counters["errors"] += 1
+
+            if self._started is not None:
+                elapsed = event.timestamp - self._started
+                self.latency.record(elapsed)
+                if self._label is not None:
+                    self._histogram_for(self._label).record(elapsed)
+            self._started = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Build a JSON-friendly view of the counters and histograms.
+
+        :return:
+        """
+        return {
+            **self.counters,
+            "latency": self.latency.summary(),
+            "labels": {
+                label: histogram.summary()
+                for label, histogram in sorted(self.labels.items())
+            },
+        }
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n") \
+        .replace('"', '\\"')
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(bound)
+
+
+def _histogram_lines(
+        metric: str,
+        labels: str,
+        histogram: LatencyHistogram
+) -> List[str]:
+    lines = [
+        f'{metric}_bucket{{{labels},le="{_format_bound(bound)}"}} {count}'
+        for bound, count in histogram.cumulative()
+    ]
+    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{metric}_sum{{{labels}}} {histogram.total!r}")
+    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics for any number of interfaces, exportable as JSON or in the
+    Prometheus text format.
+
+    :param max_labels: how many distinct query labels to keep per
+        interface before counting the rest together.
+    """
+
+    def __init__(self, max_labels: int = DEFAULT_MAX_LABELS):
+        self.max_labels = max_labels
+        self.interfaces: Dict[str, InterfaceMetrics] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def attach(
+            self,
+            interface: C2eCaosInterface,
+            name: Optional[str] = None
+    ) -> InterfaceMetrics:
+        """
+        Start collecting metrics for an interface.
+
+        Attaching several interfaces under one name is fine as long as
+        they don't send requests concurrently.
+
+        :param interface: the interface to observe.
+        :param name: what to call it in exports. Defaults to host:port
+            for socket interfaces and the game name otherwise.
+        :return: the metrics for that name.
+        """
+        if name is None:
+            if hasattr(interface, "host"):
+                name = f"{interface.host}:{interface.port}"
+            else:
+                name = interface._game_name
+
+        with self._lock:
+            metrics = self.interfaces.get(name)
+            if metrics is None:
+                metrics = InterfaceMetrics(name, self, self.max_labels)
+                self.interfaces[name] = metrics
+        interface.add_observer(metrics)
+        return metrics
+
+    def detach(self, interface: C2eCaosInterface) -> None:
+        """
+        Stop collecting metrics for an interface, keeping what was
+        already collected.
+
+        :param interface: an interface passed to attach.
+        """
+        for metrics in list(self.interfaces.values()):
+            interface.remove_observer(metrics)
+
+    def current_label(self) -> Optional[str]:
+        """The label set by label() on this thread, if any."""
+        return getattr(self._local, "label", None)
+
+    @contextmanager
+    def label(self, name: str) -> Iterator[None]:
+        """
+        Label the requests made on this thread inside the block.
+
+        Each label gets its own latency histogram.
+
+        :param name: the label, such as the kind of query.
+        """
+        previous = self.current_label()
+        self._local.label = name
+        try:
+            yield
+        finally:
+            self._local.label = previous
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get every interface's metrics as a JSON-friendly dict.
+
+        :return:
+        """
+        return {
+            name: metrics.snapshot()
+            for name, metrics in sorted(self.interfaces.items())
+        }
+
+    def to_json(self) -> str:
+        """Render snapshot() as indented JSON."""
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "pyc2e") -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        :param prefix: prepended to each metric name.
+        :return:
+        """
+        items = sorted(self.interfaces.items())
+        lines: List[str] = []
+        for counter, help_text in COUNTER_HELP.items():
+            metric = f"{prefix}_{counter}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(
+                f'{metric}{{interface="{_escape_label(name)}"}}'
+                f" {metrics.counters[counter]}"
+                for name, metrics in items
+            )
+
+        metric = f"{prefix}_request_duration_seconds"
+        lines.append(f"# HELP {metric} Request latency.")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, metrics in items:
+            lines.extend(_histogram_lines(
+                metric,
+                f'interface="{_escape_label(name)}"',
+                metrics.latency
+            ))
+
+        metric = f"{prefix}_query_duration_seconds"
+        lines.append(f"# HELP {metric} Request latency per query label.")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, metrics in items:
+            for label, histogram in sorted(metrics.labels.items()):
+                lines.extend(_histogram_lines(
+                    metric,
+                    f'interface="{_escape_label(name)}",'
+                    f'label="{_escape_label(label)}"',
+                    histogram
+                ))
+
+        return "\n".join(lines) + "\n"
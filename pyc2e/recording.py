@@ -0,0 +1,364 @@
+"""
+Capture engine traffic to a binary log and replay it later.
+
+A SessionRecorder is a tracing observer which appends each request's
+bytes, response bytes, error flags and timings to a log. replay() sends
+the logged requests again at their original pace, faster, or as fast as
+possible, so a latency spike seen in production can be reproduced
+against a fake engine, or two client versions compared on the same
+traffic::
+
+    interface.start_recording("session.pc2e")
+    ...
+    interface.stop_recording()
+
+    with open("session.pc2e", "rb") as log:
+        report = replay(read_records(log), other_interface, speed=4)
+
+The log is a FILE_HEADER followed by records, each a RECORD_HEADER and
+then the request and response bytes it gives the lengths of. Records are
+only ever appended, so a log can be read while it's being written, and
+a log cut short by a crash reads up to its last whole record.
+
+Requests are logged as passed to raw_request, so logs should be replayed
+through the same kind of interface they were recorded from.
+"""
+import json
+import os
+import struct
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    BinaryIO,
+    Dict,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union
+)
+
+from pyc2e.common import RequestTimeout
+from pyc2e.interfaces.tracing import (
+    REQUEST_END,
+    REQUEST_FAILED,
+    REQUEST_START,
+    TraceEvent
+)
+from pyc2e.metrics import LatencyHistogram
+
+if TYPE_CHECKING:
+    from pyc2e.interfaces.interface import C2eCaosInterface
+
+LOG_MAGIC = b"pc2e"
+LOG_VERSION = 1
+
+# Magic, format version, and the wall clock time recording started at
+FILE_HEADER = struct.Struct("<4sHd")
+# Seconds from the start of recording to the request, its duration,
+# flags, and the lengths of the request and response that follow
+RECORD_HEADER = struct.Struct("<ddBII")
+
+# The engine answered with an error
+FLAG_ERROR = 1
+# The request raised instead of returning a response
+FLAG_FAILED = 2
+# The request timed out. Always set along with FLAG_FAILED
+FLAG_TIMEOUT = 4
+# The response was streamed, so its body wasn't captured
+FLAG_STREAMED = 8
+
+LogTarget = Union[str, "os.PathLike[str]", BinaryIO]
+
+
+class LogFormatError(ValueError):
+    """The data isn't a log written by SessionRecorder."""
+    pass
+
+
+class Record(NamedTuple):
+    """
+    One logged request.
+
+    offset and duration are in seconds.
+    """
+    offset: float
+    duration: float
+    flags: int
+    request: bytes
+    response: bytes
+
+    @property
+    def error(self) -> bool:
+        return bool(self.flags & FLAG_ERROR)
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.flags & FLAG_FAILED)
+
+
+class SessionRecorder:
+    """
+    An observer which logs every request made through the interfaces
+    it's added to.
+
+    One recorder can be shared by interfaces on several threads, as long
+    as each interface is only used by one thread at a time.
+
+    Records are flushed to the log at most flush_interval seconds after
+    the previous flush, when the next one is written, so another process
+    can follow the log while it grows.
+
+    :param target: a path to create the log at, or a binary stream to
+        write it to. Streams are left open by close().
+    :param flush_interval: the most seconds records may sit in buffers
+        while more are written. 0 flushes after every record.
+    """
+
+    def __init__(self, target: LogTarget, flush_interval: float = 1.0):
+        if isinstance(target, (str, os.PathLike)):
+            self._stream = open(target, "wb")
+            self._owns_stream = True
+        else:
+            self._stream = target
+            self._owns_stream = False
+
+        self.records = 0
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # What each interface is in the middle of sending
+        self._pending: Dict[int, Tuple[float, bytes]] = {}
+        self._started = time.perf_counter()
+        self._last_flush = self._started
+        self._stream.write(
+            FILE_HEADER.pack(LOG_MAGIC, LOG_VERSION, time.time()))
+
+    def __call__(
+            self,
+            interface: "C2eCaosInterface",
+            event: TraceEvent
+    ) -> None:
+        name = event.name
+        if name == REQUEST_START:
+            self._pending[id(interface)] = (
+                event.timestamp, bytes(event.detail or b""))
+            return
+        if name != REQUEST_END and name != REQUEST_FAILED:
+            return
+
+        pending = self._pending.pop(id(interface), None)
+        if pending is None:
+            return
+        started, request = pending
+
+        flags = 0
+        response = b""
+        if name == REQUEST_FAILED:
+            flags |= FLAG_FAILED
+            if isinstance(event.detail, RequestTimeout):
+                flags |= FLAG_TIMEOUT
+        elif event.detail is None:
+            flags |= FLAG_STREAMED
+        else:
+            response = event.detail.view
+            if event.detail.error:
+                flags |= FLAG_ERROR
+
+        header = RECORD_HEADER.pack(
+            started - self._started,
+            event.timestamp - started,
+            flags,
+            len(request),
+            len(response)
+        )
+        with self._lock:
+            self._stream.write(header)
+            self._stream.write(request)
+            self._stream.write(response)
+            self.records += 1
+            now = time.perf_counter()
+            if now - self._last_flush >= self.flush_interval:
+                self._stream.flush()
+                self._last_flush = now
+
+    def flush(self) -> None:
+        """Push buffered records out to the log."""
+        with self._lock:
+            self._stream.flush()
+
+    def close(self) -> None:
+        """Flush the log, closing it if the recorder opened it."""
+        self.flush()
+        if self._owns_stream:
+            self._stream.close()
+
+    def __enter__(self) -> "SessionRecorder":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> Optional[bytes]:
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return data
+
+
+def read_records(stream: BinaryIO) -> Iterator[Record]:
+    """
+    Read the records of a log, one at a time.
+
+    A partly written record at the end is ignored.
+
+    :param stream: a binary stream positioned at the start of a log.
+    :return: an iterator of Record.
+    """
+    header = _read_exactly(stream, FILE_HEADER.size)
+    if header is None:
+        raise LogFormatError("Log is too short to have a header")
+    magic, version, _ = FILE_HEADER.unpack(header)
+    if magic != LOG_MAGIC:
+        raise LogFormatError(f"Not a pyc2e log: starts with {magic!r}")
+    if version != LOG_VERSION:
+        raise LogFormatError(f"Unsupported log version {version}")
+
+    while True:
+        header = _read_exactly(stream, RECORD_HEADER.size)
+        if header is None:
+            return
+        offset, duration, flags, request_length, response_length = \
+            RECORD_HEADER.unpack(header)
+        request = _read_exactly(stream, request_length)
+        response = _read_exactly(stream, response_length)
+        if request is None or response is None:
+            return
+        yield Record(offset, duration, flags, request, response)
+
+
+class ReplayReport:
+    """
+    How a replay went, next to how the recorded session went.
+
+    Latencies are stored in seconds and reported in milliseconds.
+    """
+
+    def __init__(self):
+        self.recorded = LatencyHistogram()
+        self.replayed = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.failures: Dict[str, int] = {}
+        # Responses which differ from the recorded ones
+        self.mismatches = 0
+        # The furthest behind schedule a request was sent
+        self.max_lag = 0.0
+        self.elapsed = 0.0
+
+    def summary(self) -> Dict[str, object]:
+        """
+        Build a JSON-friendly summary of the replay.
+
+        :return:
+        """
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "failures": sum(self.failures.values()),
+            "failures_by_type": dict(self.failures),
+            "mismatches": self.mismatches,
+            "elapsed_s": self.elapsed,
+            "max_lag_ms": self.max_lag * 1000,
+            "recorded_latency_ms": self.recorded.summary(),
+            "replayed_latency_ms": self.replayed.summary(),
+        }
+
+    def to_json(self) -> str:
+        """Render summary() as indented JSON."""
+        return json.dumps(self.summary(), indent=2)
+
+    def to_table(self) -> str:
+        summary = self.summary()
+        rows = [
+            ("requests", summary["requests"]),
+            ("errors", summary["errors"]),
+            ("failures", summary["failures"]),
+            ("mismatches", summary["mismatches"]),
+            ("elapsed (s)", "%.3f" % summary["elapsed_s"]),
+            ("max lag (ms)", "%.3f" % summary["max_lag_ms"]),
+        ]
+        for name in ("p50_ms", "p90_ms", "p99_ms", "max_ms"):
+            rows.append((
+                f"latency {name[:-3]} (ms)",
+                "%.3f -> %.3f" % (
+                    summary["recorded_latency_ms"][name],
+                    summary["replayed_latency_ms"][name]
+                )
+            ))
+        rows.extend(
+            (f"  {name}", count)
+            for name, count in summary["failures_by_type"].items()
+        )
+
+        width = max(len(name) for name, _ in rows)
+        return "\n".join(f"{name:<{width}}  {value}" for name, value in rows)
+
+
+def replay(
+        records: Iterator[Record],
+        interface: "C2eCaosInterface",
+        speed: Optional[float] = 1.0
+) -> ReplayReport:
+    """
+    Send logged requests again, keeping their relative timing.
+
+    Requests are sent one after another through a single interface. If
+    one takes longer than the gap before the next, the next is sent
+    late rather than concurrently, and max_lag in the report shows by
+    how much.
+
+    :param records: records from read_records.
+    :param interface: what to send them through.
+    :param speed: how many times faster than recorded to go, or None
+        to send each request as soon as the last one finishes.
+    :return: the report.
+    """
+    if speed is not None and speed <= 0:
+        raise ValueError("speed must be positive")
+
+    report = ReplayReport()
+    first_offset = None
+    start = time.perf_counter()
+    for record in records:
+        if first_offset is None:
+            first_offset = record.offset
+
+        if speed is not None:
+            due = start + (record.offset - first_offset) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            report.max_lag = max(report.max_lag, time.perf_counter() - due)
+
+        report.requests += 1
+        report.recorded.record(record.duration)
+        sent = time.perf_counter()
+        try:
+            response = interface.raw_request(record.request)
+        except Exception as e:
+            report.replayed.record(time.perf_counter() - sent)
+            name = type(e).__name__
+            report.failures[name] = report.failures.get(name, 0) + 1
+            continue
+        report.replayed.record(time.perf_counter() - sent)
+
+        if response.error:
+            report.errors += 1
+        if not record.flags & (FLAG_FAILED | FLAG_STREAMED) \
+                and response.view != record.response:
+            report.mismatches += 1
+
+    report.elapsed = time.perf_counter() - start
+    return report
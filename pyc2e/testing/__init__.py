@@ -0,0 +1,27 @@
+"""
+Stand-ins for c2e engines, for testing and benchmarking without a game.
+"""
+from pyc2e.testing.caos import MiniEngine, run_caos
+from pyc2e.testing.engine import (
+    FAILURE_CLOSE,
+    FAILURE_HANG,
+    FAILURE_MODES,
+    FAILURE_RESET,
+    FAILURE_TRUNCATE,
+    FakeEngineServer,
+    echo_responder
+)
+from pyc2e.testing.shared_memory import FakeSharedMemoryEngine
+
+__all__ = [
+    "FAILURE_CLOSE",
+    "FAILURE_HANG",
+    "FAILURE_MODES",
+    "FAILURE_RESET",
+    "FAILURE_TRUNCATE",
+    "FakeEngineServer",
+    "FakeSharedMemoryEngine",
+    "MiniEngine",
+    "echo_responder",
+    "run_caos",
+]
@@ -0,0 +1,165 @@
+"""
+A deliberately tiny CAOS interpreter for stand-in engines.
+
+It understands just enough CAOS to answer the queries pyc2e itself
+generates, such as the string concatenation in test_connection. Any
+command it doesn't know stops execution with an error message the same
+way a real engine stops at the first bad command.
+"""
+import re
+from typing import Dict, Iterator, List, Optional, Union
+
+Value = Union[int, float, str]
+
+_TOKEN_REGEX = re.compile(
+    rb'\s*(?:'
+    rb'(?P<comment>\*[^\n]*)'
+    rb'|"(?P<string>(?:[^"\\]|\\.)*)"'
+    rb'|(?P<word>[^\s"]+)'
+    rb')'
+)
+_VARIABLE_REGEX = re.compile(r"^va(\d\d)$")
+ERROR_TEMPLATE = "Error: {0}"
+
+
+class CaosError(Exception):
+    """A command the interpreter couldn't run."""
+    pass
+
+
+class _Token:
+    __slots__ = ("value", "is_string")
+
+    def __init__(self, value: str, is_string: bool):
+        self.value = value
+        self.is_string = is_string
+
+
+def tokenize(query: bytes) -> Iterator[_Token]:
+    """
+    Split CAOS into word and string literal tokens, dropping comments.
+
+    :param query: raw CAOS as cp1252 bytes.
+    :return:
+    """
+    position = 0
+    end = len(query.rstrip())
+    while position < end:
+        match = _TOKEN_REGEX.match(query, position)
+        if match is None:
+            raise CaosError("unterminated string literal")
+        position = match.end()
+        if match.group("string") is not None:
+            raw = match.group("string").decode("cp1252")
+            yield _Token(re.sub(r'\\(.)', r'\1', raw), True)
+        elif match.group("word") is not None:
+            yield _Token(match.group("word").decode("cp1252"), False)
+
+
+def _format_number(value: Union[int, float]) -> str:
+    if isinstance(value, float):
+        return "%f" % value
+    return str(value)
+
+
+class MiniEngine:
+    """
+    Holds variables between commands and runs queries against them.
+    """
+
+    def __init__(self):
+        self.variables: Dict[str, Value] = {}
+        # The message for the last query's error, or None if it ran
+        self.error: Optional[str] = None
+
+    def _value(self, token: Optional[_Token]) -> Value:
+        if token is None:
+            raise CaosError("missing argument")
+        if token.is_string:
+            return token.value
+        name = token.value.lower()
+        if _VARIABLE_REGEX.match(name):
+            return self.variables.get(name, 0)
+        try:
+            return int(token.value)
+        except ValueError:
+            pass
+        try:
+            return float(token.value)
+        except ValueError:
+            raise CaosError(f"unknown value '{token.value}'") from None
+
+    def _variable(self, token: Optional[_Token]) -> str:
+        if token is None or token.is_string \
+                or not _VARIABLE_REGEX.match(token.value.lower()):
+            raise CaosError("expected a variable")
+        return token.value.lower()
+
+    def run(self, query: bytes) -> bytes:
+        """
+        Run a query, returning output as the engine would send it.
+
+        Execution stops at the first error, and the error message is
+        appended to whatever output was already produced.
+
+        :param query: CAOS without the trailing rscr.
+        :return: cp1252-encoded output.
+        """
+        output: List[str] = []
+        self.error = None
+        try:
+            self._run_tokens(tokenize(query), output)
+        except CaosError as e:
+            self.error = str(e)
+            output.append(ERROR_TEMPLATE.format(e))
+        return "".join(output).encode("cp1252", errors="replace")
+
+    def _run_tokens(self, tokens: Iterator[_Token], output: List[str]) -> None:
+        for token in tokens:
+            command = token.value.lower()
+            if token.is_string:
+                raise CaosError(f"unexpected string '{token.value}'")
+
+            if command == "outs":
+                output.append(str(self._value(next(tokens, None))))
+            elif command == "outv":
+                value = self._value(next(tokens, None))
+                if isinstance(value, str):
+                    raise CaosError("outv needs a number")
+                output.append(_format_number(value))
+            elif command in ("sets", "setv"):
+                name = self._variable(next(tokens, None))
+                self.variables[name] = self._value(next(tokens, None))
+            elif command in ("adds", "addv"):
+                name = self._variable(next(tokens, None))
+                default = "" if command == "adds" else 0
+                current = self.variables.get(name, default)
+                addend = self._value(next(tokens, None))
+                if isinstance(current, str) != isinstance(addend, str):
+                    raise CaosError(f"{command} got mismatched types")
+                self.variables[name] = current + addend
+            elif command == "scrp":
+                for _ in range(4):
+                    self._value(next(tokens, None))
+                for body_token in tokens:
+                    if not body_token.is_string \
+                            and body_token.value.lower() == "endm":
+                        break
+                else:
+                    raise CaosError("scrp without endm")
+            elif command in ("inst", "slow", "endm"):
+                pass
+            elif command == "stop":
+                return
+            else:
+                raise CaosError(f"unknown command '{token.value}'")
+
+
+def run_caos(query: bytes) -> bytes:
+    """
+    Run a query against a fresh MiniEngine.
+
+    :param query: CAOS without the trailing rscr.
+    :return: cp1252-encoded output.
+    """
+    return MiniEngine().run(query)
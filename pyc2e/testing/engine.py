@@ -0,0 +1,267 @@
+"""
+A stand-in for the socket interface of lc2e and openc2e.
+
+It reads each request until the rscr terminator, answers it, and hangs up
+the same way the real engines do. Latency, response size, chunking and
+failures can all be configured so client code can be measured and
+regression-tested without a 32-bit Linux engine.
+
+Run it from the command line with::
+
+    python -m pyc2e.testing.server --port 20001 --latency-ms 5
+"""
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from pyc2e.interfaces.unix import LOCALHOST
+from pyc2e.testing.caos import MiniEngine
+
+REQUEST_TERMINATOR = b"\nrscr"
+
+FAILURE_CLOSE = "close"
+FAILURE_RESET = "reset"
+FAILURE_HANG = "hang"
+FAILURE_TRUNCATE = "truncate"
+FAILURE_MODES = (FAILURE_CLOSE, FAILURE_RESET, FAILURE_HANG, FAILURE_TRUNCATE)
+
+Responder = Callable[[bytes], bytes]
+
+
+def echo_responder(query: bytes) -> bytes:
+    """Reply with the query itself."""
+    return bytes(query)
+
+
+class FakeEngineStats:
+    """
+    Running totals for a FakeEngineServer, safe to read from any thread.
+
+    in_flight counts requests which have been read but whose reply isn't
+    ready yet, and max_in_flight is the most there ever were at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def start_request(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end_request(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record(self, received: int, sent: int, failed: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.failures += failed
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+
+    server: "_ThreadingServer"
+
+    def handle(self) -> None:
+        engine: FakeEngineServer = self.server.engine
+        data = bytearray()
+        while not data.endswith(REQUEST_TERMINATOR):
+            chunk = self.request.recv(65536)
+            if not chunk:
+                return
+            data.extend(chunk)
+
+        query = bytes(data[:-len(REQUEST_TERMINATOR)])
+        failure = engine.pick_failure()
+
+        engine.stats.start_request()
+        try:
+            if engine.latency_ms:
+                time.sleep(engine.latency_ms / 1000)
+
+            if failure == FAILURE_HANG:
+                engine.stopping.wait()
+                engine.stats.record(len(data), 0, True)
+                return
+
+            if failure in (FAILURE_CLOSE, FAILURE_RESET):
+                if failure == FAILURE_RESET:
+                    # zero linger makes close() send RST instead of FIN
+                    self.request.setsockopt(
+                        socket.SOL_SOCKET, socket.SO_LINGER,
+                        struct.pack("ii", 1, 0)
+                    )
+                engine.stats.record(len(data), 0, True)
+                return
+
+            reply = engine.reply_for(query)
+        finally:
+            # Before sending, so a client can't start its next request
+            # while this one still counts
+            engine.stats.end_request()
+        if failure == FAILURE_TRUNCATE:
+            reply = reply[:len(reply) // 2]
+
+        sent = 0
+        chunk_size = engine.chunk_size or len(reply) or 1
+        for start in range(0, len(reply), chunk_size):
+            if start and engine.chunk_delay_ms:
+                time.sleep(engine.chunk_delay_ms / 1000)
+            try:
+                self.request.sendall(reply[start:start + chunk_size])
+            except OSError:
+                break
+            sent += min(chunk_size, len(reply) - start)
+
+        engine.stats.record(len(data), sent, failure is not None)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    engine: "FakeEngineServer"
+
+
+class FakeEngineServer:
+    """
+    A configurable fake of the c2e socket interface.
+
+    By default, queries run against a MiniEngine that understands a
+    small subset of CAOS, including the query test_connection sends.
+    Variables persist between requests, as they don't on a real engine.
+
+    Use it as a context manager to run it on a background thread::
+
+        with FakeEngineServer(latency_ms=2) as engine:
+            interface = UnixInterface(port=engine.port)
+
+    :param host: the address to listen on.
+    :param port: the port to listen on. 0 picks a free one.
+    :param latency_ms: how long to wait before answering each request.
+    :param response_size: if set, answer every request with this many
+        filler bytes instead of running the query.
+    :param chunk_size: if set, send replies in chunks of this many bytes.
+    :param chunk_delay_ms: how long to wait between reply chunks.
+    :param failure_rate: the chance from 0.0 to 1.0 that a request fails.
+    :param failure_mode: how failing requests fail. One of close, reset,
+        hang, or truncate.
+    :param responder: a callable turning query bytes into reply bytes,
+        used instead of the MiniEngine.
+    :param seed: seeds failure selection for reproducible runs.
+    """
+
+    def __init__(
+            self,
+            host: str = LOCALHOST,
+            port: int = 0,
+            latency_ms: float = 0.0,
+            response_size: Optional[int] = None,
+            chunk_size: Optional[int] = None,
+            chunk_delay_ms: float = 0.0,
+            failure_rate: float = 0.0,
+            failure_mode: str = FAILURE_CLOSE,
+            responder: Optional[Responder] = None,
+            seed: Optional[int] = None
+    ):
+        if failure_mode not in FAILURE_MODES:
+            raise ValueError(
+                f"failure_mode must be one of {FAILURE_MODES},"
+                f" not {failure_mode!r}"
+            )
+        if not 0.0 <= failure_rate <= 1.0:
+            raise ValueError("failure_rate must be between 0.0 and 1.0")
+
+        self.latency_ms = latency_ms
+        self.response_size = response_size
+        self.chunk_size = chunk_size
+        self.chunk_delay_ms = chunk_delay_ms
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.stats = FakeEngineStats()
+        self.stopping = threading.Event()
+
+        self._mini_engine = MiniEngine()
+        self._responder = responder or self._mini_engine.run
+        self._engine_lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+        self._server = _ThreadingServer((host, port), _RequestHandler)
+        self._server.engine = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The (host, port) pair the server is listening on."""
+        host, port = self._server.server_address[:2]
+        return host, port
+
+    @property
+    def port(self) -> int:
+        return self.address[1]
+
+    def pick_failure(self) -> Optional[str]:
+        """
+        Decide whether the current request should fail.
+
+        :return: the failure mode to use, or None for success.
+        """
+        if not self.failure_rate:
+            return None
+        with self._random_lock:
+            roll = self._random.random()
+        return self.failure_mode if roll < self.failure_rate else None
+
+    def reply_for(self, query: bytes) -> bytes:
+        """
+        Build the reply for a query according to the configuration.
+
+        :param query: the request body without the rscr terminator.
+        :return:
+        """
+        if self.response_size is not None:
+            return b"x" * self.response_size
+        with self._engine_lock:
+            return self._responder(query)
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until stop() is called."""
+        self._server.serve_forever(poll_interval=0.05)
+
+    def start(self) -> "FakeEngineServer":
+        """Start serving on a daemon thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever,
+            name=f"FakeEngineServer:{self.port}",
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        self.stopping.set()
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeEngineServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
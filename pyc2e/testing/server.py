@@ -0,0 +1,63 @@
+"""
+Command line entry point for running a FakeEngineServer.
+
+Usage::
+
+    python -m pyc2e.testing.server --port 20001 --latency-ms 5
+"""
+import argparse
+
+from pyc2e.interfaces.unix import DEFAULT_PORT, LOCALHOST
+from pyc2e.testing.engine import (
+    FAILURE_CLOSE,
+    FAILURE_MODES,
+    FakeEngineServer,
+    echo_responder
+)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m pyc2e.testing.server",
+        description="Run a fake c2e socket engine"
+    )
+    parser.add_argument("--host", default=LOCALHOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--response-size", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--failure-mode", choices=FAILURE_MODES, default=FAILURE_CLOSE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--echo", action="store_true",
+        help="reply with each query instead of running it"
+    )
+    args = parser.parse_args(argv)
+
+    server = FakeEngineServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        response_size=args.response_size,
+        chunk_size=args.chunk_size,
+        chunk_delay_ms=args.chunk_delay_ms,
+        failure_rate=args.failure_rate,
+        failure_mode=args.failure_mode,
+        responder=echo_responder if args.echo else None,
+        seed=args.seed
+    )
+    host, port = server.address
+    print(f"Fake engine listening on {host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
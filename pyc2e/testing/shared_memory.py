@@ -0,0 +1,192 @@
+"""
+A stand-in for the shared memory interface of the Windows engines.
+
+It creates the c2e@ buffer, mutex, events and process the way a running
+game does, using the emulated objects from
+pyc2e.interfaces.win32.emulated, and answers requests on a background
+thread. Win32Interface can then be tested and profiled on any platform::
+
+    with FakeSharedMemoryEngine() as engine:
+        interface = Win32Interface(backend=engine.backend)
+"""
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+
+from pyc2e.interfaces.win32 import (
+    C2E_BUFFER_HEADER,
+    DEFAULT_SHARED_MEMORY_SIZE,
+    OFFSET_DATA_START,
+    OFFSET_PID_START,
+    OFFSET_RESULT_STATUS,
+    Win32Interface
+)
+from pyc2e.interfaces.win32.emulated import EmulatedBackend
+from pyc2e.testing.caos import MiniEngine
+from pyc2e.testing.engine import FakeEngineStats, Responder
+
+# How often the engine loop checks whether it's been stopped
+POLL_INTERVAL_MS = 50
+
+
+class FakeSharedMemoryEngine:
+    """
+    A configurable fake of the c2e shared memory interface.
+
+    Requests starting with execute run their CAOS, and requests starting
+    with scrp are added as scripts, both against a MiniEngine unless a
+    responder is given. The result status is set when the MiniEngine
+    reports an error.
+
+    :param game_name: the name the objects are created under.
+    :param memory_size: the size of the shared buffer.
+    :param backend: the namespace to create objects in. Defaults to a
+        new EmulatedBackend, available as the backend attribute.
+    :param latency_ms: how long to wait before answering each request.
+    :param responder: a callable turning CAOS bytes into reply bytes,
+        used instead of the MiniEngine.
+    """
+
+    def __init__(
+            self,
+            game_name: str = "Docking Station",
+            memory_size: int = DEFAULT_SHARED_MEMORY_SIZE,
+            backend: Optional[EmulatedBackend] = None,
+            latency_ms: float = 0.0,
+            responder: Optional[Responder] = None
+    ):
+        self.game_name = game_name
+        self.memory_size = memory_size
+        self.backend = backend if backend is not None else EmulatedBackend()
+        self.latency_ms = latency_ms
+        self.stats = FakeEngineStats()
+        self.stopping = threading.Event()
+
+        self._mini_engine = MiniEngine()
+        self._responder = responder
+        self._memory = None
+        self._request_event = None
+        self._result_event = None
+        self.process = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def interface(self, **kwargs) -> Win32Interface:
+        """
+        Create a Win32Interface connected to this engine's backend.
+
+        :param kwargs: passed on to Win32Interface.
+        :return:
+        """
+        return Win32Interface(
+            game_name=self.game_name,
+            memory_size=self.memory_size,
+            backend=self.backend,
+            **kwargs
+        )
+
+    def _create_objects(self) -> None:
+        backend = self.backend
+        name = self.game_name
+        self.process = backend.create_process()
+        self._memory = backend.create_memory(f"{name}_mem", self.memory_size)
+        self._memory[0:len(C2E_BUFFER_HEADER)] = C2E_BUFFER_HEADER
+        struct.pack_into("<I", self._memory, OFFSET_PID_START, self.pid)
+        backend.create_mutex(f"{name}_mutex")
+        self._request_event = backend.create_event(f"{name}_request")
+        self._result_event = backend.create_event(f"{name}_result")
+
+    def answer(self, request: bytes) -> Tuple[bytes, bool]:
+        """
+        Run a request as the engine would.
+
+        :param request: the request without its terminating null.
+        :return: the reply and whether it's an error.
+        """
+        if request.startswith(b"execute\n"):
+            caos = request[len(b"execute\n"):]
+        elif request.startswith(b"scrp"):
+            # Injected scripts have no endm over shared memory
+            caos = request + b"\nendm"
+        else:
+            return b"Unknown request type", True
+
+        if self._responder is not None:
+            return self._responder(caos), False
+        reply = self._mini_engine.run(caos)
+        return reply, self._mini_engine.error is not None
+
+    def _handle_request(self) -> None:
+        memory = self._memory
+        end = memory.find(b"\x00", OFFSET_DATA_START)
+        if end < 0:
+            end = self.memory_size
+        request = memory[OFFSET_DATA_START:end]
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        reply, error = self.answer(request)
+        reply = reply[:self.memory_size - OFFSET_DATA_START]
+        struct.pack_into(
+            "<II", memory, OFFSET_RESULT_STATUS, int(error), len(reply))
+        memory[OFFSET_DATA_START:OFFSET_DATA_START + len(reply)] = reply
+
+        self.stats.record(len(request), len(reply), error)
+        self._result_event.set()
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until stop() is called."""
+        seen = self._request_event.generation
+        while not self.stopping.is_set():
+            generation = self._request_event.wait_for_pulse(
+                seen, POLL_INTERVAL_MS)
+            if generation is None:
+                continue
+            seen = generation
+            self._handle_request()
+
+    def start(self) -> "FakeSharedMemoryEngine":
+        """Create the engine's objects and serve on a daemon thread."""
+        self.stopping.clear()
+        self._create_objects()
+        self._thread = threading.Thread(
+            target=self.serve_forever,
+            name=f"FakeSharedMemoryEngine:{self.game_name}",
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and signal that the process has exited."""
+        self.stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.process is not None:
+            self.process.exit()
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+            self.backend.remove_memory(f"{self.game_name}_mem")
+
+    def restart(self) -> "FakeSharedMemoryEngine":
+        """
+        Stop, then start again with new objects and a new process id.
+
+        Interfaces still holding the old objects see the old process as
+        exited, as they would when a real game is restarted.
+        """
+        self.stop()
+        return self.start()
+
+    def __enter__(self) -> "FakeSharedMemoryEngine":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
@@ -0,0 +1,290 @@
+"""
+Whole-world agent data in one round trip.
+
+snapshot() sends a single enum query which prints the requested fields
+of every matching agent, then parses the output into one typed column
+per field::
+
+    world = snapshot(interface, family=2)
+    for unid, x, y in zip(world["unid"], world["x"], world["y"]):
+        ...
+
+Columns are array.array buffers, or NumPy arrays viewing the same
+memory when NumPy is installed.
+
+To pass on only what changed between polls, feed each snapshot to a
+WorldDiffer.
+"""
+from array import array
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    ByteString,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from pyc2e.common import QueryError
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - numpy is optional
+    numpy = None
+
+if TYPE_CHECKING:
+    from pyc2e.interfaces.interface import C2eCaosInterface
+
+# array typecodes which hold floats rather than integers
+FLOAT_TYPECODES = frozenset("fd")
+
+
+class Field(NamedTuple):
+    """
+    A value to collect for every agent.
+
+    :param name: the column's name.
+    :param expression: a CAOS rvalue, evaluated with targ set to the
+        agent. It must print without spaces.
+    :param typecode: the array typecode to store it as.
+    """
+    name: str
+    expression: str
+    typecode: str
+
+
+DEFAULT_FIELDS: Tuple[Field, ...] = (
+    Field("unid", "unid", "i"),
+    Field("family", "fmly", "B"),
+    Field("genus", "gnus", "B"),
+    Field("species", "spcs", "H"),
+    Field("x", "posx", "f"),
+    Field("y", "posy", "f"),
+)
+
+
+def build_snapshot_query(
+        fields: Sequence[Field] = DEFAULT_FIELDS,
+        family: int = 0,
+        genus: int = 0,
+        species: int = 0
+) -> bytes:
+    """
+    Build the enum query snapshot() sends.
+
+    Every field is followed by a space, so the output is one flat run of
+    space separated values, len(fields) per agent.
+
+    :param fields: the values to print for each agent.
+    :param family: only include agents of this family, or 0 for all.
+    :param genus: only include agents of this genus, or 0 for all.
+    :param species: only include agents of this species, or 0 for all.
+    :return: cp1252 CAOS.
+    """
+    if not fields:
+        raise ValueError("At least one field is required")
+    body = " ".join(f'outv {field.expression} outs " "' for field in fields)
+    return f"enum {family} {genus} {species} {body} next".encode("cp1252")
+
+
+class WorldSnapshot:
+    """
+    Agent data as one column per field, with a row per agent.
+
+    Rows are in the order the engine enumerated the agents.
+
+    :param columns: the column for each field name, all equally long.
+    """
+
+    def __init__(self, columns: Dict[str, Sequence]):
+        self.columns = columns
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, name: str) -> Sequence:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def rows(self) -> Iterator[Tuple]:
+        """
+        Iterate over agents as tuples in column order.
+
+        Slower than working with the columns directly.
+
+        :return:
+        """
+        return zip(*self.columns.values())
+
+
+def parse_snapshot(
+        data: ByteString,
+        fields: Sequence[Field] = DEFAULT_FIELDS,
+        use_numpy: Optional[bool] = None
+) -> WorldSnapshot:
+    """
+    Parse the output of a query from build_snapshot_query.
+
+    :param data: the response data, or a view of it.
+    :param fields: the fields the query was built with.
+    :param use_numpy: whether to return NumPy arrays. Defaults to
+        whether NumPy is installed.
+    :return: the parsed snapshot.
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ImportError("NumPy isn't installed")
+
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    values = data.split()
+    width = len(fields)
+    if len(values) % width:
+        raise QueryError(
+            f"Expected {width} values per agent, but got {len(values)}"
+            f" values: {data[:200]!r}"
+        )
+
+    columns = {}
+    try:
+        for index, field in enumerate(fields):
+            convert = float if field.typecode in FLOAT_TYPECODES else int
+            column = array(field.typecode, map(convert, values[index::width]))
+            if use_numpy:
+                column = numpy.frombuffer(column, dtype=field.typecode)
+            columns[field.name] = column
+    except (ValueError, OverflowError) as e:
+        raise QueryError(f"Couldn't parse snapshot output: {e}") from e
+
+    return WorldSnapshot(columns)
+
+
+def snapshot(
+        interface: "C2eCaosInterface",
+        family: int = 0,
+        genus: int = 0,
+        species: int = 0,
+        fields: Sequence[Field] = DEFAULT_FIELDS,
+        use_numpy: Optional[bool] = None
+) -> WorldSnapshot:
+    """
+    Collect fields for every matching agent in a single request.
+
+    An engine error, such as from an expression which isn't valid for
+    every agent, raises QueryError.
+
+    :param interface: the interface to send the query through.
+    :param family: only include agents of this family, or 0 for all.
+    :param genus: only include agents of this genus, or 0 for all.
+    :param species: only include agents of this species, or 0 for all.
+    :param fields: the values to collect. Defaults to the UNID,
+        classifier and position.
+    :param use_numpy: whether to return NumPy arrays. Defaults to
+        whether NumPy is installed.
+    :return: the parsed snapshot.
+    """
+    query = build_snapshot_query(fields, family, genus, species)
+    response = interface.execute_caos(query)
+    if response.error:
+        raise QueryError(f"Snapshot query failed: {response.text}")
+    return parse_snapshot(response.view, fields, use_numpy)
+
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+class AgentChange(NamedTuple):
+    """
+    One agent appearing, disappearing, or changing between snapshots.
+
+    values holds the agent's current row by field name, and is None for
+    removed agents.
+    """
+    kind: str
+    unid: int
+    values: Optional[Dict[str, Any]]
+
+
+class WorldDiffer:
+    """
+    Turns successive snapshots into records of what changed.
+
+    Only a hash of each agent's row is kept between polls, so comparing
+    an unchanged agent costs one tuple hash and one dict lookup, and
+    memory stays at one entry per agent. Two different rows with the
+    same hash would hide a change, but with 64-bit hashes that's
+    vanishingly unlikely.
+
+    :param key: the field identifying agents across snapshots.
+    :param fields: the fields to compare. Defaults to all of them.
+        Changes to other fields are ignored, though values always
+        includes every field.
+    """
+
+    def __init__(
+            self,
+            key: str = "unid",
+            fields: Optional[Sequence[str]] = None
+    ):
+        self.key = key
+        self.fields = None if fields is None else tuple(fields)
+        self._hashes: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        """How many agents the last snapshot held."""
+        return len(self._hashes)
+
+    def reset(self) -> None:
+        """Forget the last snapshot, so the next one is all additions."""
+        self._hashes = {}
+
+    def diff(self, world: WorldSnapshot) -> List[AgentChange]:
+        """
+        Compare a snapshot with the previous one and remember it.
+
+        The first snapshot reports every agent as added.
+
+        :param world: the latest snapshot.
+        :return: added and changed agents in snapshot order, followed
+            by removed agents in key order.
+        """
+        names = list(world.columns)
+        # Lists of Python values hash far faster than NumPy scalars
+        columns = [column.tolist() for column in world.columns.values()]
+        keys = columns[names.index(self.key)]
+        if self.fields is None:
+            compared = columns
+        else:
+            compared = [columns[names.index(name)] for name in self.fields]
+
+        previous = self._hashes
+        current: Dict[Any, int] = {}
+        changes: List[AgentChange] = []
+        for index, (key, row) in enumerate(zip(keys, zip(*compared))):
+            row_hash = hash(row)
+            current[key] = row_hash
+            old_hash = previous.get(key)
+            if old_hash == row_hash:
+                continue
+            kind = ADDED if old_hash is None else CHANGED
+            values = {
+                name: column[index] for name, column in zip(names, columns)
+            }
+            changes.append(AgentChange(kind, key, values))
+
+        changes.extend(
+            AgentChange(REMOVED, key, None)
+            for key in sorted(previous.keys() - current.keys())
+        )
+        self._hashes = current
+        return changes
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from pyc2e.bench import percentile, run_benchmark
+
+
+@pytest.mark.parametrize(
+    "percent,expected",
+    ((50, 5), (90, 9), (99, 10), (100, 10), (0, 1))
+)
+def test_percentile_uses_nearest_rank(percent, expected):
+    assert percentile(list(range(1, 11)), percent) == expected
+
+
+def test_percentile_of_nothing_is_zero():
+    assert percentile([], 50) == 0.0
+
+
+def test_request_count_is_exact(fake_engine):
+    report = run_benchmark(
+        fake_engine.address, ['outs "abc"'], requests=37, concurrency=4)
+
+    assert report.requests == 37
+    assert fake_engine.stats.requests == 37
+    assert report.bytes_in == 37 * 3
+    assert report.bytes_out == 37 * len(b'outs "abc"')
+
+
+def test_duration_limits_run(fake_engine):
+    report = run_benchmark(fake_engine.address, ["outv 1"], duration=0.1)
+
+    assert 0.1 <= report.elapsed < 1.0
+    assert report.requests > 0
+
+
+def test_errors_are_counted_by_type():
+    report = run_benchmark(("127.0.0.1", 1), ["outv 1"], requests=3)
+    summary = report.summary()
+
+    assert summary["errors"] == 3
+    assert summary["errors_by_type"] == {"ConnectFailure": 3}
+
+
+def test_json_report_has_latency_percentiles(fake_engine):
+    report = run_benchmark(fake_engine.address, ["outv 1"], requests=5)
+    latency = json.loads(report.to_json())["latency_ms"]
+
+    assert set(latency) == {"p50", "p90", "p99", "max", "mean"}
+    assert latency["p50"] <= latency["p99"] <= latency["max"]
+
+
+def test_needs_a_stopping_condition(fake_engine):
+    with pytest.raises(ValueError):
+        run_benchmark(fake_engine.address, ["outv 1"])
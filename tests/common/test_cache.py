@@ -0,0 +1,141 @@
+import pytest
+
+from pyc2e.interfaces import UnixInterface
+from pyc2e.interfaces.cache import CachingInterface, ResponseCache
+from pyc2e.interfaces.response import Response
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestResponseCache:
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = ResponseCache(clock=clock)
+        cache.put(b"q", Response(b"a"), ttl=5)
+
+        clock.now = 4.9
+        assert cache.get(b"q").data == b"a"
+        clock.now = 5.0
+        assert cache.get(b"q") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put(b"a", Response(b"a"), 10)
+        cache.put(b"b", Response(b"b"), 10)
+        cache.get(b"a")
+        cache.put(b"c", Response(b"c"), 10)
+
+        assert cache.get(b"b") is None
+        assert cache.get(b"a") is not None
+        assert cache.evictions == 1
+        assert len(cache) == 2
+
+    def test_hits_and_misses_are_counted(self):
+        cache = ResponseCache()
+        cache.get(b"a")
+        cache.put(b"a", Response(b"a"), 10)
+        cache.get(b"a")
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.fixture
+def cached(fake_engine):
+    clock = FakeClock()
+    interface = CachingInterface(
+        UnixInterface(port=fake_engine.port), clock=clock)
+    interface.clock = clock
+    return interface
+
+
+def test_marked_queries_are_served_from_cache(cached, fake_engine):
+    cached.mark_cacheable('outs "world"', ttl=10)
+    first = cached.execute_caos('outs "world"')
+    second = cached.execute_caos('outs "world"')
+
+    assert second is first
+    assert fake_engine.stats.requests == 1
+
+
+def test_unmarked_queries_always_reach_engine(cached, fake_engine):
+    cached.execute_caos("outv 1")
+    cached.execute_caos("outv 1")
+    assert fake_engine.stats.requests == 2
+
+
+def test_per_call_ttl(cached, fake_engine):
+    cached.execute_caos("outv 1", ttl=1)
+    cached.clock.now = 0.5
+    cached.execute_caos("outv 1", ttl=1)
+    cached.clock.now = 1.5
+    cached.execute_caos("outv 1", ttl=1)
+    assert fake_engine.stats.requests == 2
+
+
+def test_writes_invalidate_cache(cached, fake_engine):
+    cached.mark_cacheable("outv va00")
+    cached.execute_caos("setv va00 1")
+    assert cached.execute_caos("outv va00").text == "1"
+
+    cached.execute_caos("setv va00 2")
+    assert cached.execute_caos("outv va00").text == "2"
+
+    cached.prepare("setv va00 {}").execute(3)
+    assert cached.execute_caos("outv va00").text == "3"
+
+
+def test_error_responses_are_not_cached(cached):
+    cached.interface.execute_caos = lambda q: Response(b"x", error=True)
+    cached.execute_caos("outv 1", ttl=10)
+    assert len(cached.cache) == 0
+
+
+def test_predicate_rejects_socket_error_text(fake_engine):
+    interface = CachingInterface(
+        UnixInterface(port=fake_engine.port),
+        cacheable_response=lambda r: not r.text.startswith("Error:")
+    )
+    assert interface.execute_caos("bogus", ttl=10).text.startswith("Error:")
+    assert len(interface.cache) == 0
+
+    interface.execute_caos("outv 1", ttl=10)
+    assert len(interface.cache) == 1
+
+
+def test_responses_from_before_a_write_are_not_cached(cached):
+    def write_while_in_flight(query):
+        cached.cache.invalidate()
+        return Response(b"old")
+
+    cached.interface.execute_caos = write_while_in_flight
+    cached.execute_caos("outv va00", ttl=10)
+    assert len(cached.cache) == 0
+
+
+def test_streams_bypass_the_cache(cached, fake_engine):
+    cached.mark_cacheable('outs "hello"', ttl=10)
+    stream = cached.execute_caos('outs "hello"', stream=True)
+    assert b"".join(stream.iter_content(2)) == b"hello"
+    assert len(cached.cache) == 0
+
+
+def test_forwarded_methods_invalidate(cached, fake_engine):
+    cached.execute_caos("outv 1", ttl=10)
+    cached.add_observer(lambda interface, event: None)
+    assert len(cached.cache) == 1
+
+    cached.test_connection()
+    assert len(cached.cache) == 0
+
+
+def test_other_attributes_are_forwarded(cached, fake_engine):
+    assert cached.port == fake_engine.port
+    assert cached.test_connection()
@@ -0,0 +1,127 @@
+import threading
+from array import array
+
+import pytest
+
+from pyc2e.chemistry import (
+    CHEMICAL_COUNT,
+    ChemistryHistory,
+    ChemistrySampler,
+    build_chemistry_query,
+    parse_chemistry
+)
+from pyc2e.common import QueryError
+from pyc2e.interfaces import UnixInterface
+from pyc2e.testing import FakeEngineServer
+
+
+def chemistry_output(creatures):
+    return "".join(
+        "%d " % unid + "".join("%f " % level for level in levels)
+        for unid, levels in creatures.items()
+    ).encode("cp1252")
+
+
+class World:
+    """Creatures whose chemical n is at n / 1000 plus a per-tick offset."""
+
+    def __init__(self, unids):
+        self.unids = list(unids)
+        self.tick = 0
+
+    def __call__(self, query):
+        assert query == build_chemistry_query()
+        self.tick += 1
+        return chemistry_output({
+            unid: [n / 1000 + self.tick for n in range(CHEMICAL_COUNT)]
+            for unid in self.unids
+        })
+
+
+@pytest.fixture
+def world():
+    world = World([7, 8])
+    with FakeEngineServer(responder=world) as engine:
+        world.interface = UnixInterface(port=engine.port)
+        yield world
+
+
+def test_query_loops_over_every_chemical():
+    assert build_chemistry_query() == (
+        b'enum 4 0 0 outv unid outs " " setv va00 0 reps 256'
+        b' outv chem va00 outs " " addv va00 1 repe next'
+    )
+
+
+def test_parse_splits_unids_from_levels():
+    unids, levels = parse_chemistry(chemistry_output({
+        5: [0.5] * CHEMICAL_COUNT,
+        6: [1.0] * CHEMICAL_COUNT,
+    }))
+    assert unids == [5, 6]
+    assert len(levels) == 2 * CHEMICAL_COUNT
+    assert levels.typecode == "f"
+    assert levels[CHEMICAL_COUNT] == 1.0
+
+    with pytest.raises(QueryError):
+        parse_chemistry(b"1 2 3")
+    with pytest.raises(QueryError):
+        parse_chemistry(b"Error: " * 257)
+
+
+def test_history_is_a_ring():
+    history = ChemistryHistory(3)
+    for i in range(5):
+        history.append(float(i), array("f", [i] * CHEMICAL_COUNT))
+
+    assert len(history) == 3
+    assert len(history.levels) == 3 * CHEMICAL_COUNT
+    assert list(history.series(10)) == [2.0, 3.0, 4.0]
+    assert list(history.timestamps()) == [2.0, 3.0, 4.0]
+    assert history.latest()[0] == 4.0
+
+    with pytest.raises(ValueError):
+        history.series(CHEMICAL_COUNT)
+
+
+def test_sampler_keeps_bounded_history(world):
+    exported = []
+    sampler = ChemistrySampler(
+        world.interface,
+        history=4,
+        export=lambda timestamp, sample: exported.append(sorted(sample))
+    )
+    for _ in range(6):
+        sampler.sample()
+
+    assert sorted(sampler.creatures) == [7, 8]
+    series = sampler.creatures[7].series(1)
+    assert list(series) == pytest.approx([3.001, 4.001, 5.001, 6.001])
+    assert exported == [[7, 8]] * 6
+
+    world.unids.remove(8)
+    sampler.sample()
+    assert list(sampler.creatures) == [7]
+
+
+def test_downsampling_averages_ticks(world):
+    sampler = ChemistrySampler(world.interface, history=10, downsample=2)
+    for _ in range(5):
+        sampler.sample()
+
+    history = sampler.creatures[7]
+    assert len(history) == 2
+    assert list(history.series(0)) == pytest.approx([1.5, 3.5])
+
+
+def test_run_keeps_rate(world):
+    sampler = ChemistrySampler(world.interface)
+    taken = sampler.run(rate_hz=50, duration=0.2)
+    assert 9 <= taken <= 10
+
+    stop = threading.Event()
+    stop.set()
+    assert sampler.run(rate_hz=50, stop=stop) == 0
+
+    with pytest.raises(ValueError):
+        sampler.run(rate_hz=50)
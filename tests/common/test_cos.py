@@ -0,0 +1,80 @@
+import pytest
+
+from pyc2e.cos import (
+    INSTALL,
+    REMOVE,
+    SCRIPT,
+    CosParseError,
+    parse_cos,
+    split_cos
+)
+
+BUNDLE = '''* Install a blinker
+inst
+new: simp 2 8 1000 "blnk" 1 0 0 * "scrp" in a comment
+outs "scrp 1 2 3 4 endm"
+
+scrp 2 8 1000 9
+  outs "hi"
+  * endm in a comment
+  anim [0 1 endm]
+endm
+setv va00 1
+SCRP 2 8 1000 1 stop ENDM
+
+rscr
+enum 2 8 1000 kill targ next
+'''
+
+
+def test_sections_come_out_in_order():
+    kinds = [section.kind for section in parse_cos(BUNDLE)]
+    assert kinds == [INSTALL, SCRIPT, INSTALL, SCRIPT, REMOVE]
+
+
+def test_keywords_in_comments_strings_and_bytestrings_are_ignored():
+    first_script = [s for s in parse_cos(BUNDLE) if s.kind == SCRIPT][0]
+    assert first_script.body == (
+        'outs "hi"\n  * endm in a comment\n  anim [0 1 endm]')
+
+
+def test_scripts_have_classifiers_and_bare_bodies():
+    _, scripts, _ = split_cos(BUNDLE)
+    assert [s.classifier for s in scripts] == [(2, 8, 1000, 9), (2, 8, 1000, 1)]
+    assert scripts[1].body == "stop"
+
+
+def test_line_numbers_and_offsets():
+    for section in parse_cos(BUNDLE):
+        assert BUNDLE[section.start:section.end] == section.text
+        lines = BUNDLE.split("\n")[section.start_line - 1:section.end_line]
+        assert section.text.split("\n")[0] in lines[0]
+        assert section.text.split("\n")[-1] in lines[-1]
+
+
+def test_remove_script_body():
+    _, _, remove = split_cos(BUNDLE)
+    assert remove.body == "enum 2 8 1000 kill targ next"
+    assert remove.start_line == 14
+
+
+def test_comment_only_gaps_are_skipped():
+    text = "scrp 1 2 3 4 stop endm\n* just a comment\n\nscrp 1 2 3 5 endm"
+    assert [s.kind for s in parse_cos(text)] == [SCRIPT, SCRIPT]
+
+
+@pytest.mark.parametrize(
+    "text,line",
+    (
+        ("inst\nscrp 1 2 3 4\nstop", 2),
+        ("endm", 1),
+        ("scrp 1 2 3 4\nscrp 1 2 3 5 endm endm", 2),
+        ("scrp 1 2\nendm", 1),
+        ('\nouts "unterminated\n', 2),
+        ("scrp 1 2 3 4\nrscr\nendm", 2),
+    )
+)
+def test_malformed_files_raise_with_line(text, line):
+    with pytest.raises(CosParseError) as info:
+        list(parse_cos(text))
+    assert info.value.line == line
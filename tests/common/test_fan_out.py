@@ -0,0 +1,55 @@
+import pytest
+
+from pyc2e.common import ConnectFailure
+from pyc2e.fan_out import FanOutExecutor, fan_out
+
+
+def _target(server):
+    return server.address
+
+
+def test_single_query_runs_once_per_target(echo_engine):
+    targets = [_target(echo_engine)] * 3
+    results = list(fan_out("outs 1", targets))
+
+    assert len(results) == 3
+    assert all(r.ok for r in results)
+    assert [r.response.text for r in results] == ["outs 1"] * 3
+
+
+def test_each_target_runs_queries_in_order(echo_engine):
+    port = echo_engine.port
+    targets = [("127.0.0.1", port), ("localhost", port)]
+    queries = (f"outs {i}" for i in range(10))
+
+    seen = {target: [] for target in targets}
+    executor = FanOutExecutor(targets, max_in_flight=2)
+    for result in executor.execute_caos(queries):
+        assert result.response.text == result.query
+        seen[result.target].append(result.index)
+
+    assert all(indices == list(range(10)) for indices in seen.values())
+
+
+@pytest.mark.parametrize("window", [1, 3, 8])
+def test_in_flight_window_bounds_parallelism(echo_engine, window):
+    echo_engine.latency_ms = 50
+    targets = [_target(echo_engine)] * 8
+
+    results = list(fan_out("outs 1", targets, max_in_flight=window))
+
+    assert all(r.ok for r in results)
+    assert echo_engine.stats.max_in_flight == window
+
+
+def test_failures_are_reported_per_target(echo_engine):
+    targets = [_target(echo_engine), ("127.0.0.1", 1)]
+    results = {r.target: r for r in fan_out("outs 1", targets)}
+
+    assert results[_target(echo_engine)].ok
+    assert isinstance(results[("127.0.0.1", 1)].error, ConnectFailure)
+
+
+def test_window_must_be_positive():
+    with pytest.raises(ValueError):
+        FanOutExecutor([("127.0.0.1", 1)], max_in_flight=0)
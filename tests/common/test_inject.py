@@ -0,0 +1,172 @@
+import pytest
+
+from pyc2e.cos import INSTALL, parse_cos
+from pyc2e.inject import (
+    find_cos_files,
+    inject_cos,
+    inject_files,
+    plan_batches,
+    plan_install_requests
+)
+from pyc2e.interfaces import UnixInterface
+from pyc2e.testing import FakeEngineServer
+
+BUNDLE = '''inst
+setv va00 1
+scrp 2 8 1000 9 outs "a" endm
+scrp 2 8 1000 10 outs "b" endm
+rscr
+outs "bye"
+'''
+
+
+@pytest.fixture
+def pack(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.cos").write_text(BUNDLE)
+    (tmp_path / "sub" / "b.COS").write_text("scrp 1 2 3 4 stop endm\n")
+    (tmp_path / "readme.txt").write_text("not caos")
+    return tmp_path
+
+
+def test_find_cos_files_searches_directories(pack):
+    paths = find_cos_files(directories=[pack])
+    assert [p.split(str(pack))[1] for p in paths] == ["/a.cos", "/sub/b.COS"]
+
+
+def test_plan_batches_respects_size_limit():
+    sections = [("f", s) for s in parse_cos(
+        "".join(f"scrp 1 2 3 {i} {'x' * 50} endm\n" for i in range(10)))]
+    batches = plan_batches(sections, max_batch_bytes=150)
+
+    assert [len(b) for b in batches] == [2, 2, 2, 2, 2]
+    assert [item for batch in batches for item in batch] == sections
+
+
+def test_plan_batches_gives_oversized_scripts_their_own_batch():
+    sections = [("f", s) for s in parse_cos(
+        "scrp 1 2 3 4 endm scrp 1 2 3 5 " + "x" * 500 + " endm")]
+    assert [len(b) for b in plan_batches(sections, 100)] == [1, 1]
+
+
+def test_scripts_are_batched_into_one_request(pack):
+    with FakeEngineServer() as engine:
+        interface = UnixInterface(port=engine.port)
+        summary = inject_files(interface, find_cos_files(
+            directories=[pack]), jobs=1)
+        requests = engine.stats.requests
+
+    assert summary.injected == 3
+    assert summary.failed == []
+    assert summary.skipped == 1
+    assert summary.install_blocks == 1
+    assert requests == 2  # one batch of scripts, one install block
+
+
+def test_failed_batch_is_retried_per_script(pack):
+    def responder(query: bytes) -> bytes:
+        return b"Error: bad script" if b"1000 10" in query else b""
+
+    with FakeEngineServer(responder=responder) as engine:
+        interface = UnixInterface(port=engine.port)
+        summary = inject_files(interface, [pack / "a.cos"])
+
+    assert summary.injected == 1
+    assert len(summary.failed) == 1
+    where, message = summary.failed[0]
+    assert where.endswith("a.cos:4")
+    assert message == "Error: bad script"
+
+
+def test_unparseable_files_are_reported(tmp_path, fake_engine):
+    bad = tmp_path / "bad.cos"
+    bad.write_text("scrp 1 2 3 4\n")
+    interface = UnixInterface(port=fake_engine.port)
+    summary = inject_files(interface, [bad, tmp_path / "missing.cos"], jobs=2)
+
+    assert summary.files == 2
+    assert len(summary.failed_files) == 2
+
+
+def test_oversized_cos_is_split_into_requests(fake_engine):
+    bundle = "".join(
+        f"scrp 1 2 3 {i} outs \"{'x' * 40}\" endm\n" for i in range(20))
+    bundle += "setv va00 1\n"
+    interface = UnixInterface(port=fake_engine.port, max_request_size=200)
+
+    summary = inject_cos(interface, bundle)
+
+    assert summary.injected == 20
+    assert summary.install_blocks == 1
+    assert summary.failed == []
+    # about three scripts fit per request, then the install block
+    assert fake_engine.stats.requests == 9
+
+
+def test_script_too_big_for_any_request_fails_alone(fake_engine):
+    bundle = (
+        "scrp 1 2 3 1 outv 1 endm\n"
+        f"scrp 1 2 3 2 outs \"{'x' * 500}\" endm\n"
+        "scrp 1 2 3 3 outv 3 endm\n"
+    )
+    interface = UnixInterface(port=fake_engine.port, max_request_size=100)
+
+    summary = inject_cos(interface, bundle, name="pack.cos")
+
+    assert summary.injected == 2
+    assert len(summary.failed) == 1
+    where, message = summary.failed[0]
+    assert where == "pack.cos:2"
+    assert "limit" in message
+
+
+def test_oversized_install_block_is_reported(fake_engine):
+    interface = UnixInterface(port=fake_engine.port, max_request_size=10)
+    summary = inject_cos(interface, "outs \"" + "x" * 20 + "\"")
+
+    assert summary.install_blocks == 0
+    assert len(summary.failed) == 1
+
+
+SPLIT_INSTALL = '''inst
+new: simp 2 8 1000 "blob" 1 0 0
+setv va00 5
+scrp 2 8 1000 9 outs "a" endm
+mvto va00 100
+'''
+
+
+def test_install_code_split_by_scripts_runs_as_one_request():
+    queries = []
+
+    def responder(query: bytes) -> bytes:
+        queries.append(query)
+        return b""
+
+    with FakeEngineServer(responder=responder) as engine:
+        interface = UnixInterface(port=engine.port)
+        summary = inject_cos(interface, SPLIT_INSTALL)
+
+    assert summary.failed == []
+    assert summary.install_blocks == 2
+    assert len(queries) == 2
+    install = queries[1].decode("cp1252")
+    assert install.index("setv va00 5") < install.index("mvto va00 100")
+    assert "scrp" not in install
+
+
+def test_install_split_only_when_over_size_limit():
+    sections = [s for s in parse_cos(SPLIT_INSTALL) if s.kind == INSTALL]
+    assert [len(g) for g in plan_install_requests(sections)] == [2]
+    assert [len(g) for g in plan_install_requests(sections, 60)] == [1, 1]
+
+
+def test_socket_install_errors_are_reported():
+    def responder(query: bytes) -> bytes:
+        return b"" if b"scrp" in query else b"Error: bad install"
+
+    with FakeEngineServer(responder=responder) as engine:
+        interface = UnixInterface(port=engine.port)
+        summary = inject_cos(interface, SPLIT_INSTALL, name="blob.cos")
+
+    assert summary.failed == [("blob.cos:1", "Error: bad install")]
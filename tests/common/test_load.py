@@ -0,0 +1,84 @@
+import pytest
+
+from pyc2e.load import (
+    MODE_ASYNC,
+    MODE_SYNC,
+    LoadStep,
+    QueryMix,
+    run_load
+)
+from pyc2e.testing import FakeEngineServer
+
+
+def test_mix_follows_weights():
+    mix = QueryMix([(3, "outv 1"), (1, b"outv 2")], seed=1)
+    picks = [mix.pick() for _ in range(4000)]
+    share = picks.count(b"outv 1") / len(picks)
+    assert 0.7 < share < 0.8
+
+    with pytest.raises(ValueError):
+        QueryMix([])
+    with pytest.raises(ValueError):
+        QueryMix([(0, "outv 1")])
+
+
+@pytest.mark.parametrize("mode", [MODE_SYNC, MODE_ASYNC])
+def test_steps_spread_over_targets(mode):
+    with FakeEngineServer() as first, FakeEngineServer() as second:
+        report = run_load(
+            [first.address, second.address],
+            QueryMix([(1, "outv 1")]),
+            rates=[100, 200],
+            step_duration=0.2,
+            mode=mode
+        )
+        assert first.stats.requests == second.stats.requests == 30
+
+    assert [step.scheduled for step in report.steps] == [20, 40]
+    assert [step.completed for step in report.steps] == [20, 40]
+    assert all(not step.errors for step in report.steps)
+    assert report.max_safe_rate == 200
+
+
+def test_latency_includes_queueing():
+    # One slot and 20ms answers can only manage 50 requests per second
+    with FakeEngineServer(latency_ms=20) as engine:
+        report = run_load(
+            [engine.address],
+            QueryMix([(1, "outv 1")]),
+            rates=[200],
+            step_duration=0.1,
+            max_in_flight=1,
+            timeout=1000,
+            stop_when_saturated=True
+        )
+
+    step, = report.steps
+    assert step.service.percentile(99) < 0.1
+    assert step.latency.max >= 0.15
+    assert step.saturated()
+    assert step.bottleneck == "in_flight"
+    assert report.max_safe_rate is None
+    assert "max safe rate: none" in report.to_table()
+
+
+def test_errors_saturate():
+    step = LoadStep(rate=10, duration=1)
+    step.elapsed = 1.0
+    for _ in range(10):
+        step.record(0.0, 0.0, 0.0, 0.001)
+    assert not step.saturated()
+
+    step.record(0.0, 0.0, 0.0, 0.001, ConnectionError())
+    assert step.saturated()
+    assert step.summary()["errors_by_type"] == {"ConnectionError": 1}
+
+
+def test_bad_arguments():
+    mix = QueryMix([(1, "outv 1")])
+    with pytest.raises(ValueError):
+        run_load([], mix, [10], 1)
+    with pytest.raises(ValueError):
+        run_load([("127.0.0.1", 1)], mix, [0], 1)
+    with pytest.raises(ValueError):
+        run_load(["Docking Station"], mix, [10], 1, mode=MODE_ASYNC)
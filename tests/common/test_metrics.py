@@ -0,0 +1,154 @@
+import json
+import math
+
+import pytest
+
+from pyc2e.common import RequestTimeout
+from pyc2e.interfaces import UnixInterface
+from pyc2e.metrics import (
+    OTHER_LABEL,
+    LatencyHistogram,
+    MetricsRegistry,
+    bucket_bound,
+    bucket_count
+)
+from pyc2e.testing import FakeEngineServer, FakeSharedMemoryEngine
+
+
+def test_histogram_percentiles_are_within_a_bucket():
+    histogram = LatencyHistogram()
+    for i in range(1, 101):
+        histogram.record(i / 1000)
+
+    assert histogram.count == 100
+    assert histogram.max == 0.1
+    p50 = histogram.percentile(50)
+    assert 0.050 <= p50 <= 0.050 * 2 ** 0.25
+    assert histogram.percentile(100) == 0.1
+    assert histogram.summary()["mean_ms"] == pytest.approx(50.5)
+
+
+def test_histogram_memory_is_fixed():
+    histogram = LatencyHistogram()
+    for seconds in (0.0, 1e-9, 1e-3, 10.0, 1e6):
+        histogram.record(seconds)
+
+    assert len(histogram.counts) == bucket_count() + 1
+    assert histogram.counts[0] == 2
+    assert histogram.counts[-1] == 1
+    assert math.isinf(bucket_bound(bucket_count()))
+
+
+def test_cumulative_buckets_only_grow():
+    histogram = LatencyHistogram()
+    for seconds in (1e-5, 1e-3, 1e-3, 0.5):
+        histogram.record(seconds)
+
+    counts = [count for _, count in histogram.cumulative()]
+    assert counts == sorted(counts)
+    assert counts[-1] == 4
+
+
+def test_socket_counters(fake_engine):
+    metrics = MetricsRegistry()
+    interface = UnixInterface(port=fake_engine.port)
+    interface_metrics = metrics.attach(interface)
+
+    for _ in range(3):
+        interface.execute_caos('outs "hello"')
+
+    assert interface_metrics.name == f"127.0.0.1:{fake_engine.port}"
+    counters = interface_metrics.counters
+    assert counters["requests"] == 3
+    assert counters["errors"] == 0
+    assert counters["bytes_sent"] == 3 * len('outs "hello"\nrscr')
+    assert counters["bytes_received"] == 3 * len("hello")
+    assert interface_metrics.latency.count == 3
+
+
+def test_timeouts_count_as_errors():
+    with FakeEngineServer(latency_ms=200) as engine:
+        metrics = MetricsRegistry()
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=20)
+        interface_metrics = metrics.attach(interface, name="slow")
+        with pytest.raises(RequestTimeout):
+            interface.execute_caos("outv 1")
+
+    assert interface_metrics.counters["requests"] == 1
+    assert interface_metrics.counters["errors"] == 1
+    assert interface_metrics.counters["timeouts"] == 1
+    assert interface_metrics.latency.count == 1
+
+
+def test_shared_memory_mutex_timeouts_count_as_timeouts():
+    with FakeSharedMemoryEngine() as engine:
+        holder = engine.backend.open_mutex(f"{engine.game_name}_mutex")
+        holder.acquire()
+        metrics = MetricsRegistry()
+        interface = engine.interface(wait_timeout_ms=20)
+        interface_metrics = metrics.attach(interface)
+        with pytest.raises(RequestTimeout):
+            interface.execute_caos("outv 1")
+        holder.release()
+
+    assert interface_metrics.counters["errors"] == 1
+    assert interface_metrics.counters["timeouts"] == 1
+
+
+def test_labels_get_their_own_histograms(fake_engine):
+    metrics = MetricsRegistry(max_labels=2)
+    interface = UnixInterface(port=fake_engine.port)
+    interface_metrics = metrics.attach(interface)
+
+    for label in ("a", "b", "c", "d", "a"):
+        with metrics.label(label):
+            interface.execute_caos("outv 1")
+    interface.execute_caos("outv 1")
+
+    counts = {
+        label: histogram.count
+        for label, histogram in interface_metrics.labels.items()
+    }
+    assert counts == {"a": 2, "b": 1, OTHER_LABEL: 2}
+    assert interface_metrics.latency.count == 6
+    assert metrics.current_label() is None
+
+
+def test_shared_memory_errors_and_reconnects():
+    with FakeSharedMemoryEngine() as engine:
+        metrics = MetricsRegistry()
+        interface = engine.interface(persistent=True, wait_timeout_ms=1000)
+        interface_metrics = metrics.attach(interface)
+        assert interface_metrics.name == "Docking Station"
+
+        interface.execute_caos("outv 1")
+        response = interface.execute_caos("not a command")
+        assert response.error
+        engine.restart()
+        interface.execute_caos("outv 2")
+        interface.disconnect()
+
+    counters = interface_metrics.counters
+    assert counters["requests"] == 3
+    assert counters["errors"] == 1
+    assert counters["reconnects"] == 1
+
+
+def test_exports(fake_engine):
+    metrics = MetricsRegistry()
+    interface = UnixInterface(port=fake_engine.port)
+    metrics.attach(interface, name='say "hi"')
+    with metrics.label("poll"):
+        interface.execute_caos("outv 1")
+
+    snapshot = json.loads(metrics.to_json())
+    assert snapshot['say "hi"']["requests"] == 1
+    assert snapshot['say "hi"']["labels"]["poll"]["count"] == 1
+
+    text = metrics.to_prometheus()
+    assert "# TYPE pyc2e_requests_total counter" in text
+    assert 'pyc2e_requests_total{interface="say \\"hi\\""} 1' in text
+    assert 'pyc2e_request_duration_seconds_bucket{interface="say \\"hi\\"",' \
+           'le="+Inf"} 1' in text
+    assert 'pyc2e_query_duration_seconds_count{interface="say \\"hi\\"",' \
+           'label="poll"} 1' in text
@@ -0,0 +1,78 @@
+import pytest
+
+from pyc2e.interfaces import UnixInterface
+from pyc2e.interfaces.prepared import (
+    PreparedCaos,
+    compile_template,
+    encode_parameter
+)
+
+
+class _Win32Like:
+    """Enough of an interface to check the execute prefix is applied."""
+    execute_prefix = b"execute\n"
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    (
+        (5, b"5"),
+        (-12, b"-12"),
+        (True, b"1"),
+        (1.5, b"1.5"),
+        (2.0, b"2.0"),
+        (-0.25, b"-0.25"),
+        ("plain", b'"plain"'),
+        ('say "hi" \\ bye', b'"say \\"hi\\" \\\\ bye"'),
+        ("two\nlines", b'"two\\nlines"'),
+        ("café", b'"caf\xe9"'),
+    )
+)
+def test_encode_parameter(value, expected):
+    assert encode_parameter(value) == expected
+
+
+@pytest.mark.parametrize("value", (float("nan"), float("inf")))
+def test_non_finite_floats_are_rejected(value):
+    with pytest.raises(ValueError):
+        encode_parameter(value)
+
+
+def test_unsupported_types_are_rejected():
+    with pytest.raises(TypeError):
+        encode_parameter(b"raw")
+
+
+def test_compile_template_splits_static_parts():
+    parts, keys = compile_template("targ agnt {} outv chem {chem} {{x}}")
+    assert parts == [b"targ agnt ", b" outv chem ", b" {x}"]
+    assert keys == [0, "chem"]
+
+
+@pytest.mark.parametrize(
+    "template", ("{} {0}", "{0} {}", "{:>3}", "{!r}", "{a.b}"))
+def test_compile_template_rejects_unsupported_placeholders(template):
+    with pytest.raises(ValueError):
+        compile_template(template)
+
+
+def test_render_matches_format():
+    statement = PreparedCaos(UnixInterface(), "targ agnt {0} outv chem {1}")
+    assert statement.render(42, 7) == b"targ agnt 42 outv chem 7"
+
+
+def test_render_applies_execute_prefix():
+    statement = PreparedCaos(_Win32Like(), "outs {name}")
+    assert statement.render(name="a") == b'execute\nouts "a"'
+
+
+def test_string_parameters_cannot_break_out(fake_engine):
+    interface = UnixInterface(port=fake_engine.port)
+    statement = interface.prepare("outs {}")
+    assert statement.execute('" outs "injected').text == '" outs "injected'
+
+
+def test_prepared_statement_runs_on_engine(fake_engine):
+    interface = UnixInterface(port=fake_engine.port)
+    add = interface.prepare("setv va00 {} addv va00 {} outv va00")
+    assert [add(i, 10).text for i in range(3)] == ["10", "11", "12"]
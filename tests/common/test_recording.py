@@ -0,0 +1,147 @@
+import io
+
+import pytest
+
+from pyc2e.common import RequestTimeout
+from pyc2e.interfaces import UnixInterface
+from pyc2e.recording import (
+    FILE_HEADER,
+    FLAG_ERROR,
+    FLAG_FAILED,
+    FLAG_STREAMED,
+    FLAG_TIMEOUT,
+    LogFormatError,
+    SessionRecorder,
+    read_records,
+    replay
+)
+from pyc2e.testing import FakeEngineServer, FakeSharedMemoryEngine
+
+
+def test_records_round_trip(fake_engine, tmp_path):
+    path = tmp_path / "session.pc2e"
+    interface = UnixInterface(port=fake_engine.port)
+    recorder = interface.start_recording(path)
+    interface.execute_caos('outs "hello"')
+    interface.execute_caos("outv 2")
+    interface.stop_recording()
+    interface.execute_caos("outv 3")
+
+    assert recorder.records == 2
+    with open(path, "rb") as log:
+        records = list(read_records(log))
+
+    assert [r.request for r in records] == [b'outs "hello"', b"outv 2"]
+    assert [r.response for r in records] == [b"hello", b"2"]
+    assert [r.flags for r in records] == [0, 0]
+    assert records[0].offset <= records[1].offset
+    assert all(r.duration > 0 for r in records)
+
+
+def test_failures_and_streams_are_flagged(fake_engine):
+    log = io.BytesIO()
+    with SessionRecorder(log) as recorder:
+        interface = UnixInterface(port=fake_engine.port)
+        interface.start_recording(recorder)
+        with interface.execute_caos("outv 1", stream=True) as response:
+            response.data
+        interface.stop_recording()
+
+        with FakeEngineServer(latency_ms=200) as slow_engine:
+            slow = UnixInterface(port=slow_engine.port, wait_timeout_ms=20)
+            slow.start_recording(recorder)
+            with pytest.raises(RequestTimeout):
+                slow.execute_caos("outv 1")
+
+    log.seek(0)
+    streamed, timed_out = read_records(log)
+    assert streamed.flags == FLAG_STREAMED
+    assert streamed.response == b""
+    assert timed_out.flags == FLAG_FAILED | FLAG_TIMEOUT
+    assert timed_out.failed
+
+
+def test_shared_memory_errors_are_flagged():
+    log = io.BytesIO()
+    with FakeSharedMemoryEngine() as engine:
+        interface = engine.interface(wait_timeout_ms=1000)
+        interface.start_recording(log)
+        interface.execute_caos("not a command")
+
+    log.seek(0)
+    record, = read_records(log)
+    assert record.request == b"execute\nnot a command"
+    assert record.flags == FLAG_ERROR
+    assert record.error
+
+
+def test_logs_can_be_followed_while_recording(fake_engine, tmp_path):
+    path = tmp_path / "session.pc2e"
+    interface = UnixInterface(port=fake_engine.port)
+    with SessionRecorder(path, flush_interval=0) as recorder:
+        interface.start_recording(recorder)
+        interface.execute_caos("outv 1")
+
+        with open(path, "rb") as log:
+            assert [r.request for r in read_records(log)] == [b"outv 1"]
+        interface.stop_recording()
+
+
+def test_truncated_logs_read_up_to_the_last_whole_record(fake_engine):
+    log = io.BytesIO()
+    interface = UnixInterface(port=fake_engine.port)
+    interface.start_recording(log)
+    interface.execute_caos("outv 1")
+    interface.execute_caos("outv 2")
+
+    data = log.getvalue()
+    records = list(read_records(io.BytesIO(data[:-1])))
+    assert [r.request for r in records] == [b"outv 1"]
+
+
+def test_bad_logs_are_rejected():
+    with pytest.raises(LogFormatError):
+        list(read_records(io.BytesIO(b"")))
+    with pytest.raises(LogFormatError):
+        list(read_records(io.BytesIO(b"x" * FILE_HEADER.size)))
+
+
+def test_replay_compares_responses(fake_engine):
+    log = io.BytesIO()
+    interface = UnixInterface(port=fake_engine.port)
+    interface.start_recording(log)
+    for i in range(5):
+        interface.execute_caos(f"outv {i}")
+    interface.stop_recording()
+
+    log.seek(0)
+    report = replay(read_records(log), interface, speed=None)
+    assert report.requests == 5
+    assert report.mismatches == 0
+    assert report.replayed.count == 5
+    assert report.recorded.count == 5
+
+    with FakeEngineServer(responder=lambda caos: b"different") as other:
+        log.seek(0)
+        report = replay(
+            read_records(log), UnixInterface(port=other.port), speed=None)
+    assert report.mismatches == 5
+
+
+def test_replay_keeps_pace(fake_engine):
+    log = io.BytesIO()
+    interface = UnixInterface(port=fake_engine.port)
+    with SessionRecorder(log) as recorder:
+        interface.start_recording(recorder)
+        interface.execute_caos("outv 1")
+        recorder._started -= 0.2
+        interface.execute_caos("outv 2")
+        interface.stop_recording()
+
+    # The second record starts about 0.2s after the first one
+    log.seek(0)
+    report = replay(read_records(log), interface, speed=2)
+    assert 0.1 <= report.elapsed < 0.2
+
+    with pytest.raises(ValueError):
+        replay([], interface, speed=0)
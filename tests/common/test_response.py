@@ -63,3 +63,49 @@ class TestTextProperty:
         """Text property cuts nothing if no cutting properties are set"""
         r = Response(b"aaaaa")
         assert r.text == "aaaaa"
+
+
+class TestCopyArgument:
+
+    def test_uncopied_buffer_is_not_duplicated(self):
+        """Response keeps a handed-over buffer until data is accessed"""
+        buffer = bytearray(b"abc")
+        r = Response(buffer, copy=False)
+        assert r.text == "abc"
+        buffer[0] = ord("x")
+        assert bytes(r.view) == b"xbc"
+
+    def test_uncopied_buffer_data_is_bytes(self):
+        r = Response(bytearray(b"abc"), copy=False)
+        assert r.data == b"abc"
+        assert isinstance(r.data, bytes)
+
+
+def test_response_has_no_instance_dict():
+    """Response uses __slots__ to stay small"""
+    assert not hasattr(Response(b"a"), "__dict__")
+
+
+def test_text_is_decoded_once():
+    r = Response(b"abc")
+    assert r.text is r.text
+
+
+class TestViewProperty:
+
+    def test_view_matches_text_cutoff(self):
+        r = Response(b"aaaa\0zzz", declared_length=5, null_terminated=False)
+        assert r.view.tobytes() == b"aaaa\0"
+
+        r = Response(b"aaaa\0", declared_length=5, null_terminated=True)
+        assert r.view.tobytes() == b"aaaa"
+
+    def test_view_is_read_only(self):
+        r = Response(bytearray(b"abc"), copy=False)
+        assert r.view.readonly
+
+    def test_view_shares_memory_with_buffer(self):
+        buffer = bytearray(b"abc")
+        r = Response(buffer, copy=False)
+        buffer[0] = ord("z")
+        assert r.view.tobytes() == b"zbc"
@@ -0,0 +1,134 @@
+from array import array
+
+import pytest
+
+from pyc2e.common import QueryError
+from pyc2e.interfaces import UnixInterface
+from pyc2e.testing import FakeEngineServer, FakeSharedMemoryEngine
+from pyc2e.world import (
+    ADDED,
+    CHANGED,
+    DEFAULT_FIELDS,
+    REMOVED,
+    AgentChange,
+    Field,
+    WorldDiffer,
+    build_snapshot_query,
+    numpy,
+    parse_snapshot,
+    snapshot
+)
+
+AGENTS = [
+    (1001, 2, 13, 100, 10.5, 20.0),
+    (1002, 2, 14, 200, 30.25, 40.0),
+    (1003, 3, 1, 65535, -5.0, 0.0),
+]
+
+
+def world_responder(query: bytes) -> bytes:
+    assert query == build_snapshot_query()
+    return "".join(
+        "%d %d %d %d %f %f " % agent for agent in AGENTS
+    ).encode("cp1252")
+
+
+def test_query_prints_every_field_once_per_agent():
+    query = build_snapshot_query(
+        [Field("unid", "unid", "i"), Field("x", "posx", "f")],
+        family=2, genus=13
+    )
+    assert query == \
+        b'enum 2 13 0 outv unid outs " " outv posx outs " " next'
+
+    with pytest.raises(ValueError):
+        build_snapshot_query([])
+
+
+def test_snapshot_parses_columns():
+    with FakeEngineServer(responder=world_responder) as engine:
+        world = snapshot(UnixInterface(port=engine.port), use_numpy=False)
+
+    assert len(world) == 3
+    assert world["unid"] == array("i", [1001, 1002, 1003])
+    assert world["species"].typecode == "H"
+    assert list(world["x"]) == [10.5, 30.25, -5.0]
+    assert list(world.rows())[1] == AGENTS[1]
+    assert "genus" in world
+
+
+def test_empty_worlds():
+    world = parse_snapshot(b"", use_numpy=False)
+    assert len(world) == 0
+    assert len(world["unid"]) == 0
+
+
+def test_bad_output_raises():
+    with pytest.raises(QueryError):
+        parse_snapshot(b"1 2 3", use_numpy=False)
+    with pytest.raises(QueryError):
+        parse_snapshot(b"1 2 3 4 5 Error:", use_numpy=False)
+    with pytest.raises(QueryError):
+        parse_snapshot(b"1 300 3 4 5 6", use_numpy=False)
+
+
+def test_engine_errors_raise():
+    with FakeSharedMemoryEngine() as engine:
+        with pytest.raises(QueryError):
+            snapshot(engine.interface(wait_timeout_ms=1000))
+
+
+def test_views_are_parsed():
+    data = memoryview(b"7 1 2 3 0.5 1.5 ")
+    world = parse_snapshot(data, DEFAULT_FIELDS, use_numpy=False)
+    assert world["y"][0] == 1.5
+
+
+@pytest.mark.skipif(numpy is None, reason="NumPy isn't installed")
+def test_numpy_columns():
+    world = parse_snapshot(b"7 1 2 3 0.5 1.5 ", use_numpy=True)
+    assert world["unid"].dtype == numpy.dtype("i")
+    assert world["x"].tolist() == [0.5]
+
+
+@pytest.mark.skipif(numpy is not None, reason="NumPy is installed")
+def test_numpy_is_optional():
+    assert isinstance(parse_snapshot(b"")["unid"], array)
+    with pytest.raises(ImportError):
+        parse_snapshot(b"", use_numpy=True)
+
+
+def make_world(*agents):
+    data = "".join("%d %d %d %d %f %f " % agent for agent in agents)
+    return parse_snapshot(data.encode("cp1252"), use_numpy=False)
+
+
+def test_differ_reports_only_changes():
+    differ = WorldDiffer()
+    first = differ.diff(make_world(*AGENTS))
+    assert [change.kind for change in first] == [ADDED] * 3
+    assert first[0].values["unid"] == 1001
+    assert len(differ) == 3
+
+    assert differ.diff(make_world(*AGENTS)) == []
+
+    moved = (1002, 2, 14, 200, 31.0, 40.0)
+    born = (1004, 4, 1, 1, 0.0, 0.0)
+    changes = differ.diff(make_world(AGENTS[0], moved, born))
+    assert changes == [
+        AgentChange(CHANGED, 1002, dict(zip(
+            ("unid", "family", "genus", "species", "x", "y"), moved))),
+        AgentChange(ADDED, 1004, dict(zip(
+            ("unid", "family", "genus", "species", "x", "y"), born))),
+        AgentChange(REMOVED, 1003, None),
+    ]
+
+
+def test_differ_can_ignore_fields():
+    differ = WorldDiffer(fields=("family", "genus", "species"))
+    differ.diff(make_world(*AGENTS))
+    moved = (1001, 2, 13, 100, 99.0, 99.0)
+    assert differ.diff(make_world(moved, *AGENTS[1:])) == []
+
+    differ.reset()
+    assert len(differ.diff(make_world(*AGENTS))) == 3
@@ -0,0 +1,17 @@
+import pytest
+
+from pyc2e.testing import FakeEngineServer, echo_responder
+
+
+@pytest.fixture
+def fake_engine():
+    """A stand-in engine running the MiniEngine CAOS subset."""
+    with FakeEngineServer() as server:
+        yield server
+
+
+@pytest.fixture
+def echo_engine():
+    """A stand-in engine that echoes each query back."""
+    with FakeEngineServer(responder=echo_responder) as server:
+        yield server
@@ -0,0 +1,88 @@
+import socket
+
+import pytest
+
+from pyc2e.interfaces import UnixInterface
+from pyc2e.testing import FakeEngineServer, run_caos
+
+
+def _send(port: int, query: bytes) -> bytes:
+    """Talk to the server without any pyc2e client code in the way."""
+    with socket.create_connection(("127.0.0.1", port), timeout=2) as s:
+        s.sendall(query + b"\nrscr")
+        data = bytearray()
+        while True:
+            chunk = s.recv(4096)
+            if not chunk:
+                return bytes(data)
+            data.extend(chunk)
+
+
+class TestMiniEngine:
+
+    def test_outs_and_outv(self):
+        assert run_caos(b'outs "a" outv 2 outv 1.5') == b"a21.500000"
+
+    def test_string_concatenation(self):
+        query = b'sets va00 "ab" sets va01 "cd" adds va00 va01 outs va00'
+        assert run_caos(query) == b"abcd"
+
+    def test_unknown_command_stops_execution(self):
+        out = run_caos(b'outs "before" blah outs "after"')
+        assert out.startswith(b"before")
+        assert b"blah" in out
+        assert b"after" not in out
+
+    def test_comments_and_escapes(self):
+        assert run_caos(b'* a comment\nouts "say \\"hi\\""') == b'say "hi"'
+
+    def test_scrp_blocks_are_accepted_silently(self):
+        assert run_caos(b'scrp 2 8 1000 9 outs "x" endm') == b""
+
+
+def test_unix_interface_connection_test_passes(fake_engine):
+    interface = UnixInterface(port=fake_engine.port)
+    assert interface.test_connection()
+
+
+def test_stats_count_requests_and_bytes(fake_engine):
+    _send(fake_engine.port, b'outs "hello"')
+
+    assert fake_engine.stats.requests == 1
+    assert fake_engine.stats.bytes_sent == len(b"hello")
+    assert fake_engine.stats.bytes_received == len(b'outs "hello"\nrscr')
+
+
+def test_response_size_overrides_output():
+    with FakeEngineServer(response_size=5000) as server:
+        assert _send(server.port, b'outs "x"') == b"x" * 5000
+
+
+def test_chunked_replies_arrive_whole():
+    with FakeEngineServer(
+            response_size=3000, chunk_size=100, chunk_delay_ms=1
+    ) as server:
+        assert len(_send(server.port, b"")) == 3000
+
+
+@pytest.mark.parametrize("mode", ("close", "reset"))
+def test_failures_send_nothing(mode):
+    with FakeEngineServer(failure_rate=1.0, failure_mode=mode) as server:
+        try:
+            data = _send(server.port, b'outs "x"')
+        except ConnectionResetError:
+            data = b""
+        assert data == b""
+        assert server.stats.failures == 1
+
+
+def test_truncate_failure_cuts_reply():
+    with FakeEngineServer(
+            response_size=100, failure_rate=1.0, failure_mode="truncate"
+    ) as server:
+        assert len(_send(server.port, b"")) == 50
+
+
+def test_rejects_unknown_failure_mode():
+    with pytest.raises(ValueError):
+        FakeEngineServer(failure_mode="explode")
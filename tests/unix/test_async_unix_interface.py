@@ -0,0 +1,89 @@
+"""
+Ensure AsyncUnixInterface talks the socket protocol correctly.
+"""
+import asyncio
+
+import pytest
+
+from pyc2e.common import ConnectFailure, RequestTimeout
+from pyc2e.interfaces import AsyncUnixInterface
+
+
+async def _serve(handler):
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, port
+
+
+def _echo_handler(delay: float = 0.0):
+    """Reply with whatever came before the rscr terminator."""
+    async def handle(reader, writer):
+        data = await reader.readuntil(b"\nrscr")
+        await asyncio.sleep(delay)
+        writer.write(data[:-len(b"\nrscr")])
+        await writer.drain()
+        writer.close()
+    return handle
+
+
+def test_execute_caos_returns_engine_output():
+    async def run():
+        server, port = await _serve(_echo_handler())
+        async with server:
+            interface = AsyncUnixInterface(port=port)
+            return await interface.execute_caos("outs \"hi\"")
+
+    response = asyncio.run(run())
+    assert response.data == b"outs \"hi\""
+
+
+def test_add_script_wraps_body_in_scrp_and_endm():
+    async def run():
+        server, port = await _serve(_echo_handler())
+        async with server:
+            interface = AsyncUnixInterface(port=port)
+            return await interface.add_script("stop", 2, 3, 4, 9)
+
+    response = asyncio.run(run())
+    assert response.data == b"scrp 2 3 4 9\nstop\nendm"
+
+
+def test_many_requests_run_concurrently():
+    """Requests on one interface overlap rather than running serially"""
+    async def run():
+        server, port = await _serve(_echo_handler(delay=0.05))
+        async with server:
+            interface = AsyncUnixInterface(port=port, wait_timeout_ms=2000)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            responses = await asyncio.gather(*(
+                interface.execute_caos(str(i)) for i in range(50)
+            ))
+            return responses, loop.time() - start
+
+    responses, elapsed = asyncio.run(run())
+    assert [r.text for r in responses] == [str(i) for i in range(50)]
+    assert elapsed < 1.0
+
+
+def test_slow_engine_raises_request_timeout():
+    async def run():
+        server, port = await _serve(_echo_handler(delay=1.0))
+        async with server:
+            interface = AsyncUnixInterface(port=port, wait_timeout_ms=20)
+            await interface.execute_caos("outs 1")
+
+    with pytest.raises(RequestTimeout):
+        asyncio.run(run())
+
+
+def test_refused_connection_raises_connect_failure():
+    async def run():
+        server, port = await _serve(_echo_handler())
+        server.close()
+        await server.wait_closed()
+        interface = AsyncUnixInterface(port=port)
+        await interface.execute_caos("outs 1")
+
+    with pytest.raises(ConnectFailure):
+        asyncio.run(run())
@@ -0,0 +1,94 @@
+import socket
+import time
+
+import pytest
+
+from pyc2e.interfaces import UnixInterface
+from pyc2e.interfaces.unix.pool import ConnectionPool
+from pyc2e.testing import FakeEngineServer
+
+
+def wait_for_ready(pool, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while pool.ready < count:
+        assert time.monotonic() < deadline, "pool never filled"
+        time.sleep(0.005)
+
+
+def test_pool_fills_in_the_background():
+    with FakeEngineServer() as engine, \
+            ConnectionPool(port=engine.port, size=3) as pool:
+        wait_for_ready(pool, 3)
+        assert pool.stats.connects == 3
+
+
+def test_requests_use_pooled_connections():
+    with FakeEngineServer() as engine, \
+            ConnectionPool(port=engine.port, size=2) as pool:
+        wait_for_ready(pool, 2)
+        interface = UnixInterface(port=engine.port, pool=pool)
+
+        for i in range(5):
+            assert interface.execute_caos(f"outv {i}").text == str(i)
+            wait_for_ready(pool, 2)
+
+        assert pool.stats.hits == 5
+        assert pool.stats.misses == 0
+        assert pool.stats.hit_rate == 1.0
+
+
+def test_empty_pool_connects_on_the_spot():
+    with FakeEngineServer() as engine, \
+            ConnectionPool(port=engine.port, size=1) as pool:
+        wait_for_ready(pool, 1)
+        pool.acquire().close()
+        while pool.ready:
+            pool.acquire().close()
+
+        interface = UnixInterface(port=engine.port, pool=pool)
+        assert interface.execute_caos("outv 7").text == "7"
+        assert pool.stats.misses >= 1
+
+
+def test_idle_connections_are_discarded():
+    now = [0.0]
+    with FakeEngineServer() as engine, ConnectionPool(
+            port=engine.port, size=1, max_idle=10.0, clock=lambda: now[0]
+    ) as pool:
+        wait_for_ready(pool, 1)
+        now[0] = 11.0
+        sock = pool.acquire()
+        sock.close()
+
+        assert pool.stats.stale == 1
+        assert pool.stats.misses == 1
+
+
+def test_connections_closed_by_the_engine_are_discarded():
+    listener = socket.create_server(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    with listener, ConnectionPool(port=port, size=1) as pool:
+        wait_for_ready(pool, 1)
+        accepted, _ = listener.accept()
+        accepted.close()
+        time.sleep(0.05)
+
+        pool.acquire().close()
+        assert pool.stats.stale >= 1
+        assert pool.stats.misses == 1
+
+
+def test_closed_pool_refuses_to_hand_out_connections():
+    with FakeEngineServer() as engine:
+        pool = ConnectionPool(port=engine.port, size=1)
+        wait_for_ready(pool, 1)
+        pool.close()
+
+        assert pool.ready == 0
+        with pytest.raises(ValueError):
+            pool.acquire()
+
+
+def test_size_must_be_positive():
+    with pytest.raises(ValueError):
+        ConnectionPool(size=0)
@@ -0,0 +1,69 @@
+import socket
+import time
+
+import pytest
+
+import pyc2e.interfaces.unix  # noqa: F401 (importing must not set timeouts)
+from pyc2e.common import RequestTimeout
+from pyc2e.interfaces import UnixInterface
+from pyc2e.testing import FakeEngineServer
+
+
+def test_import_leaves_default_timeout_alone():
+    assert socket.getdefaulttimeout() is None
+
+
+def test_slow_engine_raises_request_timeout():
+    with FakeEngineServer(latency_ms=300) as engine:
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=50)
+        start = time.monotonic()
+        with pytest.raises(RequestTimeout):
+            interface.execute_caos("outv 1")
+        elapsed = time.monotonic() - start
+
+    assert elapsed < 0.25
+    assert not interface.connected
+
+
+def test_budget_covers_the_whole_receive_loop():
+    """Chunks which each arrive quickly still can't exceed the total"""
+    with FakeEngineServer(
+            response_size=100, chunk_size=1, chunk_delay_ms=5
+    ) as engine:
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=60)
+        with pytest.raises(RequestTimeout):
+            interface.execute_caos("outv 1")
+
+
+def test_hung_engine_times_out():
+    with FakeEngineServer(failure_rate=1.0, failure_mode="hang") as engine:
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=30)
+        with pytest.raises(RequestTimeout):
+            interface.execute_caos("outv 1")
+
+
+def test_interface_recovers_after_timeout():
+    with FakeEngineServer(latency_ms=200) as engine:
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=20)
+        with pytest.raises(RequestTimeout):
+            interface.execute_caos("outv 1")
+
+        engine.latency_ms = 0
+        assert interface.execute_caos("outv 1").text == "1"
+
+
+def test_none_disables_the_deadline():
+    with FakeEngineServer(latency_ms=150) as engine:
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=None)
+        assert interface.execute_caos("outv 1").text == "1"
+
+
+def test_stalled_stream_times_out():
+    with FakeEngineServer(
+            response_size=10, chunk_size=5, chunk_delay_ms=200
+    ) as engine:
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=50)
+        response = interface.execute_caos("outv 1", stream=True)
+        with pytest.raises(RequestTimeout):
+            list(response.iter_content())
+        assert not interface.connected
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from pyc2e.interfaces import AsyncUnixInterface, UnixInterface
+from pyc2e.interfaces.interface import build_batch, split_batch
+from pyc2e.interfaces.response import Response
+
+
+def test_batch_splits_output_per_snippet(fake_engine):
+    interface = UnixInterface(port=fake_engine.port)
+    responses = interface.execute_batch(
+        ['outs "a"', 'outv 2', '', 'outs "ccc"'])
+
+    assert [r.text for r in responses] == ["a", "2", "", "ccc"]
+    assert not any(r.error for r in responses)
+
+
+def test_batch_uses_one_round_trip(fake_engine):
+    interface = UnixInterface(port=fake_engine.port)
+    interface.execute_batch(['outv %i' % i for i in range(50)])
+
+    assert fake_engine.stats.requests == 1
+
+
+def test_error_attributed_to_failing_snippet(fake_engine):
+    interface = UnixInterface(port=fake_engine.port)
+    first, failed, never_ran = interface.execute_batch(
+        ['outs "ok"', 'outs "partial" bogus', 'outs "later"'])
+
+    assert first.text == "ok"
+    assert first.error is False
+    assert failed.error is True
+    assert failed.text.startswith("partial")
+    assert "bogus" in failed.text
+    assert never_ran is None
+
+
+def test_empty_batch_sends_nothing(fake_engine):
+    interface = UnixInterface(port=fake_engine.port)
+    assert interface.execute_batch([]) == []
+    assert fake_engine.stats.requests == 0
+
+
+def test_async_batch(fake_engine):
+    interface = AsyncUnixInterface(port=fake_engine.port)
+    responses = asyncio.run(interface.execute_batch(['outv 1', 'outv 2']))
+
+    assert [r.text for r in responses] == ["1", "2"]
+
+
+@pytest.mark.parametrize("terminator", (b"", b"\0"))
+def test_split_respects_declared_length_and_terminator(terminator):
+    request, count = build_batch(["outs 1", "outs 2"], b"tok")
+    data = b"x<pyc2e tok 0>y<pyc2e tok 1>" + terminator
+    response = Response(data + b"garbage", declared_length=len(data))
+
+    assert [r.data for r in split_batch(response, count, b"tok")] == [
+        b"x", b"y"]
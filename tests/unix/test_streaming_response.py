@@ -0,0 +1,80 @@
+import pytest
+
+from pyc2e.common import QueryError, StreamConsumed
+from pyc2e.interfaces import UnixInterface
+from pyc2e.interfaces.response import StreamingResponse
+from pyc2e.testing import FakeEngineServer
+
+
+def _chunked(data: bytes, size: int):
+    """A read_chunk function serving data in pieces of at most size."""
+    position = 0
+
+    def read_chunk(max_size: int) -> bytes:
+        nonlocal position
+        chunk = data[position:position + min(size, max_size)]
+        position += len(chunk)
+        return chunk
+    return read_chunk
+
+
+@pytest.mark.parametrize("size", (1, 3, 100))
+def test_iter_lines_handles_lines_split_across_chunks(size):
+    r = StreamingResponse(_chunked(b"ab\ncde\n\nf", size))
+    assert list(r.iter_lines()) == [b"ab", b"cde", b"", b"f"]
+
+
+def test_iter_content_respects_chunk_size():
+    r = StreamingResponse(_chunked(b"x" * 100, 1000))
+    assert [len(c) for c in r.iter_content(30)] == [30, 30, 30, 10]
+
+
+def test_body_can_only_be_streamed_once():
+    r = StreamingResponse(_chunked(b"abc", 1))
+    list(r.iter_content())
+    with pytest.raises(StreamConsumed):
+        list(r.iter_content())
+    with pytest.raises(StreamConsumed):
+        r.data
+
+
+def test_loaded_body_can_be_replayed():
+    r = StreamingResponse(_chunked(b"abcdef", 2))
+    assert r.text == "abcdef"
+    assert list(r.iter_content(4)) == [b"abcd", b"ef"]
+
+
+def test_close_runs_callback_once():
+    calls = []
+    r = StreamingResponse(_chunked(b"abc", 1), on_close=lambda: calls.append(1))
+    with r:
+        next(r.iter_content(1))
+    r.close()
+    assert calls == [1]
+    assert r.closed
+
+
+def test_interface_streams_engine_output():
+    with FakeEngineServer(
+            response_size=10000, chunk_size=512, chunk_delay_ms=1
+    ) as engine:
+        interface = UnixInterface(port=engine.port)
+        response = interface.execute_caos("outv 1", stream=True)
+        assert interface.connected
+
+        chunks = list(response.iter_content(256))
+
+    assert b"".join(chunks) == b"x" * 10000
+    assert max(len(c) for c in chunks) <= 256
+    assert not interface.connected
+
+
+def test_interface_refuses_requests_while_streaming(fake_engine):
+    interface = UnixInterface(port=fake_engine.port)
+    response = interface.execute_caos('outs "a"', stream=True)
+
+    with pytest.raises(QueryError):
+        interface.execute_caos('outs "b"')
+
+    response.close()
+    assert interface.execute_caos('outs "b"').text == "b"
@@ -0,0 +1,178 @@
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from pyc2e.common import RequestTimeout
+from pyc2e.interfaces import UnixInterface
+from pyc2e.interfaces.tracing import (
+    CONNECT_END,
+    CONNECT_START,
+    DECODE,
+    DISCONNECT,
+    FIRST_BYTE,
+    LAST_BYTE,
+    REQUEST_END,
+    REQUEST_FAILED,
+    REQUEST_START,
+    REQUEST_WRITTEN,
+    TraceRecorder
+)
+from pyc2e.testing import FakeEngineServer
+
+
+def test_request_emits_every_phase_in_order(fake_engine):
+    recorder = TraceRecorder()
+    interface = UnixInterface(port=fake_engine.port)
+    interface.add_observer(recorder)
+
+    interface.execute_caos('outs "hello"')
+
+    events = recorder.last
+    assert [event.name for event in events] == [
+        REQUEST_START,
+        CONNECT_START,
+        CONNECT_END,
+        REQUEST_WRITTEN,
+        FIRST_BYTE,
+        LAST_BYTE,
+        DECODE,
+        DISCONNECT,
+        REQUEST_END,
+    ]
+    assert events[0].nbytes == len('outs "hello"')
+    assert events[3].nbytes == len('outs "hello"\nrscr')
+    assert events[5].nbytes == 5
+    timestamps = [event.timestamp for event in events]
+    assert timestamps == sorted(timestamps)
+
+
+def test_phases_separate_engine_latency():
+    with FakeEngineServer(latency_ms=30) as engine:
+        recorder = TraceRecorder()
+        interface = UnixInterface(port=engine.port)
+        interface.add_observer(recorder)
+        interface.execute_caos("outv 1")
+
+    phases = recorder.phases()
+    assert phases[FIRST_BYTE] >= 0.025
+    assert phases[DECODE] < 0.025
+
+
+def test_recorder_groups_requests(fake_engine):
+    recorder = TraceRecorder(max_requests=2)
+    interface = UnixInterface(port=fake_engine.port)
+    interface.add_observer(recorder)
+
+    for i in range(3):
+        interface.execute_caos(f"outv {i}")
+
+    assert len(recorder.requests) == 2
+    assert all(r[0].name == REQUEST_START for r in recorder.requests)
+
+
+def test_timeouts_are_reported():
+    with FakeEngineServer(latency_ms=200) as engine:
+        recorder = TraceRecorder()
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=20)
+        interface.add_observer(recorder)
+        with pytest.raises(RequestTimeout):
+            interface.execute_caos("outv 1")
+
+    failed = recorder.last[-1]
+    assert failed.name == REQUEST_FAILED
+    assert isinstance(failed.detail, RequestTimeout)
+
+
+def test_streaming_emits_byte_events(fake_engine):
+    recorder = TraceRecorder()
+    interface = UnixInterface(port=fake_engine.port)
+    interface.add_observer(recorder)
+
+    with interface.execute_caos("outv 12345", stream=True) as stream:
+        assert b"".join(stream.iter_content(2)) == b"12345"
+
+    names = [event.name for event in recorder.last]
+    assert names[-4:] == [FIRST_BYTE, LAST_BYTE, DISCONNECT, REQUEST_END]
+    assert recorder.last[-1].nbytes == 5
+
+
+def test_timed_out_streams_end_once():
+    with FakeEngineServer(chunk_size=5, chunk_delay_ms=200) as engine:
+        recorder = TraceRecorder()
+        interface = UnixInterface(port=engine.port, wait_timeout_ms=50)
+        interface.add_observer(recorder)
+        stream = interface.execute_caos('outs "hello world"', stream=True)
+        with pytest.raises(RequestTimeout):
+            b"".join(stream.iter_content(5))
+
+    names = [event.name for event in recorder.last]
+    terminal = [n for n in names if n in (REQUEST_END, REQUEST_FAILED)]
+    assert terminal == [REQUEST_FAILED]
+    assert not interface.connected
+
+
+def test_reset_streams_fail_once():
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def send_part_then_reset():
+        conn, _ = listener.accept()
+        with conn:
+            while not conn.recv(65536).endswith(b"rscr"):
+                pass
+            conn.sendall(b"hello")
+            time.sleep(0.1)
+            # zero linger makes close() send RST instead of FIN
+            conn.setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+
+    server = threading.Thread(target=send_part_then_reset)
+    server.start()
+    try:
+        recorder = TraceRecorder()
+        interface = UnixInterface(
+            port=listener.getsockname()[1], wait_timeout_ms=1000)
+        interface.add_observer(recorder)
+        stream = interface.execute_caos('outs "hello world"', stream=True)
+        chunks = stream.iter_content(5)
+        assert next(chunks) == b"hello"
+        with pytest.raises(ConnectionResetError):
+            next(chunks)
+    finally:
+        server.join()
+        listener.close()
+
+    names = [event.name for event in recorder.last]
+    terminal = [n for n in names if n in (REQUEST_END, REQUEST_FAILED)]
+    assert terminal == [REQUEST_FAILED]
+    failed, = [e for e in recorder.last if e.name == REQUEST_FAILED]
+    assert isinstance(failed.detail, ConnectionResetError)
+    assert not interface.connected
+
+
+def test_removed_observers_stop_receiving(fake_engine):
+    seen = []
+
+    def observer(interface, event):
+        seen.append(event.name)
+
+    interface = UnixInterface(port=fake_engine.port)
+    interface.add_observer(observer)
+    interface.execute_caos("outv 1")
+    count = len(seen)
+    interface.remove_observer(observer)
+    interface.execute_caos("outv 1")
+
+    assert count and len(seen) == count
+
+
+def test_no_events_are_built_without_observers(fake_engine, monkeypatch):
+    interface = UnixInterface(port=fake_engine.port)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("emitted without observers")
+
+    monkeypatch.setattr(interface, "_emit", fail)
+    assert interface.execute_caos("outv 1").text == "1"
@@ -0,0 +1,81 @@
+import socket
+
+import pytest
+
+from pyc2e.common import InputTooLong
+from pyc2e.interfaces import UnixInterface
+from pyc2e.testing import FakeEngineServer
+
+
+@pytest.mark.parametrize("receive_buffer_size", (1, 7, 1024, 1 << 16))
+@pytest.mark.parametrize("response_size", (0, 1, 1023, 1024, 1025, 300000))
+def test_receives_whole_response(receive_buffer_size, response_size):
+    with FakeEngineServer(response_size=response_size) as engine:
+        interface = UnixInterface(
+            port=engine.port,
+            receive_buffer_size=receive_buffer_size
+        )
+        response = interface.execute_caos("outv 1")
+
+    assert response.data == b"x" * response_size
+
+
+def test_receives_chunked_response():
+    with FakeEngineServer(
+            response_size=5000, chunk_size=333, chunk_delay_ms=1
+    ) as engine:
+        interface = UnixInterface(port=engine.port)
+        assert len(interface.execute_caos("outv 1").data) == 5000
+
+
+def test_buffer_size_adapts_to_responses(monkeypatch):
+    # How much room the first read on each connection offered
+    first_reads = []
+    seen = set()
+    recv_into = socket.socket.recv_into
+
+    def recording_recv_into(sock, buffer, *args):
+        if sock not in seen:
+            seen.add(sock)
+            first_reads.append(len(buffer))
+        return recv_into(sock, buffer, *args)
+
+    monkeypatch.setattr(socket.socket, "recv_into", recording_recv_into)
+
+    with FakeEngineServer(response_size=100000) as engine:
+        interface = UnixInterface(port=engine.port, receive_buffer_size=64)
+        interface.execute_caos("outv 1")
+
+        engine.response_size = 10
+        interface.execute_caos("outv 1")
+        assert len(interface.execute_caos("outv 1").data) == 10
+
+    initial, grown, decayed = first_reads
+    assert initial == 64
+    assert grown > 100000
+    assert 64 <= decayed < grown
+
+
+def test_rejects_empty_receive_buffer():
+    with pytest.raises(ValueError):
+        UnixInterface(receive_buffer_size=0)
+
+
+def test_oversized_request_raises_before_sending(fake_engine):
+    interface = UnixInterface(port=fake_engine.port, max_request_size=8)
+
+    with pytest.raises(InputTooLong):
+        interface.execute_caos("outs \"too long\"")
+    assert interface.execute_caos("outv 1").text == "1"
+    assert fake_engine.stats.requests == 1
+
+
+def test_add_scripts_splits_to_fit_request_size(fake_engine):
+    scripts = [("outv %d" % i, 1, 2, 3, i) for i in range(6)]
+    interface = UnixInterface(port=fake_engine.port, max_request_size=60)
+
+    responses = interface.add_scripts(scripts)
+
+    assert len(responses) == 6
+    assert not any(response.data for response in responses)
+    assert fake_engine.stats.requests == 3
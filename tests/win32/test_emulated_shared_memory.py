@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from pyc2e.common import ConnectFailure, InputTooLong, RequestTimeout
+from pyc2e.interfaces.win32 import BadBufferError, Win32Interface
+from pyc2e.interfaces.win32.emulated import EmulatedBackend
+from pyc2e.testing import FakeSharedMemoryEngine
+
+
+@pytest.fixture
+def engine():
+    with FakeSharedMemoryEngine() as engine:
+        yield engine
+
+
+def test_execute_caos(engine):
+    interface = engine.interface()
+    response = interface.execute_caos("outv 3 outs \"!\"")
+
+    assert response.text == "3!"
+    assert response.error is False
+    assert not interface.connected
+
+
+def test_errors_set_the_status(engine):
+    response = engine.interface().execute_caos("bogus")
+
+    assert response.error is True
+    assert "bogus" in response.text
+
+
+def test_add_script(engine):
+    response = engine.interface().add_script("outs \"hi\"", 2, 3, 4, 9)
+
+    assert response.error is False
+    assert response.text == ""
+
+
+def test_test_connection(engine):
+    assert engine.interface().test_connection()
+
+
+def test_back_to_back_requests(engine):
+    interface = engine.interface()
+    for i in range(50):
+        assert interface.execute_caos(f"outv {i}").text == str(i)
+    assert engine.stats.requests == 50
+
+
+def test_clients_on_several_threads(engine):
+    results = {}
+
+    def worker(number):
+        interface = engine.interface()
+        results[number] = [
+            interface.execute_caos(f"outv {number * 100 + i}").text
+            for i in range(10)
+        ]
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for number in range(4):
+        assert results[number] == [
+            str(number * 100 + i) for i in range(10)]
+
+
+def test_slow_engine_times_out():
+    with FakeSharedMemoryEngine(latency_ms=200) as engine:
+        interface = engine.interface(wait_timeout_ms=20)
+        with pytest.raises(RequestTimeout):
+            interface.execute_caos("outv 1")
+
+
+def test_missing_engine_fails_to_connect():
+    interface = Win32Interface(backend=EmulatedBackend())
+    with pytest.raises(ConnectFailure):
+        interface.execute_caos("outv 1")
+
+
+def test_bad_header_is_reported(engine):
+    engine._memory[0:4] = b"nope"
+    with pytest.raises(BadBufferError):
+        engine.interface().execute_caos("outv 1")
+
+
+def test_mutex_is_released_after_errors(engine):
+    engine._memory[0:4] = b"nope"
+    interface = engine.interface()
+    with pytest.raises(BadBufferError):
+        interface.execute_caos("outv 1")
+
+    engine._memory[0:4] = b"c2e@"
+    assert engine.interface().execute_caos("outv 1").text == "1"
+
+
+def test_query_must_fit_in_the_buffer():
+    with FakeSharedMemoryEngine(memory_size=64) as engine:
+        interface = engine.interface()
+        assert interface.max_request_size == 39
+
+        assert interface.execute_caos("outv 1").text == "1"
+        with pytest.raises(InputTooLong):
+            interface.execute_caos("outs \"" + "x" * 40 + "\"")
+        assert not interface.connected
@@ -0,0 +1,93 @@
+import struct
+
+import pytest
+
+from pyc2e.interfaces.win32 import BadBufferError, OFFSET_PID_START
+from pyc2e.interfaces.win32.emulated import EmulatedBackend
+from pyc2e.testing import FakeSharedMemoryEngine
+
+
+class CountingBackend(EmulatedBackend):
+
+    def __init__(self):
+        super().__init__()
+        self.opened = []
+
+    def open_memory(self, name, size):
+        self.opened.append(name)
+        return super().open_memory(name, size)
+
+    def open_process(self, process_id):
+        self.opened.append(process_id)
+        return super().open_process(process_id)
+
+
+@pytest.fixture
+def engine():
+    with FakeSharedMemoryEngine(backend=CountingBackend()) as engine:
+        yield engine
+
+
+def test_handles_are_opened_once(engine):
+    interface = engine.interface(persistent=True)
+    for i in range(5):
+        assert interface.execute_caos(f"outv {i}").text == str(i)
+
+    assert interface.connected
+    assert engine.backend.opened == ["Docking Station_mem", engine.pid]
+    interface.disconnect()
+    assert interface.process_handle is None
+
+
+def test_default_mode_reopens_every_request(engine):
+    interface = engine.interface()
+    for i in range(3):
+        interface.execute_caos(f"outv {i}")
+
+    assert not interface.connected
+    assert len(engine.backend.opened) == 6
+
+
+def test_engine_restart_reconnects(engine):
+    interface = engine.interface(persistent=True)
+    assert interface.execute_caos("outv 1").text == "1"
+    old_pid = engine.pid
+
+    engine.restart()
+
+    assert engine.pid != old_pid
+    assert interface.execute_caos("outv 2").text == "2"
+    assert interface.process_id == engine.pid
+    assert interface.reconnects == 1
+
+
+def test_pid_change_reconnects(engine):
+    interface = engine.interface(persistent=True)
+    interface.execute_caos("outv 1")
+
+    new_pid = engine.backend.create_process().pid
+    struct.pack_into("<I", engine._memory, OFFSET_PID_START, new_pid)
+
+    assert interface.execute_caos("outv 2").text == "2"
+    assert interface.reconnects == 1
+    assert interface.process_id == new_pid
+
+
+def test_bad_header_reconnects_once_then_fails(engine):
+    interface = engine.interface(persistent=True)
+    interface.execute_caos("outv 1")
+
+    engine._memory[0:4] = b"nope"
+
+    with pytest.raises(BadBufferError):
+        interface.execute_caos("outv 2")
+    assert interface.reconnects == 1
+
+
+def test_bad_header_on_a_fresh_session_isnt_retried(engine):
+    engine._memory[0:4] = b"nope"
+    interface = engine.interface(persistent=True)
+
+    with pytest.raises(BadBufferError):
+        interface.execute_caos("outv 1")
+    assert interface.reconnects == 0
@@ -0,0 +1,49 @@
+from pyc2e.interfaces.tracing import (
+    CONNECT_END,
+    CONNECT_START,
+    DECODE,
+    DISCONNECT,
+    FIRST_BYTE,
+    LAST_BYTE,
+    MUTEX_ACQUIRED,
+    RECONNECT,
+    REQUEST_END,
+    REQUEST_START,
+    REQUEST_WRITTEN,
+    TraceRecorder
+)
+from pyc2e.testing import FakeSharedMemoryEngine
+
+
+def test_shared_memory_request_phases():
+    with FakeSharedMemoryEngine() as engine:
+        recorder = TraceRecorder()
+        interface = engine.interface()
+        interface.add_observer(recorder)
+        interface.execute_caos('outs "hi"')
+
+    assert [event.name for event in recorder.last] == [
+        REQUEST_START,
+        CONNECT_START,
+        CONNECT_END,
+        MUTEX_ACQUIRED,
+        REQUEST_WRITTEN,
+        FIRST_BYTE,
+        LAST_BYTE,
+        DECODE,
+        DISCONNECT,
+        REQUEST_END,
+    ]
+    assert recorder.last[-1].nbytes == 2
+
+
+def test_persistent_session_reports_reconnects():
+    with FakeSharedMemoryEngine() as engine:
+        recorder = TraceRecorder()
+        interface = engine.interface(persistent=True)
+        interface.add_observer(recorder)
+        interface.execute_caos("outv 1")
+        engine.restart()
+        interface.execute_caos("outv 2")
+
+    assert RECONNECT in [event.name for event in recorder.last]
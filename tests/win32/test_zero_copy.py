@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from pyc2e.bench import run_benchmark
+from pyc2e.common import RequestTimeout
+from pyc2e.interfaces.win32 import HEADER_LAYOUT, RESULT_LAYOUT
+from pyc2e.interfaces.win32.emulated import EmulatedBackend
+from pyc2e.testing import FakeSharedMemoryEngine
+
+
+@pytest.fixture
+def engine():
+    with FakeSharedMemoryEngine() as engine:
+        yield engine
+
+
+def test_layouts_match_the_buffer(engine):
+    assert HEADER_LAYOUT.unpack_from(engine._memory, 0) == \
+        (b"c2e@", engine.pid)
+    assert RESULT_LAYOUT.size == 8
+
+
+def test_zero_copy_requires_persistent(engine):
+    with pytest.raises(ValueError):
+        engine.interface(zero_copy=True)
+
+
+def test_zero_copy_response_views_the_mapping(engine):
+    interface = engine.interface(persistent=True, zero_copy=True)
+    response = interface.execute_caos('outs "hello"')
+
+    assert response.text == "hello"
+    assert bytes(response.view) == b"hello"
+
+
+def test_zero_copy_view_is_overwritten_by_the_next_request(engine):
+    interface = engine.interface(persistent=True, zero_copy=True)
+    first = interface.execute_caos('outs "aaaaa"').view
+    interface.execute_caos('outs "bbbbb"')
+
+    assert bytes(first) == b"bbbbb"
+
+
+def test_zero_copy_view_is_kept_until_released(engine):
+    interface = engine.interface(persistent=True, zero_copy=True)
+    other = engine.interface(wait_timeout_ms=50)
+    first = interface.execute_caos('outs "aaaaa"')
+
+    with pytest.raises(RequestTimeout):
+        other.execute_caos('outs "bbbbb"')
+    assert first.text == "aaaaa"
+
+    interface.release_buffer()
+    assert other.execute_caos('outs "bbbbb"').text == "bbbbb"
+    assert bytes(first.view) == b"bbbbb"
+
+
+def test_copied_responses_survive_later_requests(engine):
+    interface = engine.interface(persistent=True)
+    first = interface.execute_caos('outs "aaaaa"')
+    interface.execute_caos('outs "bbbbb"')
+
+    assert first.text == "aaaaa"
+    assert bytes(first.view) == b"aaaaa"
+
+
+def test_disconnect_with_live_zero_copy_responses(engine):
+    interface = engine.interface(persistent=True, zero_copy=True)
+    response = interface.execute_caos("outv 5")
+    interface.disconnect()
+
+    assert not interface.connected
+    assert response.text == "5"
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "memfd_create"), reason="needs os.memfd_create")
+def test_anonymous_memory_backend():
+    backend = EmulatedBackend(anonymous=True)
+    with FakeSharedMemoryEngine(backend=backend) as engine:
+        interface = engine.interface(persistent=True, zero_copy=True)
+        assert interface.execute_caos("outv 9").text == "9"
+
+
+def test_benchmark_with_an_interface_factory(engine):
+    report = run_benchmark(
+        None,
+        ["outv 1"],
+        requests=50,
+        interface_factory=lambda: engine.interface(
+            persistent=True, zero_copy=True)
+    )
+
+    assert report.requests == 50
+    assert not report.errors
+    assert report.bytes_in == 50